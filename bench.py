@@ -0,0 +1,405 @@
+"""Benchmarks du bot, sans connexion à Discord.
+
+Usage : python bench.py [--json fichier] [--compare ancien.json] [--max-joueurs N] [section ...]
+(toutes les sections par défaut)
+
+Chaque mesure donne des opérations par seconde et les temps p50 / p99 d'un appel.
+Les résultats sont écrits en JSON (bench-<date>.json par défaut) ; avec --compare,
+toute mesure plus de 20 % en dessous de l'ancienne est signalée et le code de
+sortie vaut 1, pour bloquer un déploiement.
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import chess
+
+import main
+
+TOLERANCE_REGRESSION = 0.20
+DUREE_MESURE = 0.5 # secondes par mesure
+
+def mesurer(fn, duree=DUREE_MESURE, min_echantillons=20):
+    """Appelle fn en boucle pendant `duree` secondes : ops/s, p50 et p99 d'un appel (en µs).
+
+    Les fonctions très rapides sont chronométrées par paquets (un échantillon
+    dure au moins ~50 µs), sinon la mesure du temps coûterait plus que l'appel.
+    """
+    paquet = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(paquet):
+            fn()
+        if time.perf_counter_ns() - start >= 50_000 or paquet >= 1 << 20:
+            break
+        paquet *= 2
+
+    echantillons = []
+    fin = time.perf_counter() + duree
+    while time.perf_counter() < fin or len(echantillons) < min_echantillons:
+        start = time.perf_counter_ns()
+        for _ in range(paquet):
+            fn()
+        echantillons.append((time.perf_counter_ns() - start) / paquet / 1000)
+    echantillons.sort()
+    moyenne = sum(echantillons) / len(echantillons)
+    return {
+        "ops_s": round(1e6 / moyenne, 1),
+        "p50_us": round(echantillons[len(echantillons) // 2], 3),
+        "p99_us": round(echantillons[min(len(echantillons) - 1, int(len(echantillons) * 0.99))], 3),
+        "appels": len(echantillons) * paquet,
+    }
+
+def afficher(nom, resultat):
+    if "ops_s" in resultat:
+        print(f"  {nom:<52} {resultat['ops_s']:>12,.0f} ops/s   p50 {resultat['p50_us']:>10.2f} µs   p99 {resultat['p99_us']:>10.2f} µs")
+    else:
+        print(f"  {nom:<52} {resultat['temps_ms']:>12,.1f} ms")
+
+class Joueur:
+    """Remplace un discord.Member pour les vues de jeu."""
+
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+
+# Positions de test du Puissance 4 : colonnes jouées (1 à 7) depuis le plateau vide
+POSITIONS_P4 = [
+    ("fin de partie", "11754443331124243577431631"),
+    ("milieu (22 coups)", "1351434334676643755524"),
+    ("milieu (18 coups)", "521146454453445521"),
+    ("ouverture (14 coups)", "44124212233141"),
+    ("plateau vide", ""),
+]
+BUDGET_P4 = 10.0 # secondes max par position
+
+def position_p4(sequence):
+    engine = main.Connect4Board()
+    player = 1
+    for char in sequence:
+        engine.play(int(char) - 1, player)
+        player = 3 - player
+    return engine.boards[player - 1], engine.boards[0] | engine.boards[1], engine.moves
+
+def bench_p4_ia(args):
+    resultats = {}
+    print(f"{'Position':<22} {'coup':>4} {'score':>7} {'prof.':>5} {'noeuds':>9} {'temps':>8} {'noeuds/s':>9}")
+    for nom, sequence in POSITIONS_P4:
+        pos, mask, moves = position_p4(sequence)
+        solver = main.Connect4Solver()
+        start = time.perf_counter()
+        col, score, depth = solver.best_move(pos, mask, moves, main.LIGNES * main.COLONNES, BUDGET_P4)
+        elapsed = time.perf_counter() - start
+        resolu = "" if abs(score) >= main.SCORE_VICTOIRE or depth == main.LIGNES * main.COLONNES - moves else " (budget)"
+        print(f"{nom:<22} {col + 1:>4} {score:>7} {depth:>5} {solver.nodes:>9} {elapsed:>7.3f}s {solver.nodes / elapsed:>9.0f}{resolu}")
+        resultats[nom] = {"coup": col + 1, "profondeur": depth, "temps_s": round(elapsed, 4), "noeuds_s": round(solver.nodes / elapsed)}
+    return resultats
+
+# Positions d'échecs : ouverture, milieu de partie chargé, finale
+POSITIONS_ECHECS = [
+    ("départ", chess.STARTING_FEN),
+    ("milieu de partie", "r1bq1rk1/pp2bppp/2n1pn2/2pp4/3P4/2PBPN2/PP1N1PPP/R2QK2R w KQ - 0 8"),
+    ("finale", "8/5pk1/6p1/3R4/5P2/6PK/r7/8 w - - 0 45"),
+]
+
+async def _bench_moteurs():
+    resultats = {}
+    a, b = Joueur(1, "alice"), Joueur(2, "bob")
+
+    # Puissance 4 : détection de victoire et coup joué (puis annulé pour garder la position)
+    for nom, sequence in POSITIONS_P4:
+        game = main.Connect4Game(a, b)
+        for i, char in enumerate(sequence):
+            game.drop_piece(int(char) - 1, 1 + i % 2)
+        colonne = next(c for c in main.ORDRE_COLONNES if game.engine.can_play(c))
+        def drop():
+            game.drop_piece(colonne, 1)
+            game.engine.undo(colonne, 1)
+        resultats[f"p4.check_winner[{nom}]"] = mesurer(lambda: game.check_winner(1))
+        resultats[f"p4.drop_piece+undo[{nom}]"] = mesurer(drop)
+
+    # Morpion : grille vide, milieu de partie, grille gagnée
+    for nom, coups in (("vide", []), ("milieu", [(1, 1), (0, 0), (2, 0)]), ("gagnée", [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])):
+        game = main.MorpionGame(a, b)
+        for x, y in coups:
+            game.play(x, y)
+        resultats[f"morpion.check_victory[{nom}]"] = mesurer(game.check_victory)
+
+    # Échecs : les trois étapes du menu (type de pièce, pièce, destination)
+    for nom, fen in POSITIONS_ECHECS:
+        game = main.ChessGame(a, b, 0)
+        game.board.set_fen(fen)
+        game.refresh_moves()
+        resultats[f"echecs.refresh_moves[{nom}]"] = mesurer(game.refresh_moves)
+        resultats[f"echecs.create_menus[{nom}]"] = mesurer(game.create_menus)
+        piece_type = max(game.moves_index, key=lambda t: len(game.moves_index[t]))
+        game.selected_type = piece_type
+        resultats[f"echecs.create_menus[{nom}, type choisi]"] = mesurer(game.create_menus)
+        game.selected_square = next(iter(game.moves_index[piece_type]))
+        resultats[f"echecs.create_menus[{nom}, pièce choisie]"] = mesurer(game.create_menus)
+    return resultats
+
+def bench_moteurs(args):
+    # Les vues discord.py demandent une boucle asyncio active
+    resultats = asyncio.run(_bench_moteurs())
+    for nom, resultat in resultats.items():
+        afficher(nom, resultat)
+    return resultats
+
+# Stats : fichiers fictifs de taille croissante
+TAILLES_STATS = [1_000, 10_000, 100_000, 1_000_000]
+RIVAUX_PAR_JOUEUR = 3
+
+def stats_aleatoires(n, seed=0):
+    """Fichier de stats fictif de n joueurs, au format des fichiers JSON."""
+    rng = random.Random(seed)
+    stats = {}
+    for i in range(n):
+        player = dict(main.new_player(), rivals={})
+        player.update(wins=rng.randrange(200), losses=rng.randrange(200), draws=rng.randrange(30),
+                      current_streak=rng.randrange(5), max_streak=rng.randrange(5, 15))
+        for _ in range(RIVAUX_PAR_JOUEUR):
+            oid = str(10**17 + rng.randrange(n))
+            player["rivals"][oid] = {"name": f"joueur{oid[-6:]}", "wins": rng.randrange(9), "losses": rng.randrange(9), "draws": rng.randrange(3)}
+        stats[str(10**17 + i)] = player
+    return stats
+
+def taille_profonde(obj, vus=None):
+    """sys.getsizeof récursif (dicts, listes, chaînes)."""
+    vus = set() if vus is None else vus
+    if id(obj) in vus:
+        return 0
+    vus.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(taille_profonde(k, vus) + taille_profonde(v, vus) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(taille_profonde(v, vus) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(taille_profonde(getattr(obj, slot), vus) for slot in obj.__slots__)
+    return size
+
+def chrono_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def tailles(args, limite=None):
+    return [n for n in TAILLES_STATS if n <= min(args.max_joueurs, limite or args.max_joueurs)]
+
+def stores(stats, n):
+    """Les trois backends chargés avec le même fichier (SQLite limité à 100k joueurs : l'import est long)."""
+    journal = main.MatchJournal(os.path.join(os.getcwd(), "bench.jsonl"))
+    for nom, cls in (("json", main.JsonStatsStore), ("columns", main.ColumnarStatsStore), ("sqlite", main.SqliteStatsStore)):
+        if nom == "sqlite":
+            if n > 100_000:
+                continue
+            store = cls(journal, f"bench-{n}.sqlite3", flush_delay=3600)
+        else:
+            store = cls(journal, flush_delay=3600)
+        store.replace(main.FILE_P4, stats)
+        yield nom, store
+        store._cancel_flush()
+        if nom == "sqlite":
+            store.db.close()
+
+def dans_un_dossier_temporaire(fn):
+    """Lance fn dans un dossier jetable : les fichiers de stats et le journal du bot ne sont pas touchés."""
+    depart = os.getcwd()
+    ancien_store, ancien_journal = main.STATS, main.JOURNAL
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        main.JOURNAL = main.MatchJournal(os.path.join(dossier, "matches.jsonl"))
+        try:
+            return fn()
+        finally:
+            main.STATS, main.JOURNAL = ancien_store, ancien_journal
+            os.chdir(depart)
+
+def bench_stats(args):
+    """Enregistrement d'un résultat (update_score, record_match) et compaction selon la taille du fichier."""
+    def run():
+        resultats = {}
+        for n in tailles(args, 100_000):
+            stats = stats_aleatoires(n)
+            uids = list(stats)
+            joueurs = [Joueur(int(uid), f"j{uid[-4:]}") for uid in uids[:1000]]
+            rng = random.Random(n)
+            for nom, store in stores(stats, n):
+                main.STATS = store
+                store.top_score(main.FILE_P4, 10) # Classements déjà construits, comme en production
+                mesures = {
+                    f"update_score[{nom}, {n}]": mesurer(
+                        lambda: main.update_score(rng.choice(uids), rng.choice(('win', 'loss', 'draw')), main.FILE_P4)),
+                    f"record_match[{nom}, {n}]": mesurer(
+                        lambda: main.record_match(main.FILE_P4, *rng.sample(joueurs, 2), 'win')),
+                }
+                start = time.perf_counter()
+                store.flush()
+                mesures[f"flush[{nom}, {n}]"] = {"temps_ms": round((time.perf_counter() - start) * 1000, 2)}
+                for nom_mesure, resultat in mesures.items():
+                    afficher(nom_mesure, resultat)
+                resultats.update(mesures)
+            del stats
+        return resultats
+    return dans_un_dossier_temporaire(run)
+
+def bench_classements(args):
+    """Les lectures de /classement_score, /classement_winrate et /profil sur chaque backend."""
+    def run():
+        resultats = {}
+        f = main.FILE_P4
+        for n in tailles(args):
+            stats = stats_aleatoires(n)
+            uids = list(stats)
+            rng = random.Random(n)
+            for nom, store in stores(stats, n):
+                start = time.perf_counter()
+                store.top_score(f, 10) # Construit l'index du backend JSON
+                mesures = {f"premier classement[{nom}, {n}]": {"temps_ms": round((time.perf_counter() - start) * 1000, 2)}}
+
+                def profil():
+                    uid = rng.choice(uids)
+                    store.rank_score(f, uid)
+                    if main.total_parties(store.player(f, uid)) >= main.MIN_PARTIES_WINRATE:
+                        store.rank_winrate(f, uid)
+                    store.rivals(f, uid, 1)
+                for commande, fn in (("classement", lambda: store.top_score(f, 10)),
+                                     ("classement_pro", lambda: store.top_winrate(f, 10, main.MIN_PARTIES_WINRATE)),
+                                     ("profil", profil)):
+                    mesures[f"{commande}[{nom}, {n}]"] = mesurer(fn, duree=0.3, min_echantillons=5)
+                for nom_mesure, resultat in mesures.items():
+                    afficher(nom_mesure, resultat)
+                resultats.update(mesures)
+            del stats
+        return resultats
+    return dans_un_dossier_temporaire(run)
+
+def mesure_colonnes(n):
+    """Une taille de bench_stats_colonnes : tout ce qu'elle construit est libéré au retour."""
+    stats = stats_aleatoires(n)
+    memoire_dict = taille_profonde(stats)
+    colonnes = main.StatsColumns.from_dict(stats)
+    duels = main.HeadToHead.from_rivals(stats)
+    memoire_col = sum(col.nbytes for col in colonnes.cols.values()) + taille_profonde((colonnes.ids, colonnes.rows, duels.__dict__))
+
+    # /classement et /classement_pro : top 10 par points puis par winrate
+    def parcours():
+        heapq.nlargest(10, stats.items(), key=main.calcul_performance)
+        eligibles = (item for item in stats.items() if main.total_parties(item[1]) >= main.MIN_PARTIES_WINRATE)
+        heapq.nlargest(10, eligibles, key=main.calcul_winrate)
+    index = main.RankIndex(stats)
+    def par_index():
+        index.top_score(10)
+        index.top_winrate(10)
+    def par_colonnes():
+        colonnes.top_score(10)
+        colonnes.top_winrate(10, main.MIN_PARTIES_WINRATE)
+
+    return {
+        "memoire_dict_mo": round(memoire_dict / 2**20, 1), "memoire_colonnes_mo": round(memoire_col / 2**20, 1),
+        "parcours_dict_ms": round(chrono_ms(parcours, 3), 3), "index_dict_ms": round(chrono_ms(par_index), 4),
+        "colonnes_ms": round(chrono_ms(par_colonnes), 3),
+    }
+
+def bench_stats_colonnes(args):
+    """Mémoire et classements : représentation dict contre colonnes NumPy (+ index des duels)."""
+    resultats = {}
+    print(f"{'Joueurs':>9} {'mém. dict':>10} {'mém. col.':>10} {'dict (parcours)':>16} {'dict (index)':>13} {'colonnes':>9}")
+    for n in tailles(args):
+        resultats[str(n)] = mesure = mesure_colonnes(n)
+        print(f"{n:>9} {mesure['memoire_dict_mo']:>8.0f}Mo {mesure['memoire_colonnes_mo']:>8.0f}Mo "
+              f"{mesure['parcours_dict_ms']:>14.1f}ms {mesure['index_dict_ms']:>11.3f}ms {mesure['colonnes_ms']:>7.1f}ms")
+    return resultats
+
+def bench_elo(args):
+    """Cotes Elo : rejeu complet de l'historique (--rebuild-elo), une partie et un rang avec le classement construit."""
+    resultats = {}
+    for n_joueurs, n_parties in ((1_000, 100_000), (100_000, 1_000_000)):
+        if n_joueurs > args.max_joueurs:
+            continue
+        rng = random.Random(n_joueurs)
+        ids = [str(10**17 + i) for i in range(n_joueurs)]
+        parties = [(rng.choice(ids), rng.choice(ids), rng.choice((1.0, 0.5))) for _ in range(n_parties)]
+        book = main.RatingBook()
+        def rejouer():
+            book.ratings[main.FILE_P4] = {}
+            book.indexes = {}
+            for a, b, score in parties:
+                if a != b:
+                    book._apply(main.FILE_P4, a, b, score)
+        mesures = {f"rejeu[{n_joueurs}, {n_parties}]": {"temps_ms": round(chrono_ms(rejouer, 1), 1)}}
+        book.top(main.FILE_P4, 10) # Classement déjà construit, comme en production
+        classes = [uid for _, uid in book.index(main.FILE_P4).head(len(ids))] or ids
+        mesures[f"partie[{n_joueurs}]"] = mesurer(lambda: book.update(main.FILE_P4, *rng.sample(ids, 2), 'win'))
+        mesures[f"rang[{n_joueurs}]"] = mesurer(lambda: book.rank(main.FILE_P4, rng.choice(classes)))
+        for nom_mesure, resultat in mesures.items():
+            afficher(nom_mesure, resultat)
+        resultats.update(mesures)
+    return resultats
+
+SECTIONS = {
+    "moteurs": bench_moteurs,
+    "stats": bench_stats,
+    "classements": bench_classements,
+    "stats_colonnes": bench_stats_colonnes,
+    "elo": bench_elo,
+    "p4_ia": bench_p4_ia,
+}
+
+def comparer(anciens, nouveaux, tolerance=TOLERANCE_REGRESSION):
+    """Mesures (en ops/s) plus lentes que l'exécution précédente au-delà de la tolérance."""
+    regressions = []
+    for section, mesures in nouveaux.items():
+        for nom, mesure in mesures.items():
+            ancienne = anciens.get(section, {}).get(nom)
+            if not ancienne or "ops_s" not in mesure or "ops_s" not in ancienne:
+                continue
+            ratio = mesure["ops_s"] / ancienne["ops_s"]
+            if ratio < 1 - tolerance:
+                regressions.append((section, nom, ratio))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks du bot (sans Discord)")
+    parser.add_argument("sections", nargs="*", help=f"sections à lancer parmi {', '.join(SECTIONS)} (toutes par défaut)")
+    parser.add_argument("--json", help="fichier de résultats (bench-<date>.json par défaut)")
+    parser.add_argument("--compare", help="résultats d'une exécution précédente à comparer")
+    parser.add_argument("--max-joueurs", type=int, default=1_000_000, help="taille maximale des fichiers de stats fictifs")
+    args = parser.parse_args()
+    inconnues = [name for name in args.sections if name not in SECTIONS]
+    if inconnues:
+        parser.error(f"section(s) inconnue(s) : {', '.join(inconnues)}")
+
+    resultats = {}
+    for name in args.sections or SECTIONS:
+        print(f"=== {name} ===")
+        resultats[name] = SECTIONS[name](args)
+
+    sortie = args.json or time.strftime("bench-%Y%m%d-%H%M%S.json")
+    with open(sortie, "w") as f:
+        json.dump({"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "machine": platform.machine(), "sections": resultats}, f, indent=2, ensure_ascii=False)
+    print(f"Résultats écrits dans {sortie}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            anciens = json.load(f)["sections"]
+        regressions = comparer(anciens, resultats)
+        for section, nom, ratio in regressions:
+            print(f"RÉGRESSION {section} / {nom} : {ratio:.0%} de la vitesse précédente")
+        if regressions:
+            sys.exit(1)
+        print("Aucune régression.")
@@ -1,1377 +1,4406 @@
-import discord
-import random
-from discord.ext import commands
-from discord import app_commands
-import json
-import os
-import chess
-from discord.ext import tasks
-
-from flask import Flask
-from threading import Thread
-
-app = Flask('')
-
-@app.route('/')
-def home():
-    return "Bot is alive!"
-
-def run():
-    app.run(host='0.0.0.0', port=8080)
-
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
-
-###########################################################################################################
-# Définition des noms de fichiers
-FILE_MORPION = "morpion_scores.json"
-FILE_P4 = "puissance4_stats.json"
-FILE_CHESS = "chess_stats.json"
-
-def get_stats(filename):
-    """Charge les données d'un fichier spécifique."""
-    if not os.path.exists(filename):
-        return {}
-    try:
-        with open(filename, "r") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return {}
-
-def save_stats(filename, stats):
-    """Sauvegarde dans un fichier spécifique."""
-    with open(filename, "w") as f:
-        json.dump(stats, f, indent=4)
-
-def update_score(user_id, opponent_id, opponent_name, result, filename):
-    stats = get_stats(filename)
-    uid = str(user_id)
-    oid = str(opponent_id)
-
-    # Initialisation du joueur si nouveau
-    if uid not in stats:
-        stats[uid] = {"wins": 0, "losses": 0, "draws": 0, "current_streak": 0, "max_streak": 0, "rivals": {}}
-    
-    player = stats[uid]
-
-    # Initialisation du rival si nouveau duel
-    if oid not in player["rivals"]:
-        player["rivals"][oid] = {"name": opponent_name, "wins": 0, "losses": 0, "draws": 0}
-
-    # Mise à jour des stats globales et duels
-    if result == 'win':
-        player["wins"] += 1
-        player["rivals"][oid]["wins"] += 1
-        player["current_streak"] += 1
-        # Record de la plus longue série
-        if player["current_streak"] > player["max_streak"]:
-            player["max_streak"] = player["current_streak"]
-            
-    elif result == 'loss':
-        player["losses"] += 1
-        player["rivals"][oid]["losses"] += 1
-        player["current_streak"] = 0 # La série s'arrête
-        
-    elif result == 'draw':
-        player["draws"] += 1
-        player["rivals"][oid]["draws"] += 1
-        # Optionnel : un nul casse-t-il la série ? Ici on décide que non, elle stagne.
-
-    save_stats(filename, stats)
-
-###################################################################################################""
-# --- CLOSE TICKET VIEW ---
-class CloseTicketView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=None)
-
-    @discord.ui.button(label="Fermer le ticket", style=discord.ButtonStyle.danger, custom_id="close_ticket")
-    async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if isinstance(interaction.channel, discord.Thread):
-            await interaction.response.send_message("Le ticket va être archivé...")
-            # Locking prevents further messages, archiving hides it.
-            await interaction.channel.edit(archived=True, locked=True)
-        else:
-            await interaction.response.send_message("Cette commande ne peut être utilisée que dans un fil.", ephemeral=True)
-
-# --- OPEN TICKET VIEW ---
-class TicketView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=None)
-
-    @discord.ui.button(label="Ouvrir un Ticket", style=discord.ButtonStyle.success, custom_id="open_ticket_thread")
-    async def open_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not isinstance(interaction.channel, discord.TextChannel):
-            return await interaction.response.send_message("Impossible de créer un fil ici.", ephemeral=True)
-
-        try:
-            # NOTE: Private threads require Community enabled or certain Boost levels.
-            # Using public_thread is a safer fallback if private fails.
-            thread = await interaction.channel.create_thread(
-                name=f"ticket-{interaction.user.name}",
-                type=discord.ChannelType.private_thread, 
-                auto_archive_duration=1440,
-                reason=f"Ticket ouvert par {interaction.user.display_name}"
-            )
-
-            await thread.add_user(interaction.user)
-            await interaction.response.send_message(f"Ton ticket a été créé : {thread.mention}", ephemeral=True)
-            
-            embed = discord.Embed(
-                title="Support",
-                description=f"Bonjour {interaction.user.mention} !\nPosez votre question ici. Un membre du staff vous répondra dès que possible.",
-                color=discord.Color.green()
-            )
-            await thread.send(embed=embed, view=CloseTicketView())
-
-        except discord.Forbidden:
-            await interaction.response.send_message("Le bot n'a pas la permission 'Gérer les fils' ou 'Fils privés' !", ephemeral=True)
-        except discord.HTTPException as e:
-            await interaction.response.send_message(f"Erreur : Les fils privés nécessitent peut-être un niveau de boost plus élevé. {e}", ephemeral=True)
-
-# --- BOT CONFIGURATION ---
-class MyBot(commands.Bot):
-    def __init__(self):
-        intents = discord.Intents.default()
-        intents.message_content = True
-        super().__init__(command_prefix="!", intents=intents)
-
-    async def setup_hook(self):
-        # Persistence ensures buttons work after bot restart
-        self.add_view(TicketView())
-        self.add_view(CloseTicketView())
-
-bot = MyBot()
-
-@bot.event
-async def on_ready():
-    await bot.tree.sync()
-    print(f"Bot opérationnel : {bot.user}")
-
-# --- COMMANDS ---
-@bot.tree.command(name="setup_ticket", description="Installe le système de ticket")
-@app_commands.checks.has_permissions(manage_threads=True)
-async def setup_ticket(interaction: discord.Interaction):
-    await interaction.response.defer()
-    embed = discord.Embed(
-        title="Centre d'assistance",
-        description="Besoin d'aide ? Cliquez sur le bouton ci-dessous pour ouvrir un ticket privé.",
-        color=discord.Color.blue()
-    )
-    await interaction.followup.send(embed=embed, view=TicketView())
-
-@bot.tree.command(name="dice_roll", description="Lance un dé")
-async def dice_roll(interaction: discord.Interaction, nombre_de_faces: int = 6):
-    await interaction.response.defer()
-    result = random.randint(1, nombre_de_faces) # Corrected reference
-    embed = discord.Embed(
-        title="🎲 Lancer de dé",
-        description=f"Le résultat est : **{result}**",
-        color=discord.Color.purple()
-    )
-    await interaction.followup.send(embed=embed) # Removed TicketView here
-
-@bot.tree.command(name="ban_pseudo", description="Bannir quelqu'un du serveur avec son pseudo")
-@app_commands.checks.has_permissions(ban_members=True)
-async def banguy(interaction: discord.Interaction, member: discord.Member, reason: str):
-    await interaction.response.defer(ephemeral=True)
-    await member.ban()
-    await interaction.followup.send(f"Vous avez banni {member} avec succès")
-    await member.send(f"Vous avez été banni du serveur pour la raison : {reason}")
-
-@bot.tree.command(name="unban_pseudo", description="Débannir un utilisateur via son pseudo")
-@app_commands.checks.has_permissions(ban_members=True)
-async def unban_pseudo(interaction: discord.Interaction, name: str):
-    await interaction.response.defer(ephemeral=True)
-    # 1. Récupérer la liste des bannissements (c'est une liste d'objets BanEntry)
-    bans = [entry async for entry in interaction.guild.bans()]
-    
-    # 2. Chercher l'utilisateur dans la liste
-    user_to_unban = None
-    for ban_entry in bans:
-        user = ban_entry.user
-        # On compare avec le pseudo actuel (ex: "loup") 
-        # ou l'ancien format (ex: "Loup#1234")
-        if user.name.lower() == name.lower() or str(user).lower() == name.lower():
-            user_to_unban = user
-            break
-
-    # 3. Agir en fonction du résultat
-    if user_to_unban:
-        await interaction.guild.unban(user_to_unban)
-        channel = interaction.channel
-        reinvite = await channel.create_invite(
-            max_age=0, 
-            max_uses= 1,
-            unique=True
-        )
-        await user_to_unban.send(f"Vous avez été débanni, pour revenir sur le serveur utilisez ce lien : {reinvite.url}")
-        await interaction.followup.send(f"✅ **{user_to_unban.name}** a été débanni.", ephemeral=True)
-    else:
-        await interaction.followup.send(f"❌ Impossible de trouver **{name}** dans la liste des bannis.")
-
-@bot.tree.command(name="ban_numéro_de_compte", description="Bannir quelqu'un du serveur via son ID")
-@app_commands.checks.has_permissions(ban_members=True)
-async def banguy(interaction: discord.Interaction, user_id: str, reason: str):
-    await interaction.response.defer(ephemeral=True)
-    try:
-        # 1. On récupère l'utilisateur via son ID (même s'il n'est pas sur le serveur)
-        user = await bot.fetch_user(int(user_id))
-        
-        # 2. On tente d'envoyer un DM AVANT le ban
-        try:
-            await user.send(f"Vous avez été banni du serveur pour la raison : {reason}")
-        except:
-            # Si l'utilisateur a fermé ses MPs, on ignore l'erreur pour continuer le ban
-            pass
-
-        # 3. On bannit l'utilisateur du serveur (guild)
-        await interaction.guild.ban(user, reason=reason)
-        
-        # 4. Confirmation à l'admin
-        await interaction.followup.send(f"✅ {user.name} (ID: {user_id}) a été banni avec succès.")
-
-    except ValueError:
-        await interaction.followup.send("❌ L'ID fourni n'est pas valide (doit être des chiffres).")
-    except Exception as e:
-        await interaction.followup.send(f"❌ Une erreur est survenue : {e}")
-
-@bot.tree.command(name="unban_id", description="Débannir un utilisateur via son ID")
-@app_commands.checks.has_permissions(ban_members=True)
-async def unban_id(interaction: discord.Interaction, user_id: str):
-    await interaction.response.defer(ephemeral=True)
-    try:
-        # 1. Convertir l'ID et récupérer l'utilisateur
-        # Il faut bien mettre (await ...), et on ne met pas .lower ici
-        user = await bot.fetch_user(int(user_id))
-        
-        # 2. Débannir directement (Discord comprend l'objet User ou l'ID)
-        await interaction.guild.unban(user)
-
-        # 3. Créer l'invitation
-        reinvite = await interaction.channel.create_invite(
-            max_age=0, 
-            max_uses=1, 
-            unique=True
-        )
-
-        # 4. Tenter d'envoyer le MP
-        try:
-            await user.send(f"Vous avez été débanni ! Voici votre lien de retour : {reinvite.url}")
-        except:
-            pass # L'utilisateur a peut-être bloqué ses MPs
-
-        await interaction.followup.send(f"✅ **{user.name}** a été débanni.", ephemeral=True)
-
-    except ValueError:
-        await interaction.followup.send("❌ L'ID fourni n'est pas un nombre valide.", ephemeral=True)
-    except discord.NotFound:
-        await interaction.followup.send("❌ Cet utilisateur n'est pas dans la liste des bannis.", ephemeral=True)
-    except Exception as e:
-        await interaction.followup.send(f"❌ Erreur : {e}", ephemeral=True)
-
-################################################################################################################
-
-class CoinFlipView(discord.ui.View):
-    def __init__(self):
-        super().__init__(timeout=60) # Le jeu s'arrête après 60s d'inactivité
-
-    @discord.ui.button(label="Pile", style=discord.ButtonStyle.primary)
-    async def pile(self, interaction: discord.Interaction, button: discord.ui.Button):
-        resultat = random.choice(["Pile", "Face"])
-        if resultat == "Pile":
-            await interaction.response.send_message("Gagné ! C'était Pile.")
-        else:
-            await interaction.response.send_message("Perdu ! C'était Face.")
-        self.stop() # Arrête d'écouter les boutons après le jeu
-
-    @discord.ui.button(label="Face", style=discord.ButtonStyle.secondary)
-    async def face(self, interaction: discord.Interaction, button: discord.ui.Button):
-        resultat = random.choice(["Pile", "Face"])
-        if resultat == "Face":
-            await interaction.response.send_message("Gagné ! C'était Face.")
-        else:
-            await interaction.response.send_message("Perdu ! C'était Pile.")
-        self.stop()
-
-@bot.tree.command(name="pile_ou_face", description="Lance une pièce !")
-async def flip(interaction: discord.Interaction):
-    view = CoinFlipView()
-    await interaction.response.send_message("Choisissez votre camp :", view=view)
-
-#############################################################################################################
-
-import discord
-from discord import app_commands
-from discord.ext import commands
-
-# On crée une classe pour le Bouton (la case du morpion)
-class CaseButton(discord.ui.Button):
-    def __init__(self, x, y):
-        # On initialise le bouton (gris par défaut, vide)
-        super().__init__(style=discord.ButtonStyle.secondary, label="\u200b", row=y)
-        self.x = x
-        self.y = y
-
-    async def callback(self, interaction: discord.Interaction):
-        # Cette fonction remplace ta fonction 'pion(y,x)'
-        view: MorpionGame = self.view
-        
-        # Vérification du joueur (C'est le tour de qui ?)
-        joueur_actuel = view.player1 if view.turn == 1 else view.player2
-        if interaction.user != joueur_actuel:
-            return await interaction.response.send_message("Ce n'est pas votre tour !", ephemeral=True)
-
-        # Logique de jeu (équivalent à ton code 'if not morpion[y][x]')
-        if view.board[self.y][self.x] == 0:
-            view.board[self.y][self.x] = view.turn
-            
-            # Mise à jour visuelle du bouton
-            if view.turn == 1:
-                self.label = "X"
-                self.style = discord.ButtonStyle.danger # Rouge
-            else:
-                self.label = "O"
-                self.style = discord.ButtonStyle.success # Vert
-            
-            self.disabled = True # On désactive le bouton cliqué
-
-            # Vérification Victoire (appel de ta logique adaptée)
-            if view.check_victory():
-                # On désactive le plateau
-                for child in view.children: 
-                    child.disabled = True
-                
-                # Le gagnant est 'joueur_actuel'
-                winner = joueur_actuel
-                # Le perdant est l'autre
-                loser = view.player2 if winner == view.player1 else view.player1
-
-                # ON SAUVEGARDE LES SCORES
-                # Victoire
-                # Dans le cas où Player1 gagne contre Player2 :
-                update_score(winner.id, loser.id, loser.name, 'win', FILE_MORPION)
-                update_score(loser.id, winner.id, winner.name, 'loss', FILE_MORPION)
-
-                await interaction.response.edit_message(content=f"🏆 **Victoire de {winner.mention} !**", view=view)
-                view.stop()
-
-            # --- MODIFICATION ICI : Vérification Match Nul ---
-            elif view.check_draw():
-                # ON SAUVEGARDE LES NULS POUR LES DEUX
-                # Match Nul
-                # Dans le cas où Player1 gagne contre Player2 :
-                # Le joueur 1 fait nul contre le joueur 2
-                update_score(view.player1.id, view.player2.id, view.player2.name, 'draw', FILE_MORPION)
-
-                # Le joueur 2 fait nul contre le joueur 1
-                update_score(view.player2.id, view.player1.id, view.player1.name, 'draw', FILE_MORPION)
-
-                await interaction.response.edit_message(content="🤝 **Match Nul !** Personne n'a gagné.", view=view)
-                view.stop()
-            
-            # --- Sinon, on continue ---
-            else:
-                view.turn = 2 if view.turn == 1 else 1
-                next_player = view.player2 if view.turn == 2 else view.player1
-                await interaction.response.edit_message(content=f"C'est au tour de {next_player.mention} ({'O' if view.turn == 2 else 'X'})", view=view)
-
-# On crée la Vue (l'interface globale qui remplace ta fenêtre Tkinter)
-class MorpionGame(discord.ui.View):
-    def __init__(self, p1, p2):
-        super().__init__(timeout=180)
-        # On mélange les joueurs dans une liste
-        joueurs = [p1, p2]
-        random.shuffle(joueurs) 
-        # Le premier de la liste sera le Joueur 1 (X) et commencera
-        self.player1 = joueurs[0] # Il aura les X
-        self.player2 = joueurs[1] # Il aura les O
-        
-        self.current_player = self.player1
-        self.turn = 1 # 1 commence toujours (X)
-        # Ta grille morpion (stockée dans l'objet, pas en global)
-        self.board = [
-            [0, 0, 0],
-            [0, 0, 0],
-            [0, 0, 0]
-        ]
-
-        # Création des 9 boutons (comme tes a, aa, aaa...)
-        for y in range(3):
-            for x in range(3):
-                self.add_item(CaseButton(x, y))
-
-    # Ta fonction verify_victory adaptée
-    def check_victory(self):
-        # Vérifie pour le joueur 1 puis le 2
-        for i in range(1, 3):
-            # Lignes
-            for row in range(3):
-                if self.board[row][0] == i and self.board[row][1] == i and self.board[row][2] == i:
-                    return True
-            # Colonnes
-            for col in range(3):
-                if self.board[0][col] == i and self.board[1][col] == i and self.board[2][col] == i:
-                    return True
-            # Diagonales
-            if self.board[0][0] == i and self.board[1][1] == i and self.board[2][2] == i:
-                return True
-            if self.board[0][2] == i and self.board[1][1] == i and self.board[2][0] == i:
-                return True
-        return False
-
-    # Ta fonction verify_nulle adaptée
-    def check_draw(self):
-        for row in self.board:
-            for cell in row:
-                if cell == 0:
-                    return False
-        return True
-
-# La commande pour lancer le jeu
-@bot.tree.command(name="morpion_start", description="Lancer un morpion avec l'adversaire de ton choix !")
-async def morpion_start(interaction: discord.Interaction, adversaire: discord.Member):
-    await interaction.response.defer()
-    if adversaire.bot or adversaire == interaction.user:
-        return await interaction.followup.send("Adversaire invalide.")
-    
-    # On crée la vue
-    game_view = MorpionGame(interaction.user, adversaire)
-    
-    # On annonce qui commence grâce à la variable définie dans le __init__
-    await interaction.followup.send(
-        f"**Morpion** : {interaction.user.mention} vs {adversaire.mention}\n"
-        f"**{game_view.current_player.mention}** commence !", 
-        view=game_view
-    )
-
-######################################################################################################
-# On définit une fonction de tri qui calcule les "points" (1 pour win, 0.5 pour nul)
-def calcul_performance(item):
-    data = item[1]
-    # Formule : Victoires + (Nuls * 0.5)
-    return data['wins'] + (data['draws'] * 0.5)
-
-@bot.tree.command(name="classement_score", description="Affiche le tableau des scores d'un jeu")
-@app_commands.choices(jeu=[
-    app_commands.Choice(name="Echecs", value=3),
-    app_commands.Choice(name="Puissance 4", value=2),
-    app_commands.Choice(name="Morpion", value=1),
-])
-async def classement(interaction: discord.Interaction,jeu: app_commands.Choice[int]):
-    await interaction.response.defer()
-    if jeu.value == 1:
-        stats = get_stats("morpion_scores.json")
-        titre_de_embed = "Morpion"
-    elif jeu.value == 2:
-        stats = get_stats("puissance4_stats.json")
-        titre_de_embed = "Puissance 4"
-    elif jeu.value == 3:
-        stats = get_stats("chess_stats.json")
-        titre_de_embed = "Echecs"
-    else : 
-        return await interaction.followup.send("Ce jeu n'existe pas")
-    if not stats:
-        return await interaction.followup.send("Aucune partie n'a encore été jouée !")
-
-    # Création de l'Embed (Jolie boîte d'affichage)
-    embed = discord.Embed(title=f"🏆 Tableau des Scores - {titre_de_embed}", color=discord.Color.gold())
-    
-    # On trie les joueurs par nombre de victoires (décroissant)
-    # item[1]['wins'] signifie : regarde la valeur 'wins' dans les données du joueur
-    sorted_players = sorted(stats.items(), key=calcul_performance, reverse=True)
-    classement_text = ""
-    for index, (user_id, data) in enumerate(sorted_players[:10]): # Top 10 seulement
-        wins = data['wins']
-        losses = data['losses']
-        draws = data['draws']
-        total_games = wins + losses + draws
-
-        # Calcul du pourcentage (éviter la division par zéro)
-        # --- CALCUL AJUSTÉ ---
-        # On calcule les "points" : 1 par victoire, 0.5 par nul
-        points = wins + (draws * 0.5)
-        
-        if total_games > 0:
-            # Le winrate prend maintenant en compte les nuls à 50%
-            win_rate = (points / total_games) * 100
-        else:
-            win_rate = 0
-        # ---------------------
-        
-        # On essaie de récupérer le nom, sinon on met l'ID
-        """
-        user = interaction.guild.get_member(int(user_id))
-        nom = user.name if user else f"Utilisateur {user_id}"
-        """
-        # À l'intérieur de ta boucle for dans la commande classement :
-
-        # 1. On tente de récupérer dans le cache (très rapide, pas de requête)
-        user = interaction.guild.get_member(int(user_id))
-
-        if user:
-            nom = user.name
-        else:
-            # 2. Si pas dans le cache, on tente une seule fois l'API
-            try:
-                user = await bot.fetch_user(int(user_id))
-                nom = user.name
-            except:
-                # 3. Si l'ID est invalide ou l'utilisateur introuvable
-                nom = f"Utilisateur inconnu ({user_id})"
-        # Médailles pour le top 3
-        medaille = "🥇" if index == 0 else "🥈" if index == 1 else "🥉" if index == 2 else f"#{index+1}"
-
-        classement_text += (
-            f"**{medaille} {nom}**\n"
-            f"└─ Victoires: {wins} | Défaites: {losses} | Nuls: {draws}\n"
-            f"└─ Winrate: **{win_rate:.1f}%**\n"
-            f"└─ Score: **{points} points**\n\n"
-        )
-
-    embed.description = classement_text
-    await interaction.followup.send(embed=embed)
-
-@bot.tree.command(name="classement_winrate", description="Classement par pourcentage de victoire d'un jeu (min. 10 parties)")
-@app_commands.choices(jeu=[
-    app_commands.Choice(name="Echecs", value=3),
-    app_commands.Choice(name="Puissance 4", value=2),
-    app_commands.Choice(name="Morpion", value=1),
-])
-async def classement_pro(interaction: discord.Interaction, jeu: app_commands.Choice[int]):
-    await interaction.response.defer()
-    # 1. Sélection du fichier
-    if jeu.value == 1:
-        stats = get_stats("morpion_scores.json")
-        titre_de_embed = "Morpion"
-    elif jeu.value == 2:
-        stats = get_stats("puissance4_stats.json")
-        titre_de_embed = "Puissance 4"
-    elif jeu.value == 3:
-        stats = get_stats("chess_stats.json")
-        titre_de_embed = "Echecs"
-    else : 
-        return await interaction.followup.send("Ce jeu n'existe pas")
-
-    if not stats:
-        return await interaction.followup.send("Aucune donnée enregistrée.")
-
-    # 2. FILTRAGE : On ne garde que ceux qui ont AU MOINS 10 parties
-    # Cela évite qu'un joueur avec 1 victoire et 0 défaite (100%) ne vole la 1ère place
-    filtered_stats = [
-        (user_id, data) for user_id, data in stats.items() 
-        if (data['wins'] + data['losses'] + data['draws']) >= 10
-    ]
-
-    if not filtered_stats:
-        return await interaction.followup.send("Aucun joueur n'a encore atteint les 10 parties requises pour figurer ici.")
-
-    # 3. Fonction de tri
-    def calculate_sort_metrics(item):
-        data = item[1]
-        wins = data['wins']
-        draws = data['draws']
-        total = wins + data['losses'] + draws
-        winrate = ((wins + (draws * 0.5)) / total) if total > 0 else 0
-        return (winrate, wins)
-
-    # 4. Tri des joueurs filtrés
-    sorted_players = sorted(filtered_stats, key=calculate_sort_metrics, reverse=True)
-
-    embed = discord.Embed(
-        title=f"🏆 Top Winrate - {titre_de_embed}", 
-        description="*Seuls les joueurs avec au moins 10 parties sont affichés.*\n\n",
-        color=discord.Color.purple()
-    )
-    
-    description_text = ""
-    for index, (user_id, data) in enumerate(sorted_players[:10]):
-        wins = data['wins']
-        draws = data['draws']
-        total = wins + data['losses'] + draws
-        winrate = ((wins + (draws * 0.5)) / total * 100)
-        
-        try:
-            user = await bot.fetch_user(int(user_id))
-            nom = user.name
-        except:
-            nom = f"Joueur {user_id}"
-
-        medaille = "🥇" if index == 0 else "🥈" if index == 1 else "🥉" if index == 2 else f"#{index+1}"
-        
-        description_text += (
-            f"**{medaille} {nom}**\n"
-            f"└─ **{winrate:.1f}%** de réussite ({wins} victoires et {draws} nulles sur {total} matchs)\n\n"
-        )
-
-    embed.description += description_text
-    await interaction.followup.send(embed=embed)
-
-def get_title(wins, total):
-    if total == 0: return "Nouveau venu"
-    if wins >= 100: return "👑 Légende du Morpion"
-    if wins >= 50: return "🔥 Grand Maître"
-    if wins >= 20 : return "⚔️ Guerrier"
-    if total >= 10: return "🛡️ Apprenti"
-    return "🌱 Novice"
-
-@bot.tree.command(name="profil", description="Profil d'une personne pour un jeu")
-@app_commands.choices(jeu=[
-    app_commands.Choice(name="Echecs", value=3),
-    app_commands.Choice(name="Puissance 4", value=2),
-    app_commands.Choice(name="Morpion", value=1),
-])
-async def profil(interaction: discord.Interaction, jeu: app_commands.Choice[int], membre: discord.Member = None):
-    await interaction.response.defer()
-    user = membre or interaction.user
-    if jeu.value == 1:
-        stats = get_stats("morpion_scores.json")
-        titre_de_embed = "Morpion"
-    elif jeu.value == 2:
-        stats = get_stats("puissance4_stats.json")
-        titre_de_embed = "Puissance 4"
-    elif jeu.value == 3:
-        stats = get_stats("chess_stats.json")
-        titre_de_embed = "Echecs"
-    else : 
-        return await interaction.followup.send("Ce jeu n'existe pas")
-    uid = str(user.id)
-
-    if uid not in stats:
-        return await interaction.followup.send("Ce joueur n'a pas encore de statistiques.")
-
-    data = stats[uid]
-    wins, losses, draws = data['wins'], data['losses'], data['draws']
-    total = wins + losses + draws
-    
-    # --- CALCUL DES CLASSEMENTS ---
-    
-    # 1. Classement par SCORE (Points : Win=1, Draw=0.5)
-    sorted_by_score = sorted(
-        stats.items(), 
-        key=lambda x: x[1]['wins'] + (x[1]['draws'] * 0.5), 
-        reverse=True
-    )
-    rank_score = next(i for i, (id, _) in enumerate(sorted_by_score) if id == uid) + 1
-
-    # 2. Classement par WINRATE (Qualité de jeu)
-    # On ne compte que ceux qui ont joué au moins 3 parties pour éviter les 100% chanceux
-    sorted_by_rate = sorted(
-        stats.items(), 
-        key=lambda x: ((x[1]['wins'] + (x[1]['draws'] * 0.5)) / (x[1]['wins'] + x[1]['losses'] + x[1]['draws'])) if (x[1]['wins'] + x[1]['losses'] + x[1]['draws']) > 0 else 0, 
-        reverse=True
-    )
-    rank_rate = next(i for i, (id, _) in enumerate(sorted_by_rate) if id == uid) + 1
-
-    # --- PRÉPARATION DE L'EMBED ---
-    winrate_val = ((wins + (draws * 0.5)) / total * 100) if total > 0 else 0
-    titre = get_title(wins, total)
-
-    embed = discord.Embed(
-        title=f"Profil de {user.name}", 
-        description=f"**Titre :** `{titre}`", 
-        color=discord.Color.gold()
-    )
-    embed.set_thumbnail(url=user.display_avatar.url)
-
-    # Section Stats
-    embed.add_field(
-        name="📊 Statistiques", 
-        value=f"Victoires : **{wins}**\n Défaites : **{losses}**\n Nuls : **{draws}**", 
-        inline=True
-    )
-    if not wins+losses+draws >= 10 :
-        rank_rate = "Non classé"
-        
-    # Section Rangs
-    embed.add_field(
-        name="🏆 Classements", 
-        value=f"Rang Score : **#{rank_score}**\n Rang Winrate : **#{rank_rate}**", 
-        inline=True
-    )
-
-    # Barre de progression visuelle (Optionnel mais stylé)
-    progress = int((winrate_val / 100) * 10)
-    barre = "🟦" * progress + "⬜" * (10 - progress)
-    embed.add_field(name=f"📈 Taux de réussite : {winrate_val:.1f}%", value=barre, inline=False)
-
-    #SYSTEME RAJOUTE (BUg FIX)
-
-    rival_text = "Aucun rival pour le moment."
-    if data["rivals"]:
-        # On trouve le rival avec le plus de matchs totaux contre nous
-        nemesis_id = max(data["rivals"], key=lambda k: data["rivals"][k]["wins"] + data["rivals"][k]["losses"] + data["rivals"][k]["draws"])
-        n_data = data["rivals"][nemesis_id]
-        n_total = n_data["wins"] + n_data["losses"] + n_data["draws"]
-        rival_text = f"**{n_data['name']}** ({n_total} matchs)\n└─ Victoires: {n_data['wins']} | Défaites: {n_data['losses']} | Nulles: {n_data['draws']}"
-
-    # --- Création de l'Embed ---
-
-    embed.add_field(name="🔥 Séries (Streak)", 
-                    value=f"Actuelle : **{data.get('current_streak', 0)}**\nRecord : **{data.get('max_streak', 0)}**", inline=True)
-    
-    embed.add_field(name="⚔️ Plus grand Rival", value=rival_text, inline=False)
-    await interaction.followup.send(embed=embed)
-######################################################################################################
-
-import discord
-from discord import app_commands
-import random
-
-# --- Constantes Visuelles ---
-VIDE = "⚫"
-ROUGE = "🔴" # Joueur 1
-JAUNE = "🟡" # Joueur 2
-COLONNES = 7
-LIGNES = 6
-
-class Connect4Button(discord.ui.Button):
-    def __init__(self, col_index):
-        # On crée un bouton pour chaque colonne (1 à 7)
-        super().__init__(style=discord.ButtonStyle.secondary, label=str(col_index + 1), row=0 if col_index < 4 else 1)
-        self.col = col_index
-
-    async def callback(self, interaction: discord.Interaction):
-        view: Connect4Game = self.view
-        
-        # 1. Vérification du tour
-        joueur_actuel = view.player1 if view.turn == 1 else view.player2
-        if interaction.user != joueur_actuel:
-            return await interaction.response.send_message("Pas touche ! Ce n'est pas ton tour.", ephemeral=True)
-
-        # 2. Placer le jeton (Gravité)
-        ligne_jouee = view.drop_piece(self.col, view.turn)
-        
-        if ligne_jouee == -1:
-            return await interaction.response.send_message("Cette colonne est pleine !", ephemeral=True)
-
-        # 3. Vérifier Victoire / Nul
-        if view.check_winner(view.turn):
-            winner = joueur_actuel
-            loser = view.player2 if winner == view.player1 else view.player1
-            
-            # --- SAUVEGARDE DES SCORES (Ton système JSON) ---
-            try:
-                # Victoire
-                # On met à jour le gagnant (il gagne contre le perdant)
-                update_score(winner.id, loser.id, loser.name, 'win', FILE_P4)
-
-                # On met à jour le perdant (il perd contre le gagnant)
-                update_score(loser.id, winner.id, winner.name, 'loss', FILE_P4)
-            except Exception as e:
-                print(f"Erreur de sauvegarde: {e}")
-
-            view.disable_all()
-            await interaction.response.edit_message(content=f"🏆 **Victoire de {winner.mention} !**\n\n{view.get_board_str()}", view=view)
-            view.stop()
-
-        elif view.is_full():
-            # Match Nul
-            # Le joueur 1 fait nul contre le joueur 2
-            update_score(view.player1.id, view.player2.id, view.player2.name, 'draw', FILE_P4)
-
-            # Le joueur 2 fait nul contre le joueur 1
-            update_score(view.player2.id, view.player1.id, view.player1.name, 'draw', FILE_P4)
-            
-            view.disable_all()
-            await interaction.response.edit_message(content=f"🤝 **Match Nul !** La grille est pleine.\n\n{view.get_board_str()}", view=view)
-            view.stop()
-
-        else:
-            # 4. Tour suivant
-            view.turn = 2 if view.turn == 1 else 1
-            next_player = view.player2 if view.turn == 2 else view.player1
-            pion = JAUNE if view.turn == 2 else ROUGE
-            
-            # Mise à jour visuelle
-            await interaction.response.edit_message(
-                content=f"Au tour de {next_player.mention} ({pion})\n\n{view.get_board_str()}", 
-                view=view
-            )
-
-class Connect4Game(discord.ui.View):
-    def __init__(self, p1, p2):
-        super().__init__(timeout=300) # 5 minutes max sans jouer
-
-        # 1. Tirage au sort immédiat
-        joueurs = [p1, p2]
-        random.shuffle(joueurs)
-        
-        # 2. Attribution des rôles
-        # player1 sera toujours ROUGE et commencera
-        self.player1 = joueurs[0] 
-        self.player2 = joueurs[1]
-        
-        # 3. Initialisation (Le tour 1 correspond à self.player1)
-        self.turn = 1
-
-        # Grille 6 lignes x 7 colonnes remplie de 0
-        self.board = [[0 for _ in range(COLONNES)] for _ in range(LIGNES)]
-
-        # Ajouter les boutons (1 à 7)
-        for i in range(COLONNES):
-            self.add_item(Connect4Button(i))
-
-    def drop_piece(self, col, player):
-        """Fait tomber une pièce dans la colonne. Retourne la ligne ou -1 si plein."""
-        # On parcourt de bas (5) en haut (0)
-        for row in range(LIGNES - 1, -1, -1):
-            if self.board[row][col] == 0:
-                self.board[row][col] = player
-                return row
-        return -1
-
-    def get_board_str(self):
-        """Convertit la matrice en string d'emojis"""
-        display = ""
-        for row in self.board:
-            for cell in row:
-                if cell == 0: display += VIDE
-                elif cell == 1: display += ROUGE
-                elif cell == 2: display += JAUNE
-            display += "\n"
-        # Ajout des numéros en bas
-        display += "1️⃣2️⃣3️⃣4️⃣5️⃣6️⃣7️⃣" 
-        return display
-
-    def disable_all(self):
-        for item in self.children:
-            item.disabled = True
-
-    def is_full(self):
-        # Si la ligne du haut (0) ne contient aucun 0, c'est plein
-        return all(self.board[0][c] != 0 for c in range(COLONNES))
-
-    def check_winner(self, player):
-        # Vérification Horizontale, Verticale et Diagonales
-        # 1. Horizontal
-        for c in range(COLONNES - 3):
-            for r in range(LIGNES):
-                if self.board[r][c] == player and self.board[r][c+1] == player and self.board[r][c+2] == player and self.board[r][c+3] == player:
-                    return True
-
-        # 2. Vertical
-        for c in range(COLONNES):
-            for r in range(LIGNES - 3):
-                if self.board[r][c] == player and self.board[r+1][c] == player and self.board[r+2][c] == player and self.board[r+3][c] == player:
-                    return True
-
-        # 3. Diagonale positive (/)
-        for c in range(COLONNES - 3):
-            for r in range(3, LIGNES):
-                if self.board[r][c] == player and self.board[r-1][c+1] == player and self.board[r-2][c+2] == player and self.board[r-3][c+3] == player:
-                    return True
-
-        # 4. Diagonale négative (\)
-        for c in range(COLONNES - 3):
-            for r in range(LIGNES - 3):
-                if self.board[r][c] == player and self.board[r+1][c+1] == player and self.board[r+2][c+2] == player and self.board[r+3][c+3] == player:
-                    return True
-        return False
-
-@bot.tree.command(name="puissance4", description="Défier quelqu'un au Puissance 4")
-async def puissance4(interaction: discord.Interaction, adversaire: discord.Member):
-    await interaction.response.defer()
-    if adversaire.bot:
-        return await interaction.followup.send("Les robots sont trop forts au Puissance 4...")
-    if adversaire == interaction.user:
-        return await interaction.followup.send("Tu ne peux pas jouer contre toi-même.")
-
-    view = Connect4Game(interaction.user, adversaire)
-    
-    # On récupère qui commence
-    first_player = view.player1
-    pion = ROUGE # Le joueur 1 a toujours les rouges
-    
-    await interaction.followup.send(
-        f"🔵 **Puissance 4** : {interaction.user.mention} VS {adversaire.mention}\n"
-        f"C'est parti ! **{first_player.mention}** commence ({pion})\n\n"
-        f"{view.get_board_str()}",
-        view=view
-    )
-import chess
-import chess.svg
-from io import BytesIO
-
-# -------------------------------------------------------------------------
-#   _____ _    _ ______  _____  _____ 
-#  / ____| |  | |  ____|/ ____|/ ____|
-# | |    | |__| | |__  | (___ | (___  
-# | |    |  __  |  __|  \___ \ \___ \ 
-# | |____| |  | | |____ ____) |____) |
-#  \_____|_|  |_|______|_____/|_____/ 
-#
-# >>> SYSTÈME D'ÉCHECS INTERACTIF <<<
-# -------------------------------------------------------------------------
-os.environ['PATH'] = os.environ.get('PATH', '') + os.pathsep + r'C:\Users\LOUP.RAINGEARD\AppData\Local\Programs\Python\Python314\Lib\site-packages\cairo'
-# -------------------------------------------------------------------------
-#   _____ _    _ ______  _____  _____ 
-#  / ____| |  | |  ____|/ ____|/ ____|
-# | |    | |__| | |__  | (___ | (___  
-# | |    |  __  |  __|  \___ \ \___ \ 
-# | |____| |  | | |____ ____) |____) |
-#  \_____|_|  |_|______|_____/|_____/ 
-#
-# >>> SYSTÈME D'ÉCHECS INTERACTIF (MENUS) <<<
-# -------------------------------------------------------------------------
-import time
-
-class ChessGame(discord.ui.View):
-    def __init__(self, white_player, black_player, timer_minutes):
-        super().__init__(timeout=None)
-        self.board = chess.Board()
-        self.white = white_player
-        self.black = black_player
-        self.board_theme = "green"
-        
-        # On stockera les deux messages ici
-        self.board_message = None 
-        self.timer_message = None
-        
-        # Gestion du Timer
-        self.timer_minutes = timer_minutes
-        self.timer_started = False
-        self.last_move_timestamp = None
-        
-        self.selected_type = None    
-        self.selected_square = None  
-        
-        # Init du Timer
-        if self.timer_minutes > 0:
-            self.time_left = {
-                chess.WHITE: timer_minutes * 60,
-                chess.BLACK: timer_minutes * 60
-            }
-            # On lance la tâche unique pour cette partie
-            self.timer_task = tasks.loop(seconds=5)(self.timer_callback)
-            self.timer_task.start()
-        else:
-            self.time_left = None
-            self.timer_task = None
-
-        self.create_menus()
-    # --- 1. LA BOUCLE DE FOND (Met à jour le temps et l'image toutes les 5s) ---
-class ChessGame(discord.ui.View):
-    def __init__(self, white_player, black_player, timer_minutes):
-        super().__init__(timeout=None)
-        self.board = chess.Board()
-        self.white = white_player
-        self.black = black_player
-        self.board_theme = "green"
-        
-        # On stockera les deux messages ici
-        self.board_message = None 
-        self.timer_message = None
-        
-        # Gestion du Timer
-        self.timer_minutes = timer_minutes
-        self.timer_started = False
-        self.last_move_timestamp = None
-        
-        self.selected_type = None    
-        self.selected_square = None  
-        
-        # Init du Timer
-        if self.timer_minutes > 0:
-            self.time_left = {
-                chess.WHITE: timer_minutes * 60,
-                chess.BLACK: timer_minutes * 60
-            }
-            # On lance la tâche unique pour cette partie
-            self.timer_task = tasks.loop(seconds=5)(self.timer_callback)
-            self.timer_task.start()
-        else:
-            self.time_left = None
-            self.timer_task = None
-
-        self.create_menus()
-
-    # --- BOUCLE DE TIMER (Ne touche qu'au message du haut) ---
-    async def timer_callback(self):
-        if not self.timer_message or not self.timer_started:
-            return
-
-        now = time.time()
-        elapsed = now - self.last_move_timestamp
-        current_turn = self.board.turn
-        
-        self.time_left[current_turn] -= elapsed
-        self.last_move_timestamp = now
-        
-        # Vérification défaite
-        if self.time_left[current_turn] <= 0:
-            self.time_left[current_turn] = 0
-            self.stop_all()
-            
-            winner = self.black if current_turn == chess.WHITE else self.white
-            loser = self.white if current_turn == chess.WHITE else self.black
-            
-            # Mise à jour du message du haut (Timer) pour annoncer la fin
-            await self.timer_message.edit(content=f"⏰ **FIN DU TEMPS !** Victoire de {winner.mention}")
-            
-            # Désactivation du plateau
-            await self.end_game_visuals(winner, loser, "temps")
-            return
-
-        # MISE À JOUR DU TEXTE (Pas d'image ici !)
-        def format_time(seconds):
-            mins, secs = divmod(int(max(0, seconds)), 60)
-            return f"{mins:02d}:{secs:02d}"
-
-        # On crée une belle barre de temps
-        t_blanc = format_time(self.time_left[chess.WHITE])
-        t_noir = format_time(self.time_left[chess.BLACK])
-        
-        # Indicateur visuel de qui joue (🔴 pour le tour en cours)
-        icon_w = "🔴" if self.board.turn == chess.WHITE else "⚪"
-        icon_b = "🔴" if self.board.turn == chess.BLACK else "⚫"
-        
-        msg_content = (
-            f"⏱️ **CHRONO**\n"
-            f"{icon_w} **Blancs** ({self.white.display_name}) : `{t_blanc}`\n"
-            f"{icon_b} **Noirs** ({self.black.display_name}) : `{t_noir}`"
-        )
-        
-        try:
-            await self.timer_message.edit(content=msg_content)
-        except:
-            pass
-
-    # --- MISE À JOUR DU JEU (Appelée quand on joue un coup) ---
-    async def update_message(self, interaction):
-        now = time.time()
-        
-        # Logique de calcul précise (identique à avant)
-        if self.timer_minutes > 0:
-            if not self.timer_started:
-                if len(self.board.move_stack) >= 2:
-                    self.timer_started = True
-                    self.last_move_timestamp = now
-                    # On force une mise à jour immédiate du texte du timer
-                    await self.timer_message.edit(content="🏁 **Le timer vient de démarrer !**")
-            else:
-                if self.last_move_timestamp is not None:
-                    elapsed = now - self.last_move_timestamp
-                    previous_turn = not self.board.turn
-                    self.time_left[previous_turn] -= elapsed
-                    self.last_move_timestamp = now
-                    
-                    if self.time_left[previous_turn] <= 0:
-                        winner = self.black if previous_turn == chess.WHITE else self.white
-                        await self.timer_message.edit(content=f"⏰ **FIN DU TEMPS !** Victoire de {winner.mention}")
-                        return await self.end_game_visuals(winner, interaction.user, "temps")
-
-        # Mise à jour du PLATEAU (Embed)
-        image_url = get_chess_board_image(self.board, self.board_theme) + f"&t={int(now)}"
-        embed = interaction.message.embeds[0] # On récupère l'embed du message cliqué
-        embed.set_image(url=image_url)
-        
-        tour_nom = self.white.display_name if self.board.turn == chess.WHITE else self.black.display_name
-        couleur = "Blancs" if self.board.turn == chess.WHITE else "Noirs"
-        embed.description = f"Trait aux **{couleur}** ({tour_nom})"
-
-        # Vérification Mat / Nul
-        if self.board.is_checkmate():
-            gagnant = self.black if self.board.turn == chess.WHITE else self.white
-            perdant = self.white if gagnant == self.black else self.black
-            await self.timer_message.edit(content=f"🏆 **VICTOIRE** de {gagnant.mention} par échec et mat !")
-            await self.end_game_visuals(gagnant, perdant, "mat")
-            
-        elif self.board.is_game_over():
-            await self.timer_message.edit(content="🤝 **MATCH NUL**")
-            await self.end_game_visuals(None, None, "nul")
-            
-        else:
-            await interaction.response.edit_message(embed=embed, view=self)
-
-    # --- GESTION DE FIN VISUELLE ---
-    async def end_game_visuals(self, winner, loser, reason):
-        self.stop_all()
-        
-        # On met à jour l'embed du plateau une dernière fois
-        embed = self.board_message.embeds[0]
-        if reason == "mat":
-            embed.color = discord.Color.gold()
-            embed.description = "🏁 **ÉCHEC ET MAT**"
-        elif reason == "temps":
-            embed.color = discord.Color.orange()
-            embed.description = "⏰ **TEMPS ÉCOULÉ**"
-        elif reason == "abandon":
-            embed.color = discord.Color.red()
-            embed.description = "🏳️ **ABANDON**"
-        
-        # Update Stats (si tu as la fonction)
-        if winner and loser:
-            update_chess_stats(winner.id, loser.id, loser.name, 'win')
-            update_chess_stats(loser.id, winner.id, winner.name, 'loss')
-
-        try:
-            await self.board_message.edit(embed=embed, view=None)
-        except:
-            pass
-
-    async def resign_callback(self, interaction: discord.Interaction):
-        if interaction.user not in [self.white, self.black]:
-            return await interaction.response.send_message("Tu ne joues pas !", ephemeral=True)
-        
-        winner = self.black if interaction.user == self.white else self.white
-        await self.timer_message.edit(content=f"🏳️ **ABANDON** de {interaction.user.mention}. Victoire de {winner.mention}")
-        await self.end_game_visuals(winner, interaction.user, "abandon")
-
-    def stop_all(self):
-        if hasattr(self, 'timer_task') and self.timer_task and self.timer_task.is_running():
-            self.timer_task.stop()
-        
-    def create_menus(self):
-        self.clear_items()
-        
-        # 1. MENU TYPE DE PIÈCE (Toujours plein au début)
-        type_select = discord.ui.Select(placeholder="1. Quel type de pièce ?", custom_id="type_select")
-        available_types = set()
-        for move in self.board.legal_moves:
-            piece = self.board.piece_at(move.from_square)
-            available_types.add(piece.piece_type)
-        
-        for p_type in sorted(list(available_types)):
-            type_select.add_option(
-                label=self.get_piece_name(p_type), 
-                value=str(p_type), 
-                default=(self.selected_type == p_type)
-            )
-        type_select.callback = self.type_callback
-        self.add_item(type_select)
-
-        # 2. MENU PIÈCE PRÉCISE
-        piece_select = discord.ui.Select(placeholder="2. Laquelle précisément ?", disabled=(self.selected_type is None))
-        if self.selected_type:
-            squares = [s for s in chess.SQUARES if self.board.piece_at(s) and 
-                       self.board.piece_at(s).piece_type == self.selected_type and
-                       self.board.piece_at(s).color == self.board.turn]
-            for s in squares:
-                if any(m.from_square == s for m in self.board.legal_moves):
-                    piece_select.add_option(label=f"Position {chess.square_name(s)}", value=str(s), default=(self.selected_square == s))
-        else:
-            # L'astuce est ici : on ajoute une option invisible pour éviter l'erreur 400
-            piece_select.add_option(label="En attente de l'étape 1...", value="none")
-        
-        piece_select.callback = self.piece_callback
-        self.add_item(piece_select)
-
-        # 3. MENU DESTINATION
-        dest_select = discord.ui.Select(placeholder="3. Où aller ?", disabled=(self.selected_square is None))
-        if self.selected_square is not None:
-            for move in self.board.legal_moves:
-                if move.from_square == self.selected_square:
-                    dest_select.add_option(label=f"Vers {chess.square_name(move.to_square)}", value=move.uci())
-        else:
-            # Même astuce ici
-            dest_select.add_option(label="En attente de l'étape 2...", value="none")
-        
-        dest_select.callback = self.dest_callback
-        self.add_item(dest_select)
-        cancel_btn = discord.ui.Button(label="Réinitialiser", style=discord.ButtonStyle.secondary, disabled=(self.selected_type is None))
-        cancel_btn.callback = self.cancel_callback
-        self.add_item(cancel_btn)
-
-        # 5. NOUVEAU : BOUTON ABANDONNER
-        resign_btn = discord.ui.Button(label="Abandonner", style=discord.ButtonStyle.danger, emoji="🏳️")
-        resign_btn.callback = self.resign_callback
-        self.add_item(resign_btn)
-        # (Le reste du code pour les boutons reste identique)
-
-    # --- CALLBACKS ---
-    def check_turn(self, interaction):
-        return interaction.user == (self.white if self.board.turn == chess.WHITE else self.black)
-
-    async def type_callback(self, interaction: discord.Interaction):
-        if not self.check_turn(interaction): return await interaction.response.send_message("Pas votre tour !", ephemeral=True)
-        self.selected_type = int(interaction.data['values'][0])
-        self.selected_square = None 
-        self.create_menus()
-        await interaction.response.edit_message(view=self)
-
-    async def piece_callback(self, interaction: discord.Interaction):
-        if not self.check_turn(interaction): return
-        self.selected_square = int(interaction.data['values'][0])
-        self.create_menus()
-        await interaction.response.edit_message(view=self)
-
-    async def cancel_callback(self, interaction: discord.Interaction):
-        if not self.check_turn(interaction): return
-        self.selected_type = None
-        self.selected_square = None
-        self.create_menus()
-        await interaction.response.edit_message(view=self)
-
-    async def dest_callback(self, interaction: discord.Interaction):
-        if not self.check_turn(interaction): return
-        move = chess.Move.from_uci(interaction.data['values'][0])
-        
-        # Promotion auto Reine
-        if self.board.piece_at(move.from_square).piece_type == chess.PAWN:
-            if chess.square_rank(move.to_square) in [0, 7]:
-                move.promotion = chess.QUEEN
-
-        self.board.push(move)
-        self.selected_type = None
-        self.selected_square = None
-        self.create_menus()
-        await self.update_message(interaction)
-
-
-
-    async def end_game_logic(self, interaction, winner, loser, reason):
-        embed = interaction.message.embeds[0]
-        if reason == "temps":
-            embed.description = f"⏰ **TEMPS ÉCOULÉ !**\n{loser.mention} a manqué de temps. Victoire de {winner.mention} !"
-            embed.color = discord.Color.orange()
-            update_chess_stats(winner.id, loser.id, loser.name, 'win')
-            update_chess_stats(loser.id, winner.id, winner.name, 'loss')
-            self.stop_all()
-        if reason == "mat":
-            embed.description = f"🏁 **ÉCHEC ET MAT !**\nVictoire de {winner.mention} !"
-            embed.color = discord.Color.gold()
-            update_chess_stats(winner.id, loser.id, loser.name, 'win')
-            update_chess_stats(loser.id, winner.id, winner.name, 'loss')
-        elif reason == "abandon":
-            embed.description = f"🏳️ **ABANDON**\n{loser.mention} a quitté. Victoire de {winner.mention} !"
-            update_chess_stats(winner.id, loser.id, loser.name, 'win')
-            update_chess_stats(loser.id, winner.id, winner.name, 'loss')
-        else:
-            embed.description = "🤝 **MATCH NUL !**"
-            update_chess_stats(self.white.id, self.black.id, self.black.name, 'draw')
-            update_chess_stats(self.black.id, self.white.id, self.white.name, 'draw')
-
-        await interaction.response.edit_message(embed=embed, view=None)
-
-    def get_piece_name(self, p_type):
-        return {chess.PAWN: "Pion", chess.KNIGHT: "Cavalier", chess.BISHOP: "Fou", 
-                chess.ROOK: "Tour", chess.QUEEN: "Dame", chess.KING: "Roi"}[p_type]
-
-class MoveModal(discord.ui.Modal, title="Votre coup (ex: e2e4)"):
-    move_input = discord.ui.TextInput(label="Coup en notation LAN", placeholder="e2e4, g1f3...")
-
-    def __init__(self, game_view):
-        super().__init__()
-        self.game_view = game_view
-
-    async def on_submit(self, interaction: discord.Interaction):
-        move_str = self.move_input.value.lower()
-        try:
-            move = chess.Move.from_uci(move_str)
-            if move in self.game_view.board.legal_moves:
-                self.game_view.board.push(move)
-                
-                # On change de tour
-                self.game_view.turn = self.game_view.black if self.game_view.turn == self.game_view.white else self.game_view.white
-                
-                await interaction.response.defer()
-                await self.game_view.update_message(interaction)
-                
-                # Vérification fin de partie
-                if self.game_view.board.is_game_over():
-                    await interaction.followup.send(f"Partie terminée ! Résultat : {self.game_view.board.result()}")
-            else:
-                await interaction.response.send_message("Coup illégal !", ephemeral=True)
-        except:
-            await interaction.response.send_message("Format invalide (utilisez e2e4).", ephemeral=True)
-# Fichier : chess_stats.json
-def update_chess_stats(user_id, opponent_id, opponent_name, result):
-    stats = get_stats("chess_stats.json")
-    uid, oid = str(user_id), str(opponent_id)
-
-    if uid not in stats:
-        stats[uid] = {"wins": 0, "losses": 0, "draws": 0, "current_streak": 0, "max_streak": 0, "rivals": {}}
-    
-    player = stats[uid]
-    if oid not in player["rivals"]:
-        player["rivals"][oid] = {"name": opponent_name, "wins": 0, "losses": 0, "draws": 0}
-
-    if result == 'win':
-        player["wins"] += 1
-        player["rivals"][oid]["wins"] += 1
-        player["current_streak"] += 1
-        if player["current_streak"] > player["max_streak"]: player["max_streak"] = player["current_streak"]
-    elif result == 'loss':
-        player["losses"] += 1
-        player["rivals"][oid]["losses"] += 1
-        player["current_streak"] = 0
-    elif result == 'draw':
-        player["draws"] += 1
-        player["rivals"][oid]["draws"] += 1
-
-    save_stats("chess_stats.json", stats)
-
-import chess
-import urllib.parse
-
-
-def get_chess_board_image(board, chess_board_color="green"):
-    fen = board.fen()
-    fen_position = fen.split(" ")[0]
-    # On ajoute &coordinates=true pour afficher les lettres et les chiffres
-    # On peut aussi changer le style (board=blue, brown, green...)
-    image_url = f"https://www.chess.com/dynboard?fen={fen_position}&size=2&board={chess_board_color}&piece=neo&coordinates=true"
-    
-    return image_url
-
-# --- LA COMMANDE DE LANCEMENT ---
-@bot.tree.command(name="echecs", description="Lancer une partie d'échecs avec stats")
-@app_commands.choices(couleur_du_plateau=[
-    app_commands.Choice(name="Vert", value="green"),
-    app_commands.Choice(name="Marron", value="brown"),
-    app_commands.Choice(name="Bleu", value="blue"),
-])
-async def echecs(interaction: discord.Interaction, adversaire: discord.Member, couleur_du_plateau: app_commands.Choice[str]= None, timer: int = 0):
-    if adversaire.bot or adversaire == interaction.user:
-        return await interaction.response.send_message("Adversaire invalide !", ephemeral=True)
-    
-    await interaction.response.defer()
-    
-    couleur_plateau = couleur_du_plateau.value if couleur_du_plateau else "green"
-    joueurs = [interaction.user, adversaire]
-    random.shuffle(joueurs)
-    blanc, noir = joueurs[0], joueurs[1]
-
-    # 1. Création de la View
-    view = ChessGame(white_player=blanc, black_player=noir, timer_minutes=timer)
-    view.board_theme = couleur_plateau 
-    
-    # 2. MESSAGE 1 : LE TIMER (Envoyé en réponse à la commande)
-    # On prépare le texte initial
-    if timer > 0:
-        txt_timer = f"⏱️ **CHRONO**\n⚪ Blancs: `{timer}:00`\n⚫ Noirs: `{timer}:00`\n*En attente du démarrage...*"
-    else:
-        txt_timer = f"♾️ **PARTIE AMICALE** (Pas de temps)\n⚪ {blanc.mention} vs ⚫ {noir.mention}"
-
-    # On envoie le message du Timer
-    msg_timer = await interaction.followup.send(content=txt_timer, wait=True)
-    
-    # 3. MESSAGE 2 : LE PLATEAU (Envoyé juste après dans le canal)
-    image_url = get_chess_board_image(view.board, couleur_plateau)
-    embed = discord.Embed(title="♟️ Match d'Échecs", color=0x2b2d31)
-    embed.description = f"Trait aux **Blancs** ({blanc.display_name})"
-    embed.set_image(url=image_url)
-    # Plus besoin de Fields pour le temps dans l'embed !
-    
-    # On envoie le message du Plateau avec les boutons
-    msg_board = await interaction.channel.send(embed=embed, view=view)
-    
-    # 4. On lie les messages à la View
-    view.timer_message = msg_timer
-    view.board_message = msg_board
-# -------------------------------------------------------------------------
-#  _____ _    _ _____ _______ ______ 
-# / ____| |  | |_   _|__   __|  ____|
-# \__  \| |  | | | |    | |  | |__   
-#  ___  \ |  | | | |    | |  |  __|  
-#  ____) | |__| |_| |_   | |  | |____ 
-# |_____/ \____/|_____|  |_|  |______|
-#
-# -------------------------------------------------------------------------
-prive = str(os.getenv('PRIVATE_KEY'))
-keep_alive()
-bot.run(prive)
-
-
+import discord
+import random
+from discord.ext import commands
+from discord import app_commands
+import json
+import os
+import re
+import asyncio
+import atexit
+import bisect
+import contextvars
+import functools
+import hashlib
+import heapq
+import itertools
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import chess
+import aiohttp
+from aiohttp import web
+from discord.ext import tasks
+try:
+    import numpy as np # Optionnel : seulement pour STATS_BACKEND=columns
+except ImportError:
+    np = None
+
+DEMARRAGE = time.perf_counter() # Pour mesurer le temps de démarrage
+
+# --- MÉTRIQUES (format texte Prometheus, servies sur /metrics) ---
+LATENCE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # secondes
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # le dernier compte ce qui dépasse (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+class Metrics:
+    """Compteurs et histogrammes du bot, plus des collecteurs appelés au moment de l'export.
+
+    Les collecteurs lisent les compteurs déjà tenus ailleurs (caches, file d'éditions,
+    parties en cours) : rien n'est dupliqué sur le chemin des interactions.
+    """
+
+    def __init__(self):
+        self.counters = {} # (nom, labels) -> valeur
+        self.histograms = {} # (nom, labels) -> Histogram
+        self.help = {}
+        self.collectors = [] # fonctions -> [(type, nom, labels, valeur)]
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(labels.items()))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCE_BUCKETS, **labels):
+        key = (name, tuple(labels.items()))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def collector(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        series = {} # nom -> (type, lignes)
+        def add(kind, name, line):
+            series.setdefault(name, (kind, []))[1].append(line)
+
+        for (name, labels), value in self.counters.items():
+            add("counter", name, f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in self.histograms.items():
+            cumul = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumul += count
+                add("histogram", name, f"{name}_bucket{format_labels(labels, le=bound)} {cumul}")
+            add("histogram", name, f"{name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+            add("histogram", name, f"{name}_count{format_labels(labels)} {histogram.count}")
+        for collect in self.collectors:
+            for kind, name, labels, value in collect():
+                add(kind, name, f"{name}{format_labels(labels)} {value}")
+
+        lines = []
+        for name, (kind, samples) in series.items():
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+# --- TRAÇAGE DES INTERACTIONS ---
+# Discord laisse 3 s pour répondre (ou defer) à une interaction. Chaque commande slash et chaque
+# callback de jeu est chronométré : délai de la 1re réponse, durée totale et temps passé dans
+# des étapes nommées (stats, discord = appels REST, rendu, ia).
+INTERACTION_LENTE = float(os.getenv("INTERACTION_LENTE", "1.5")) # secondes, au-delà on journalise le détail
+
+TRACE = contextvars.ContextVar("trace", default=None) # trace de l'interaction traitée par la tâche courante
+
+class InteractionTrace:
+    __slots__ = ("handler", "start", "first_response", "spans", "failed", "token")
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.first_response = None
+        self.spans = {} # étape -> secondes cumulées
+        self.failed = False # erreur gérée par le handler (ex. commande en échec)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.token = TRACE.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        TRACE.reset(self.token)
+        self.finish(exc_type is not None)
+        return False
+
+    def attach(self, task):
+        """Trace toute la tâche courante, jusqu'à sa fin (commandes : voir BotTree)."""
+        self.start = time.perf_counter()
+        TRACE.set(self) # La tâche ne sert qu'à cette interaction : rien à restaurer
+        task.add_done_callback(lambda t: self.finish(t.cancelled() or t.exception() is not None))
+
+    def finish(self, error=False):
+        total = time.perf_counter() - self.start
+        statut = "erreur" if error or self.failed else "ok"
+        METRICS.observe("bot_interaction_duree_secondes", total, handler=self.handler, statut=statut)
+        if self.first_response is not None:
+            METRICS.observe("bot_interaction_premiere_reponse_secondes", self.first_response - self.start, handler=self.handler)
+        for name, seconds in self.spans.items():
+            METRICS.observe("bot_interaction_etape_secondes", seconds, handler=self.handler, etape=name)
+        if total >= INTERACTION_LENTE:
+            first = f"{(self.first_response - self.start) * 1000:.0f} ms" if self.first_response else "aucune"
+            detail = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.spans.items())
+            print(f"Interaction lente : {self.handler} ({statut}) {total * 1000:.0f} ms, 1re réponse {first} [{detail}]")
+
+class Span:
+    """Étape nommée de l'interaction en cours (sans effet hors d'une interaction tracée)."""
+
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = TRACE.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            self.trace.spans[self.name] = self.trace.spans.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+def traced(handler):
+    """Décorateur des callbacks de vues : async def callback(self, interaction, ...)."""
+    def decorator(callback):
+        @functools.wraps(callback)
+        async def wrapper(self, interaction, *args):
+            with InteractionTrace(handler):
+                return await callback(self, interaction, *args)
+        return wrapper
+    return decorator
+
+def background_task(coro):
+    """create_task sans la trace de l'interaction en cours.
+
+    Une tâche de fond lui survit : ses appels REST ne doivent pas être comptés aux interactions suivantes.
+    """
+    context = contextvars.copy_context()
+    context.run(TRACE.set, None)
+    return context.run(asyncio.create_task, coro)
+
+def rest_trace():
+    """Signaux d'aiohttp (Client(http_trace=...)) : chaque appel REST compte dans l'étape "discord".
+
+    Ils tournent dans la tâche qui fait l'appel, donc avec sa trace. La réponse à une
+    interaction (et son defer) est un POST sur .../callback : c'est la 1re réponse.
+    """
+    config = aiohttp.TraceConfig()
+
+    async def on_start(session, ctx, params):
+        ctx.trace = TRACE.get()
+        ctx.start = time.perf_counter()
+
+    async def on_end(session, ctx, params):
+        if ctx.trace is None:
+            return
+        now = time.perf_counter()
+        ctx.trace.spans["discord"] = ctx.trace.spans.get("discord", 0.0) + now - ctx.start
+        if ctx.trace.first_response is None and params.url.path.endswith("/callback"):
+            ctx.trace.first_response = now
+
+    config.on_request_start.append(on_start)
+    config.on_request_end.append(on_end)
+    config.on_request_exception.append(on_end)
+    return config
+
+###########################################################################################################
+# Définition des noms de fichiers
+FILE_MORPION = "morpion_scores.json"
+FILE_P4 = "puissance4_stats.json"
+FILE_CHESS = "chess_stats.json"
+
+# Délai (en secondes) avant de réécrire un fichier de stats modifié
+STATS_FLUSH_DELAY = float(os.getenv("STATS_FLUSH_DELAY", "10"))
+# Stockage des stats : "json" (fichiers ci-dessus), "sqlite" (une base unique)
+# ou "columns" (mêmes fichiers JSON, gardés en mémoire en tableaux NumPy : très gros serveurs)
+STATS_BACKEND = os.getenv("STATS_BACKEND", "json")
+STATS_DB = os.getenv("STATS_DB", "stats.sqlite3")
+# Nombre de parties minimum pour apparaître au classement par winrate
+MIN_PARTIES_WINRATE = 10
+
+def new_player():
+    return {"wins": 0, "losses": 0, "draws": 0, "current_streak": 0, "max_streak": 0}
+
+# On définit une fonction de tri qui calcule les "points" (1 pour win, 0.5 pour nul)
+def calcul_performance(item):
+    data = item[1]
+    # Formule : Victoires + (Nuls * 0.5)
+    return data['wins'] + (data['draws'] * 0.5)
+
+# Tri par winrate (les nuls comptent pour 50%), puis par nombre de victoires
+def calcul_winrate(item):
+    data = item[1]
+    wins = data['wins']
+    draws = data['draws']
+    total = wins + data['losses'] + draws
+    winrate = ((wins + (draws * 0.5)) / total) if total > 0 else 0
+    return (winrate, wins)
+
+def total_parties(data):
+    return data['wins'] + data['losses'] + data['draws']
+
+def apply_result(player, result):
+    """Applique un résultat ('win', 'loss' ou 'draw') sur le dict d'un joueur (les duels sont dans HeadToHead)."""
+    if result == 'win':
+        player["wins"] += 1
+        player["current_streak"] += 1
+        # Record de la plus longue série
+        if player["current_streak"] > player["max_streak"]:
+            player["max_streak"] = player["current_streak"]
+            
+    elif result == 'loss':
+        player["losses"] += 1
+        player["current_streak"] = 0 # La série s'arrête
+        
+    elif result == 'draw':
+        player["draws"] += 1
+        # Optionnel : un nul casse-t-il la série ? Ici on décide que non, elle stagne.
+
+def read_stats_file(filename):
+    """Lit un fichier de stats sur le disque."""
+    if not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+def dump_compact(data):
+    # Format compact : l'encodeur C de json n'est utilisé que sans indent
+    return json.dumps(data, separators=(",", ":"))
+
+def write_encoded(filename, encode):
+    """write_atomic(filename, encode()) : l'encodage se fait avec l'écriture, dans le thread."""
+    write_atomic(filename, encode())
+
+def write_atomic(filename, payload):
+    """Écrit dans un fichier temporaire puis le renomme : jamais de fichier à moitié écrit."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# Nom court de chaque jeu (tables SQLite, journal des parties)
+SQL_TABLES = {FILE_MORPION: "morpion", FILE_P4: "puissance4", FILE_CHESS: "echecs"}
+
+# Journal des parties : une ligne JSON par partie terminée, jamais réécrit
+MATCH_JOURNAL = os.getenv("MATCH_JOURNAL", "matches.jsonl")
+
+class MatchJournal:
+    """Historique append-only des parties (les deux joueurs, le résultat, le jeu, la date).
+
+    Enregistrer une partie coûte un simple ajout en fin de fichier. Les fichiers
+    de stats ne sont qu'un résumé de ce journal : ils mémorisent jusqu'à quel
+    octet du journal ils sont à jour, et le reste est rejoué au démarrage.
+    """
+
+    def __init__(self, path=MATCH_JOURNAL):
+        self.path = path
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self._file = None
+
+    def append(self, filename, a_id, a_name, b_id, b_name, result):
+        """result vaut 'win' (a a battu b) ou 'draw'."""
+        record = {"g": SQL_TABLES[filename], "a": str(a_id), "an": a_name, "b": str(b_id), "bn": b_name,
+                  "r": "w" if result == 'win' else "d", "t": int(time.time())}
+        line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(line)
+        self._file.flush()
+        self.size += len(line)
+
+    def read(self, start=0):
+        """Renvoie (position, enregistrement) à partir de l'octet `start`."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Ligne coupée par un crash : on l'ignore (et on la retire du fichier)
+                    self._truncate(pos)
+                    return
+                yield pos, json.loads(line)
+                pos += len(line)
+
+    def _truncate(self, pos):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with open(self.path, "r+b") as f:
+            f.truncate(pos)
+        self.size = pos
+
+JOURNAL = MatchJournal()
+# Nom de jeu du journal -> fichier de stats
+JOURNAL_GAMES = {game: filename for filename, game in SQL_TABLES.items()}
+
+class WriteBehindStore:
+    """Base commune : programme une écriture unique STATS_FLUSH_DELAY secondes après une modification."""
+
+    def __init__(self, journal, flush_delay=STATS_FLUSH_DELAY):
+        self.journal = journal
+        self.flush_delay = flush_delay
+        self._flush_handle = None
+
+    def _schedule_flush(self):
+        # Debounce : une seule écriture programmée à la fois
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # Pas de boucle (script, tests) : on écrira à l'arrêt
+        self._flush_handle = loop.call_later(self.flush_delay, lambda: background_task(self._timed_flush()))
+
+    async def _timed_flush(self):
+        start = time.perf_counter()
+        await self.flush_async()
+        METRICS.observe("bot_stats_flush_secondes", time.perf_counter() - start, backend=type(self).__name__)
+
+    def _cancel_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+# --- CLASSEMENT ELO ---
+# Cote de départ, facteur K et nombre de parties pour apparaître au classement Elo
+ELO_BASE = float(os.getenv("ELO_BASE", "1200"))
+ELO_K = float(os.getenv("ELO_K", "32"))
+MIN_PARTIES_ELO = 5
+# Cotes enregistrées avec la position du journal qu'elles incluent
+ELO_FILE = os.getenv("ELO_FILE", "elo.json")
+
+def elo_delta(rating_a, rating_b, score_a, k=ELO_K):
+    """Points gagnés par a (et perdus par b) : score_a vaut 1, 0.5 ou 0."""
+    expected = 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+    return k * (score_a - expected)
+
+class RatingBook(WriteBehindStore):
+    """Cotes Elo de chaque jeu : {fichier: {id: [cote, parties]}}, mises à jour partie par partie.
+
+    Les cotes sont écrites dans ELO_FILE (avec la position du journal qu'elles incluent)
+    comme les stats, en différé : au démarrage seule la fin du journal est rejouée.
+    Chaque jeu a sa SortedList des joueurs classés, construite au premier classement puis
+    tenue à jour comme RankIndex. Après un changement de ELO_K / ELO_BASE, tout
+    l'historique se rejoue à la main : python main.py --rebuild-elo
+    """
+
+    VERSION = 2 # 1 : cotes par périodes d'une heure, abandonnées
+
+    def __init__(self, journal=None, path=ELO_FILE, flush_delay=STATS_FLUSH_DELAY):
+        super().__init__(journal, flush_delay)
+        self.path = path
+        self.ratings = {filename: {} for filename in SQL_TABLES}
+        self.indexes = {} # nom de fichier -> SortedList de (-cote, id) des joueurs classés
+        self.dirty = False
+
+    @staticmethod
+    def params():
+        return [ELO_BASE, ELO_K]
+
+    def load(self):
+        """Reprend les cotes de ELO_FILE puis rejoue les parties du journal écrites depuis."""
+        saved = read_stats_file(self.path)
+        start = 0
+        if saved.get("version") != self.VERSION:
+            if saved:
+                print("Ancien format des cotes Elo : recalcul depuis le début du journal")
+        elif saved["journal"] <= self.journal.size: # Journal plus court : il a été remplacé, on repart de zéro
+            for filename in SQL_TABLES:
+                self.ratings[filename] = saved["ratings"].get(filename, {})
+            start = saved["journal"]
+            if saved["params"] != self.params():
+                print("Paramètres Elo modifiés : les anciennes cotes sont gardées, lancez python main.py --rebuild-elo")
+        self.indexes = {}
+        replayed = self._replay(start)
+        if replayed:
+            print(f"Cotes Elo : {replayed} partie(s) rejouée(s)")
+            self.flush()
+
+    def rebuild(self):
+        """Recalcul complet depuis le début du journal (commande hors ligne, peut être long)."""
+        self.ratings = {filename: {} for filename in SQL_TABLES}
+        self.indexes = {}
+        self._replay(0)
+        self.dirty = True
+
+    def _replay(self, start):
+        replayed = 0
+        for _, rec in self.journal.read(start):
+            self._apply(JOURNAL_GAMES[rec["g"]], rec["a"], rec["b"], 1.0 if rec["r"] == "w" else 0.5)
+            replayed += 1
+        return replayed
+
+    def update(self, filename, a_id, b_id, result):
+        self._apply(filename, str(a_id), str(b_id), 1.0 if result == 'win' else 0.5)
+        self._schedule_flush()
+
+    def _apply(self, filename, a_id, b_id, score):
+        book = self.ratings[filename]
+        a = book.setdefault(a_id, [ELO_BASE, 0])
+        b = book.setdefault(b_id, [ELO_BASE, 0])
+        index = self.indexes.get(filename)
+        if index is not None:
+            for uid, entry in ((a_id, a), (b_id, b)):
+                if entry[1] >= MIN_PARTIES_ELO:
+                    index.remove((-entry[0], uid))
+        delta = elo_delta(a[0], b[0], score)
+        a[0] += delta
+        b[0] -= delta
+        a[1] += 1
+        b[1] += 1
+        if index is not None:
+            for uid, entry in ((a_id, a), (b_id, b)):
+                if entry[1] >= MIN_PARTIES_ELO:
+                    index.add((-entry[0], uid))
+        self.dirty = True
+
+    def index(self, filename):
+        if filename not in self.indexes:
+            self.indexes[filename] = SortedList((-e[0], uid) for uid, e in self.ratings[filename].items()
+                                                if e[1] >= MIN_PARTIES_ELO)
+        return self.indexes[filename]
+
+    def get(self, filename, uid):
+        """(cote, parties) ou None."""
+        entry = self.ratings[filename].get(uid)
+        return (entry[0], entry[1]) if entry else None
+
+    def top(self, filename, limit=10):
+        """[(id, cote, parties)] des `limit` meilleurs joueurs classés."""
+        book = self.ratings[filename]
+        return [(uid, *book[uid]) for _, uid in self.index(filename).head(limit)]
+
+    def rank(self, filename, uid):
+        # 1 + nombre de joueurs classés ayant une meilleure cote
+        return 1 + self.index(filename).bisect_left((-self.ratings[filename][uid][0],))
+
+    # --- Écriture disque ---
+    def _dump(self):
+        # Les cotes incluent toujours tout le journal : elles sont mises à jour juste après chaque ajout
+        self.dirty = False
+        return json.dumps({"version": self.VERSION, "journal": self.journal.size, "params": self.params(),
+                           "ratings": self.ratings}, separators=(",", ":"))
+
+    async def flush_async(self):
+        self._cancel_flush()
+        if self.dirty:
+            payload = self._dump()
+            try:
+                await asyncio.to_thread(write_atomic, self.path, payload)
+            except OSError as e:
+                print(f"Erreur d'écriture de {self.path}: {e}")
+                self.dirty = True
+                self._schedule_flush()
+
+    def flush(self):
+        self._cancel_flush()
+        if self.dirty:
+            write_atomic(self.path, self._dump())
+
+RATINGS = RatingBook(JOURNAL)
+
+class SortedList:
+    """Liste triée découpée en blocs (même principe que sortedcontainers).
+
+    Les blocs gardent l'insertion/suppression bon marché, un arbre de Fenwick
+    sur la taille des blocs donne la position globale d'une clé en O(log n).
+    """
+
+    LOAD = 500
+
+    def __init__(self, values=()):
+        values = sorted(values)
+        self._lists = [values[i:i + self.LOAD] for i in range(0, len(values), self.LOAD)]
+        self._maxes = [lst[-1] for lst in self._lists]
+        self._len = len(values)
+        self._build_tree()
+
+    def __len__(self):
+        return self._len
+
+    def _build_tree(self):
+        tree = [0] + [len(lst) for lst in self._lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos, delta):
+        pos += 1
+        while pos < len(self._tree):
+            self._tree[pos] += delta
+            pos += pos & -pos
+
+    def _tree_prefix(self, pos):
+        # Nombre d'éléments dans les blocs [0, pos)
+        total = 0
+        while pos > 0:
+            total += self._tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def add(self, value):
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+            self._len = 1
+            self._build_tree()
+            return
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            pos -= 1
+        lst = self._lists[pos]
+        bisect.insort(lst, value)
+        self._maxes[pos] = lst[-1]
+        self._len += 1
+        if len(lst) > 2 * self.LOAD:
+            # Bloc trop gros : on le coupe en deux
+            self._lists[pos:pos + 1] = [lst[:self.LOAD], lst[self.LOAD:]]
+            self._maxes[pos:pos + 1] = [lst[self.LOAD - 1], lst[-1]]
+            self._build_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def remove(self, value):
+        pos = bisect.bisect_left(self._maxes, value)
+        lst = self._lists[pos]
+        del lst[bisect.bisect_left(lst, value)]
+        self._len -= 1
+        if lst:
+            self._maxes[pos] = lst[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+            self._build_tree()
+
+    def bisect_left(self, value):
+        """Nombre d'éléments strictement inférieurs à value."""
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return self._len
+        return self._tree_prefix(pos) + bisect.bisect_left(self._lists[pos], value)
+
+    def head(self, limit):
+        """Les `limit` plus petits éléments, sans parcourir le reste."""
+        result = []
+        for lst in self._lists:
+            result.extend(lst[:limit - len(result)])
+            if len(result) >= limit:
+                break
+        return result
+
+class RankIndex:
+    """Classements d'un jeu (score et winrate) tenus à jour à chaque résultat.
+
+    Les clés sont négatives pour que l'ordre croissant de SortedList soit
+    l'ordre du classement. Seuls les joueurs ayant assez de parties entrent
+    dans le classement winrate, le filtre ne demande donc aucun parcours.
+    """
+
+    def __init__(self, stats, min_games=MIN_PARTIES_WINRATE):
+        self.min_games = min_games
+        self.keys = {uid: self._keys(uid, data) for uid, data in stats.items()}
+        self.by_score = SortedList(k[0] for k in self.keys.values())
+        self.by_rate = SortedList(k[1] for k in self.keys.values() if k[1] is not None)
+
+    def _keys(self, uid, data):
+        score_key = (-calcul_performance((uid, data)), uid)
+        rate_key = None
+        if total_parties(data) >= self.min_games:
+            winrate, wins = calcul_winrate((uid, data))
+            rate_key = (-winrate, -wins, uid)
+        return score_key, rate_key
+
+    def update(self, uid, data):
+        old = self.keys.get(uid)
+        if old is not None:
+            self.by_score.remove(old[0])
+            if old[1] is not None:
+                self.by_rate.remove(old[1])
+        new = self._keys(uid, data)
+        self.keys[uid] = new
+        self.by_score.add(new[0])
+        if new[1] is not None:
+            self.by_rate.add(new[1])
+
+    def top_score(self, limit):
+        return [key[-1] for key in self.by_score.head(limit)]
+
+    def top_winrate(self, limit):
+        return [key[-1] for key in self.by_rate.head(limit)]
+
+    def rank_score(self, uid):
+        # 1 + nombre de joueurs ayant strictement plus de points
+        return 1 + self.by_score.bisect_left(self.keys[uid][0][:1])
+
+    def rank_winrate(self, uid):
+        return 1 + self.by_rate.bisect_left(self.keys[uid][1][:2])
+
+class RivalList:
+    """Adversaires d'un joueur, du plus joué au moins joué.
+
+    `neg` garde le nombre de parties en négatif, donc trié par ordre croissant :
+    une partie de plus échange l'adversaire avec le premier de son bloc (même
+    nombre de parties, trouvé par bisect), l'ordre reste trié sans retri.
+    """
+
+    __slots__ = ("order", "neg")
+
+    def __init__(self, counts=()):
+        pairs = sorted((-games, oid) for oid, games in counts)
+        self.order = [oid for _, oid in pairs]
+        self.neg = [neg for neg, _ in pairs]
+
+    def add_game(self, oid):
+        try:
+            i = self.order.index(oid) # Recherche en C : un joueur a rarement beaucoup de rivaux
+        except ValueError:
+            i = len(self.order)
+            self.order.append(oid)
+            self.neg.append(0)
+        j = bisect.bisect_left(self.neg, self.neg[i])
+        self.order[i], self.order[j] = self.order[j], oid
+        self.neg[j] -= 1
+
+    def top(self, limit):
+        return self.order[:limit]
+
+class HeadToHead:
+    """Face-à-face d'un jeu : un seul compteur par paire de joueurs, dans n'importe quel ordre.
+
+    La paire (id_min, id_max) est rangée sous un seul entier (les ids Discord sont
+    numériques), et ses trois compteurs dans un autre : victoires de id_min, de id_max,
+    puis nuls, sur 21 bits chacun. Chaque joueur a sa RivalList (ses plus gros rivaux
+    sans rien parcourir), et un seul pseudo par joueur est gardé au lieu d'une copie par duel.
+    """
+
+    BITS = 21
+    MASK = (1 << BITS) - 1
+
+    def __init__(self):
+        self.pairs = {}  # (id_min << 64) | id_max -> compteurs
+        self.rivals = {} # id -> RivalList
+        self.names = {}  # id -> dernier pseudo connu
+
+    @staticmethod
+    def key(a, b):
+        return (a, b) if a < b else (b, a)
+
+    @staticmethod
+    def pack(low, high):
+        return (int(low) << 64) | int(high)
+
+    @classmethod
+    def unpack(cls, counts):
+        return counts & cls.MASK, (counts >> cls.BITS) & cls.MASK, counts >> (2 * cls.BITS)
+
+    @classmethod
+    def from_rivals(cls, stats):
+        """Construit l'index depuis l'ancien format (un dict "rivals" dans chaque joueur)."""
+        duels = cls()
+        adjacency = {}
+        same_ids = {uid: uid for uid in stats} # Une seule chaîne par id, partagée avec les joueurs
+        for uid, data in stats.items():
+            for oid, r in data.get("rivals", {}).items():
+                oid = same_ids.setdefault(oid, oid)
+                low, high = cls.key(uid, oid)
+                packed = cls.pack(low, high)
+                if packed not in duels.pairs:
+                    # Chaque duel est écrit deux fois dans l'ancien format : on en garde un
+                    wins, losses = (r["wins"], r["losses"]) if uid == low else (r["losses"], r["wins"])
+                    duels.pairs[packed] = wins | (losses << cls.BITS) | (r["draws"] << (2 * cls.BITS))
+                    games = wins + losses + r["draws"]
+                    adjacency.setdefault(uid, []).append((oid, games))
+                    adjacency.setdefault(oid, []).append((uid, games))
+                if r.get("name"):
+                    duels.names.setdefault(oid, r["name"])
+        duels.rivals = {uid: RivalList(counts) for uid, counts in adjacency.items()}
+        return duels
+
+    @classmethod
+    def from_json(cls, saved):
+        """Construit l'index depuis un fichier de duels écrit depuis snapshot()."""
+        duels = cls()
+        duels.names = saved.get("names", {})
+        adjacency = {}
+        for packed, counts in zip(saved.get("pairs", []), saved.get("counts", [])):
+            duels.pairs[packed] = counts
+            low, high = str(packed >> 64), str(packed & (2**64 - 1))
+            games = sum(cls.unpack(counts))
+            adjacency.setdefault(low, []).append((high, games))
+            adjacency.setdefault(high, []).append((low, games))
+        duels.rivals = {uid: RivalList(counts) for uid, counts in adjacency.items()}
+        return duels
+
+    def snapshot(self):
+        """Paires, compteurs et pseudos tels quels, pour l'encodeur C de json.
+
+        Les clés des paires sont écrites en liste : l'encodeur convertit bien plus
+        vite un entier en liste qu'en clé de dict. Les copies (en C) ne bougent plus :
+        dump_compact(snapshot) peut tourner dans un thread.
+        """
+        return {"pairs": list(self.pairs), "counts": list(self.pairs.values()), "names": dict(self.names)}
+    def record(self, a, a_name, b, b_name, result):
+        """Une partie entre a et b ('win' = a a gagné, sinon nul)."""
+        self.names[a] = a_name
+        self.names[b] = b_name
+        low, high = self.key(a, b)
+        packed = self.pack(low, high)
+        if result == 'win':
+            shift = 0 if a == low else self.BITS
+        else:
+            shift = 2 * self.BITS
+        self.pairs[packed] = self.pairs.get(packed, 0) + (1 << shift)
+        for uid, oid in ((a, b), (b, a)):
+            if uid not in self.rivals:
+                self.rivals[uid] = RivalList()
+            self.rivals[uid].add_game(oid)
+
+    def get(self, a, b):
+        """(victoires de a, victoires de b, nuls), ou None s'ils ne se sont jamais affrontés."""
+        low, high = self.key(a, b)
+        counts = self.pairs.get(self.pack(low, high))
+        if counts is None:
+            return None
+        low_wins, high_wins, draws = self.unpack(counts)
+        return (low_wins, high_wins, draws) if a == low else (high_wins, low_wins, draws)
+
+    def items(self):
+        """Toutes les paires : (id_min, id_max, victoires de id_min, victoires de id_max, nuls)."""
+        for packed, counts in self.pairs.items():
+            yield (str(packed >> 64), str(packed & (2**64 - 1)), *self.unpack(counts))
+
+    def top(self, uid, limit):
+        """Les `limit` plus gros rivaux : [(id, pseudo, victoires, défaites, nuls)] du point de vue de uid."""
+        rivals = self.rivals.get(uid)
+        if rivals is None:
+            return []
+        return [(oid, self.names.get(oid), *self.get(uid, oid)) for oid in rivals.top(limit)]
+
+    def rivals_dict(self, uid):
+        """Les rivaux de uid dans l'ancien format (fichiers JSON, export)."""
+        rivals = self.rivals.get(uid)
+        if rivals is None:
+            return {}
+        return {oid: {"name": name, "wins": wins, "losses": losses, "draws": draws}
+                for oid, name, wins, losses, draws in self.top(uid, len(rivals.order))}
+
+def split_rivals(stats):
+    """Sépare un fichier de stats à l'ancien format en (joueurs sans rivaux, HeadToHead)."""
+    players = {uid: {k: v for k, v in data.items() if k != "rivals"} for uid, data in stats.items()}
+    return players, HeadToHead.from_rivals(stats)
+
+def duels_file(filename):
+    """Fichier des duels d'un fichier de stats (puissance4_stats.json -> puissance4_stats.duels.json)."""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.duels{ext}"
+
+def read_stats_and_duels(filename):
+    """(joueurs sans rivaux, HeadToHead) : fichier de duels s'il existe, sinon ancien format."""
+    players, duels = split_rivals(read_stats_file(filename))
+    saved = read_stats_file(duels_file(filename))
+    if saved:
+        duels = HeadToHead.from_json(saved)
+    return players, duels
+
+class JsonStatsStore(WriteBehindStore):
+    """Garde les fichiers de stats en mémoire et les réécrit en arrière-plan.
+
+    Les résultats sont appliqués directement sur le dictionnaire en mémoire,
+    le fichier est marqué "sale" et réécrit une seule fois après STATS_FLUSH_DELAY
+    secondes, quel que soit le nombre de parties terminées entre-temps.
+    Chaque fichier a son RankIndex, mis à jour au même moment que les stats.
+    Les duels sont tenus à part dans un HeadToHead par jeu et écrits dans leur propre
+    fichier (duels_file) : les joueurs s'écrivent sans reconstruire leurs rivaux.
+    Les anciens fichiers (un dict "rivals" par joueur) sont convertis à la première écriture.
+    La position du journal couverte par chaque fichier est gardée dans `<journal>.ckpt`.
+    """
+
+    def __init__(self, journal, flush_delay=STATS_FLUSH_DELAY):
+        super().__init__(journal, flush_delay)
+        self.data = {}       # nom de fichier -> dict des joueurs (sans les rivaux)
+        self.duels = {}      # nom de fichier -> HeadToHead
+        self.indexes = {}    # nom de fichier -> RankIndex (construit au premier classement)
+        self.dirty = set()   # fichiers modifiés depuis la dernière écriture
+        self.checkpoint = journal.path + ".ckpt"
+        self.offsets = read_stats_file(self.checkpoint) # nom de fichier -> octet du journal déjà inclus
+
+    def journal_offset(self, filename):
+        return self.offsets.get(filename, 0)
+
+    def players(self, filename):
+        if filename not in self.data:
+            self.data[filename], self.duels[filename] = read_stats_and_duels(filename)
+        return self.data[filename]
+
+    def head_to_head(self, filename):
+        self.players(filename)
+        return self.duels[filename]
+
+    # --- Compatibilité get_stats / save_stats (export / import complet) ---
+    def load(self, filename):
+        duels = self.head_to_head(filename)
+        return {uid: dict(data, rivals=duels.rivals_dict(uid)) for uid, data in self.players(filename).items()}
+
+    def replace(self, filename, stats):
+        self.data[filename], self.duels[filename] = split_rivals(stats)
+        self.indexes.pop(filename, None)
+        self.mark_dirty(filename)
+
+    def index(self, filename):
+        if filename not in self.indexes:
+            self.indexes[filename] = RankIndex(self.players(filename))
+        return self.indexes[filename]
+
+    def mark_dirty(self, filename):
+        self.dirty.add(filename)
+        self._schedule_flush()
+
+    # --- Écriture d'un résultat ---
+    def record(self, filename, uid, result):
+        stats = self.players(filename)
+        # Nouvelle fiche à chaque résultat (copie si le joueur existe) : une écriture
+        # en cours garde la sienne, intacte, sans copier tous les joueurs
+        player = dict(stats[uid]) if uid in stats else new_player()
+        apply_result(player, result)
+        stats[uid] = player
+        if filename in self.indexes:
+            self.indexes[filename].update(uid, stats[uid])
+        self.mark_dirty(filename)
+
+    def record_duel(self, filename, a, a_name, b, b_name, result):
+        self.head_to_head(filename).record(a, a_name, b, b_name, result)
+        self.mark_dirty(filename)
+
+    # --- Lectures utilisées par les commandes ---
+    def is_empty(self, filename):
+        return not self.players(filename)
+
+    def player(self, filename, uid):
+        return self.players(filename).get(uid)
+
+    def duel(self, filename, a, b):
+        return self.head_to_head(filename).get(a, b)
+
+    def rivals(self, filename, uid, limit=1):
+        return self.head_to_head(filename).top(uid, limit)
+
+    def known_names(self, filename, limit):
+        """Au plus `limit` pseudos enregistrés avec les duels : [(id, pseudo)]."""
+        return list(itertools.islice(self.head_to_head(filename).names.items(), limit))
+
+    def top_score(self, filename, limit=10):
+        stats = self.players(filename)
+        return [(uid, stats[uid]) for uid in self.index(filename).top_score(limit)]
+
+    def top_winrate(self, filename, limit=10, min_games=MIN_PARTIES_WINRATE):
+        stats = self.players(filename)
+        if min_games != MIN_PARTIES_WINRATE:
+            # Seuil inhabituel : pas d'index, on filtre à la main
+            eligibles = (item for item in stats.items() if total_parties(item[1]) >= min_games)
+            return heapq.nlargest(limit, eligibles, key=calcul_winrate)
+        return [(uid, stats[uid]) for uid in self.index(filename).top_winrate(limit)]
+
+    def rank_score(self, filename, uid):
+        return self.index(filename).rank_score(uid)
+
+    def rank_winrate(self, filename, uid):
+        return self.index(filename).rank_winrate(uid)
+
+    # --- Écriture disque ---
+    def _encoder(self, filename):
+        # Les fiches sont remplacées, jamais modifiées sur place (voir record) : copier le dict suffit
+        return functools.partial(dump_compact, dict(self.data[filename]))
+
+    def _payloads(self, filename):
+        """[(chemin, encode)] : les copies sont prises ici, encode() (json.dumps) tourne dans le thread d'écriture."""
+        # Les duels d'abord : un fichier de joueurs sans rivaux n'existe jamais sans eux
+        return [(duels_file(filename), functools.partial(dump_compact, self.duels[filename].snapshot())),
+                (filename, self._encoder(filename))]
+
+    def _clean_offsets(self):
+        # Un fichier propre contient toutes les parties du journal jusqu'ici
+        return {filename: self.journal.size for filename in SQL_TABLES if filename not in self.dirty}
+
+    def _advance_offsets(self, written):
+        """Nouveau contenu du checkpoint, ou None s'il n'a pas changé (rien à réécrire).
+
+        `written` : fichier -> taille du journal au moment où son contenu a été copié,
+        même s'il est redevenu sale pendant l'écriture (la partie suivante sera rejouée).
+        Un crash entre l'écriture d'un fichier et celle du checkpoint ferait
+        rejouer les parties de cet intervalle : la fenêtre est de quelques ms.
+        """
+        before = dict(self.offsets)
+        self.offsets.update(written)
+        if self.offsets == before:
+            return None
+        return json.dumps(self.offsets)
+
+    async def flush_async(self):
+        """Compaction : écrit les fichiers modifiés ; l'encodage et l'accès disque partent dans un thread."""
+        self._cancel_flush()
+        written = self._clean_offsets()
+        for filename in list(self.dirty):
+            self.dirty.discard(filename)
+            size = self.journal.size
+            payloads = self._payloads(filename)
+            try:
+                for path, encode in payloads:
+                    await asyncio.to_thread(write_encoded, path, encode)
+            except OSError as e:
+                print(f"Erreur d'écriture de {filename}: {e}")
+                self.mark_dirty(filename)
+                continue
+            written[filename] = size
+        checkpoint = self._advance_offsets(written)
+        if checkpoint is not None:
+            await asyncio.to_thread(write_atomic, self.checkpoint, checkpoint)
+
+    def flush(self):
+        """Écriture synchrone de tout ce qui reste (arrêt du bot)."""
+        self._cancel_flush()
+        written = self._clean_offsets()
+        for filename in list(self.dirty):
+            self.dirty.discard(filename)
+            size = self.journal.size
+            for path, encode in self._payloads(filename):
+                write_encoded(path, encode)
+            written[filename] = size
+        checkpoint = self._advance_offsets(written)
+        if checkpoint is not None:
+            write_atomic(self.checkpoint, checkpoint)
+
+class SqliteStatsStore(WriteBehindStore):
+    """Stats dans une base SQLite (mode WAL) : une table de joueurs et une table de duels par jeu.
+
+    Les colonnes points / total / winrate sont maintenues à chaque résultat et indexées,
+    les classements sont donc des requêtes indexées au lieu d'un tri de tout le fichier.
+    Les écritures sont regroupées dans une transaction validée toutes les STATS_FLUSH_DELAY secondes.
+    Au premier lancement, les fichiers JSON existants sont importés une seule fois.
+    Un duel = une ligne par paire (id_min, id_max), indexée des deux côtés par nombre de parties.
+    La position du journal déjà incluse est validée dans la même transaction (table meta).
+    """
+
+    def __init__(self, journal, path=STATS_DB, flush_delay=STATS_FLUSH_DELAY):
+        super().__init__(journal, flush_delay)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS names (user_id TEXT PRIMARY KEY, name TEXT)")
+        for filename, game in SQL_TABLES.items():
+            self._create_tables(game)
+            self._migrate_json(filename)
+        self.db.commit()
+
+    def _create_tables(self, game):
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS players_{game} (
+                user_id TEXT PRIMARY KEY,
+                wins INTEGER NOT NULL DEFAULT 0,
+                losses INTEGER NOT NULL DEFAULT 0,
+                draws INTEGER NOT NULL DEFAULT 0,
+                current_streak INTEGER NOT NULL DEFAULT 0,
+                max_streak INTEGER NOT NULL DEFAULT 0,
+                points REAL NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                winrate REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_{game}_points ON players_{game} (points);
+            DROP INDEX IF EXISTS idx_{game}_winrate; -- remplacé par l'index partiel, seul utilisé
+            CREATE INDEX IF NOT EXISTS idx_{game}_winrate_rang ON players_{game} (winrate, wins)
+                WHERE total >= {MIN_PARTIES_WINRATE};
+            CREATE TABLE IF NOT EXISTS duels_{game} (
+                low_id TEXT NOT NULL,
+                high_id TEXT NOT NULL,
+                low_wins INTEGER NOT NULL DEFAULT 0,
+                high_wins INTEGER NOT NULL DEFAULT 0,
+                draws INTEGER NOT NULL DEFAULT 0,
+                games INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (low_id, high_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_{game}_duels_low ON duels_{game} (low_id, games);
+            CREATE INDEX IF NOT EXISTS idx_{game}_duels_high ON duels_{game} (high_id, games);
+        """)
+        # Ancienne table rivals_<jeu> (chaque duel en double) : reprise une seule fois
+        if self.db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"rivals_{game}",)).fetchone():
+            self.db.executescript(f"""
+                INSERT OR IGNORE INTO duels_{game} (low_id, high_id, low_wins, high_wins, draws, games)
+                    SELECT user_id, opponent_id, wins, losses, draws, wins + losses + draws
+                    FROM rivals_{game} WHERE user_id < opponent_id;
+                INSERT OR IGNORE INTO duels_{game} (low_id, high_id, low_wins, high_wins, draws, games)
+                    SELECT opponent_id, user_id, losses, wins, draws, wins + losses + draws
+                    FROM rivals_{game} WHERE user_id > opponent_id;
+                INSERT OR IGNORE INTO names (user_id, name)
+                    SELECT opponent_id, name FROM rivals_{game} WHERE name IS NOT NULL;
+                DROP TABLE rivals_{game};
+            """)
+
+    def _migrate_json(self, filename):
+        """Import unique d'un ancien fichier JSON (marqué dans la table meta)."""
+        key = f"migrated:{filename}"
+        if self.db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return
+        stats = read_stats_file(filename)
+        if stats:
+            self._import(filename, *read_stats_and_duels(filename))
+            print(f"Migration de {filename} vers SQLite : {len(stats)} joueurs")
+        self.db.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(int(time.time()))))
+        if not stats:
+            return
+        # Le fichier JSON est à jour jusqu'à son propre checkpoint
+        offsets = read_stats_file(self.journal.path + ".ckpt")
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        (f"journal:{filename}", str(offsets.get(filename, 0))))
+
+    def journal_offset(self, filename):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (f"journal:{filename}",)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _import(self, filename, players, duels):
+        game = SQL_TABLES[filename]
+        for uid, data in players.items():
+            self._write_player(game, uid, data)
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO duels_{game} (low_id, high_id, low_wins, high_wins, draws, games) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            ((low, high, low_wins, high_wins, draws, low_wins + high_wins + draws)
+             for low, high, low_wins, high_wins, draws in duels.items()))
+        self.db.executemany("INSERT OR IGNORE INTO names (user_id, name) VALUES (?, ?)", duels.names.items())
+
+    def _write_player(self, game, uid, data):
+        total = total_parties(data)
+        points = data["wins"] + data["draws"] * 0.5
+        self.db.execute(
+            f"INSERT OR REPLACE INTO players_{game} "
+            "(user_id, wins, losses, draws, current_streak, max_streak, points, total, winrate) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (uid, data["wins"], data["losses"], data["draws"], data.get("current_streak", 0),
+             data.get("max_streak", 0), points, total, points / total if total > 0 else 0),
+        )
+
+    def _read_player(self, game, uid):
+        row = self.db.execute(f"SELECT * FROM players_{game} WHERE user_id = ?", (uid,)).fetchone()
+        if row is None:
+            return None
+        return {k: row[k] for k in ("wins", "losses", "draws", "current_streak", "max_streak")}
+
+    # --- Compatibilité get_stats / save_stats (export / import complet) ---
+    def load(self, filename):
+        game = SQL_TABLES[filename]
+        uids = [row[0] for row in self.db.execute(f"SELECT user_id FROM players_{game}")]
+        stats = {}
+        for uid in uids:
+            stats[uid] = self._read_player(game, uid)
+            stats[uid]["rivals"] = {oid: {"name": name, "wins": wins, "losses": losses, "draws": draws}
+                                    for oid, name, wins, losses, draws in self.rivals(filename, uid, -1)}
+        return stats
+
+    def replace(self, filename, stats):
+        game = SQL_TABLES[filename]
+        self.db.execute(f"DELETE FROM players_{game}")
+        self.db.execute(f"DELETE FROM duels_{game}")
+        self._import(filename, *split_rivals(stats))
+        self._schedule_flush()
+
+    # --- Écriture d'un résultat ---
+    def record(self, filename, uid, result):
+        game = SQL_TABLES[filename]
+        player = self._read_player(game, uid) or new_player()
+        apply_result(player, result)
+        self._write_player(game, uid, player)
+        self._schedule_flush()
+
+    def record_duel(self, filename, a, a_name, b, b_name, result):
+        game = SQL_TABLES[filename]
+        low, high = HeadToHead.key(a, b)
+        if result == 'win':
+            counts = (1, 0, 0) if a == low else (0, 1, 0)
+        else:
+            counts = (0, 0, 1)
+        self.db.execute(
+            f"INSERT INTO duels_{game} (low_id, high_id, low_wins, high_wins, draws, games) VALUES (?, ?, ?, ?, ?, 1) "
+            "ON CONFLICT (low_id, high_id) DO UPDATE SET low_wins = low_wins + excluded.low_wins, "
+            "high_wins = high_wins + excluded.high_wins, draws = draws + excluded.draws, games = games + 1",
+            (low, high, *counts))
+        self.db.executemany("INSERT OR REPLACE INTO names (user_id, name) VALUES (?, ?)", ((a, a_name), (b, b_name)))
+        self._schedule_flush()
+
+    # --- Lectures utilisées par les commandes ---
+    def is_empty(self, filename):
+        return self.db.execute(f"SELECT 1 FROM players_{SQL_TABLES[filename]} LIMIT 1").fetchone() is None
+
+    def player(self, filename, uid):
+        return self._read_player(SQL_TABLES[filename], uid)
+
+    def duel(self, filename, a, b):
+        low, high = HeadToHead.key(a, b)
+        row = self.db.execute(f"SELECT low_wins, high_wins, draws FROM duels_{SQL_TABLES[filename]} "
+                              "WHERE low_id = ? AND high_id = ?", (low, high)).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1], row[2]) if a == low else (row[1], row[0], row[2])
+
+    def known_names(self, filename, limit):
+        # Table partagée par tous les jeux
+        return [tuple(row) for row in self.db.execute("SELECT user_id, name FROM names LIMIT ?", (limit,))]
+
+    def rivals(self, filename, uid, limit=1):
+        # Chaque moitié de l'union suit un des deux index (low_id, games) / (high_id, games)
+        game = SQL_TABLES[filename]
+        rows = self.db.execute(
+            f"SELECT d.opponent_id, n.name, d.wins, d.losses, d.draws FROM ("
+            f"  SELECT high_id AS opponent_id, low_wins AS wins, high_wins AS losses, draws, games FROM duels_{game} WHERE low_id = ?"
+            f"  UNION ALL"
+            f"  SELECT low_id, high_wins, low_wins, draws, games FROM duels_{game} WHERE high_id = ?"
+            f") AS d LEFT JOIN names AS n ON n.user_id = d.opponent_id ORDER BY d.games DESC LIMIT ?",
+            (uid, uid, limit))
+        return [tuple(row) for row in rows]
+
+    def _rows(self, game, cursor):
+        return [(row["user_id"], dict(row)) for row in cursor]
+
+    def top_score(self, filename, limit=10):
+        game = SQL_TABLES[filename]
+        return self._rows(game, self.db.execute(
+            f"SELECT * FROM players_{game} ORDER BY points DESC LIMIT ?", (limit,)))
+
+    def top_winrate(self, filename, limit=10, min_games=MIN_PARTIES_WINRATE):
+        game = SQL_TABLES[filename]
+        if min_games != MIN_PARTIES_WINRATE:
+            # Seuil inhabituel : pas d'index, SQLite parcourt la table
+            return self._rows(game, self.db.execute(
+                f"SELECT * FROM players_{game} WHERE total >= ? ORDER BY winrate DESC, wins DESC LIMIT ?",
+                (min_games, limit)))
+        # Seuil en dur, comme rank_winrate : l'index partiel donne directement l'ordre du classement
+        return self._rows(game, self.db.execute(
+            f"SELECT * FROM players_{game} WHERE total >= {MIN_PARTIES_WINRATE} "
+            f"ORDER BY winrate DESC, wins DESC LIMIT ?", (limit,)))
+
+    def rank_score(self, filename, uid):
+        game = SQL_TABLES[filename]
+        (rank,) = self.db.execute(
+            f"SELECT 1 + COUNT(*) FROM players_{game} "
+            f"WHERE points > (SELECT points FROM players_{game} WHERE user_id = ?)", (uid,)).fetchone()
+        return rank
+
+    def rank_winrate(self, filename, uid):
+        game = SQL_TABLES[filename]
+        me = self.db.execute(f"SELECT winrate, wins FROM players_{game} WHERE user_id = ?", (uid,)).fetchone()
+        # Seuil en dur (pas en paramètre) : SQLite ne prend l'index partiel que s'il peut prouver sa condition,
+        # et la comparaison de tuples se lit comme un seul intervalle de cet index
+        (rank,) = self.db.execute(
+            f"SELECT 1 + COUNT(*) FROM players_{game} "
+            f"WHERE total >= {MIN_PARTIES_WINRATE} AND (winrate, wins) > (?, ?)",
+            (me["winrate"], me["wins"])).fetchone()
+        return rank
+
+    # --- Validation des transactions ---
+    async def flush_async(self):
+        self.flush()
+
+    def flush(self):
+        self._cancel_flush()
+        for filename in SQL_TABLES:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            (f"journal:{filename}", str(self.journal.size)))
+        self.db.commit()
+
+class StatsColumns:
+    """Stats d'un jeu en colonnes : un tableau NumPy par champ, une ligne par joueur.
+
+    Les rivaux n'y sont pas : ils sont dans le HeadToHead du jeu, comme pour JsonStatsStore.
+    """
+
+    FIELDS = ("wins", "losses", "draws", "current_streak", "max_streak")
+
+    def __init__(self, capacity=1024):
+        self.ids = []  # ligne -> id
+        self.rows = {} # id -> ligne
+        self.cols = {field: np.zeros(capacity, dtype=np.int32) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, stats):
+        columns = cls(max(1024, len(stats)))
+        for uid, data in stats.items():
+            row = columns.row(uid)
+            for field in cls.FIELDS:
+                columns.cols[field][row] = data.get(field, 0)
+        return columns
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, uid):
+        row = self.rows.get(uid)
+        if row is None:
+            row = self.rows[uid] = len(self.ids)
+            self.ids.append(uid)
+            if row == len(self.cols["wins"]):
+                for field, col in self.cols.items():
+                    self.cols[field] = np.resize(col, row * 2)
+                    self.cols[field][row:] = 0
+        return row
+
+    # --- Écriture d'un résultat (mêmes règles que apply_result) ---
+    def record(self, uid, result):
+        row = self.row(uid)
+        cols = self.cols
+        if result == 'win':
+            cols["wins"][row] += 1
+            cols["current_streak"][row] += 1
+            if cols["current_streak"][row] > cols["max_streak"][row]:
+                cols["max_streak"][row] = cols["current_streak"][row]
+        elif result == 'loss':
+            cols["losses"][row] += 1
+            cols["current_streak"][row] = 0
+        elif result == 'draw':
+            cols["draws"][row] += 1
+
+    # --- Lectures ---
+    def player(self, uid):
+        """Fiche au format new_player()."""
+        row = self.rows.get(uid)
+        if row is None:
+            return None
+        return {field: int(self.cols[field][row]) for field in self.FIELDS}
+
+    def points(self):
+        n = len(self.ids)
+        return self.cols["wins"][:n] + self.cols["draws"][:n] * 0.5
+
+    def totals(self):
+        n = len(self.ids)
+        return self.cols["wins"][:n] + self.cols["losses"][:n] + self.cols["draws"][:n]
+
+    def winrates(self, min_games):
+        """Winrate de chaque ligne, -inf pour les lignes hors classement."""
+        totals = self.totals()
+        eligible = totals >= max(min_games, 1)
+        rates = np.full(len(totals), -np.inf)
+        rates[eligible] = self.points()[eligible] / totals[eligible]
+        return rates
+
+    def _top(self, values, limit, tie_key):
+        # Sélection partielle en O(n), puis tri exact des quelques candidats (égalités comprises)
+        valid = np.flatnonzero(values > -np.inf)
+        if len(valid) > limit:
+            cut = len(valid) - limit
+            kth = np.partition(values[valid], cut)[cut]
+            valid = valid[values[valid] >= kth]
+        return [self.ids[row] for row in sorted(valid.tolist(), key=tie_key)[:limit]]
+
+    def top_score(self, limit):
+        points = self.points()
+        return self._top(points, limit, lambda row: (-points[row], self.ids[row]))
+
+    def top_winrate(self, limit, min_games):
+        rates = self.winrates(min_games)
+        wins = self.cols["wins"]
+        return self._top(rates, limit, lambda row: (-rates[row], -wins[row], self.ids[row]))
+
+    def rank_score(self, uid):
+        points = self.points()
+        return 1 + int(np.count_nonzero(points > points[self.rows[uid]]))
+
+    def rank_winrate(self, uid, min_games=MIN_PARTIES_WINRATE):
+        rates = self.winrates(min_games)
+        wins = self.cols["wins"][:len(self.ids)]
+        row = self.rows[uid]
+        better = (rates > rates[row]) | ((rates == rates[row]) & (wins > wins[row]))
+        return 1 + int(np.count_nonzero(better))
+
+    def snapshot(self):
+        """(ids, colonnes) copiés tels quels (memcpy) : encode(*snapshot) peut tourner dans un thread."""
+        n = len(self.ids)
+        return self.ids[:], {field: self.cols[field][:n].copy() for field in self.FIELDS}
+
+    @classmethod
+    def encode(cls, ids, cols):
+        """Même format que les fichiers de joueurs de JsonStatsStore (sans les rivaux)."""
+        rows = zip(*(cols[field].tolist() for field in cls.FIELDS))
+        return dump_compact({uid: dict(zip(cls.FIELDS, row)) for uid, row in zip(ids, rows)})
+    def nbytes(self):
+        """Taille approximative en mémoire (tableaux + index Python)."""
+        return sum(col.nbytes for col in self.cols.values()) + sys.getsizeof(self.ids) + sys.getsizeof(self.rows)
+
+class ColumnarStatsStore(JsonStatsStore):
+    """Mêmes fichiers JSON que JsonStatsStore, mais gardés en mémoire sous forme de StatsColumns.
+
+    Pour les très gros fichiers : quelques octets par joueur au lieu d'un dict par
+    joueur, et des classements calculés en NumPy sur toutes les lignes.
+    """
+
+    def __init__(self, journal, flush_delay=STATS_FLUSH_DELAY):
+        if np is None:
+            raise RuntimeError("STATS_BACKEND=columns demande numpy (pip install numpy)")
+        super().__init__(journal, flush_delay)
+
+    def players(self, filename):
+        if filename not in self.data:
+            stats, self.duels[filename] = read_stats_and_duels(filename)
+            self.data[filename] = StatsColumns.from_dict(stats)
+        return self.data[filename]
+
+    # --- Compatibilité get_stats / save_stats (export / import complet) ---
+    def load(self, filename):
+        columns, duels = self.players(filename), self.duels[filename]
+        return {uid: dict(columns.player(uid), rivals=duels.rivals_dict(uid)) for uid in columns.ids}
+
+    def replace(self, filename, stats):
+        self.data[filename] = StatsColumns.from_dict(stats)
+        self.duels[filename] = HeadToHead.from_rivals(stats)
+        self.mark_dirty(filename)
+
+    # --- Écriture d'un résultat ---
+    def record(self, filename, uid, result):
+        self.players(filename).record(uid, result)
+        self.mark_dirty(filename)
+
+    # --- Lectures utilisées par les commandes ---
+    def is_empty(self, filename):
+        return len(self.players(filename)) == 0
+
+    def player(self, filename, uid):
+        return self.players(filename).player(uid)
+
+    def top_score(self, filename, limit=10):
+        columns = self.players(filename)
+        return [(uid, columns.player(uid)) for uid in columns.top_score(limit)]
+
+    def top_winrate(self, filename, limit=10, min_games=MIN_PARTIES_WINRATE):
+        columns = self.players(filename)
+        return [(uid, columns.player(uid)) for uid in columns.top_winrate(limit, min_games)]
+
+    def rank_score(self, filename, uid):
+        return self.players(filename).rank_score(uid)
+
+    def rank_winrate(self, filename, uid):
+        return self.players(filename).rank_winrate(uid)
+
+    def _encoder(self, filename):
+        return functools.partial(StatsColumns.encode, *self.data[filename].snapshot())
+
+if STATS_BACKEND == "sqlite":
+    STATS = SqliteStatsStore(JOURNAL)
+elif STATS_BACKEND == "columns":
+    STATS = ColumnarStatsStore(JOURNAL)
+else:
+    STATS = JsonStatsStore(JOURNAL)
+
+def get_stats(filename):
+    """Renvoie les données (en mémoire) d'un fichier spécifique."""
+    return STATS.load(filename)
+
+def save_stats(filename, stats):
+    """Enregistre les données ; l'écriture disque se fera en arrière-plan."""
+    STATS.replace(filename, stats)
+    LEADERBOARDS.bump(filename)
+
+# Résolution des pseudos (classements)
+class NameResolver:
+    """Cache partagé id -> pseudo (LRU avec durée de vie) pour les classements.
+
+    Rempli gratuitement par les pseudos enregistrés avec les stats (au démarrage),
+    les parties jouées et les interactions. Un nom périmé est servi tout de
+    suite et rafraîchi en arrière-plan ; seuls les ids jamais vus déclenchent un
+    fetch_user, lancés en parallèle mais jamais plus de `concurrency` à la fois.
+    """
+
+    def __init__(self, maxsize=10000, ttl=6 * 3600, concurrency=4):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = OrderedDict() # id -> (pseudo ou None si introuvable, date)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.refreshing = set()
+
+    def remember(self, user_id, name):
+        uid = str(user_id)
+        self.cache[uid] = (name, time.monotonic())
+        self.cache.move_to_end(uid)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    def seed(self, names):
+        """Pseudos lus sur le disque : ajoutés comme périmés (servis, puis rafraîchis à la première lecture)."""
+        for uid, name in names:
+            if len(self.cache) >= self.maxsize:
+                return
+            self.cache.setdefault(uid, (name, float("-inf")))
+
+    async def _fetch(self, client, uid):
+        async with self.semaphore:
+            try:
+                user = await client.fetch_user(int(uid))
+                self.remember(uid, user.name)
+            except discord.NotFound:
+                self.remember(uid, None) # Compte supprimé : inutile de redemander
+            except (discord.HTTPException, ValueError):
+                pass
+        self.refreshing.discard(uid)
+
+    async def resolve_many(self, client, guild, user_ids):
+        """Renvoie {id: pseudo ou None} pour tous les ids demandés."""
+        now = time.monotonic()
+        names, missing = {}, []
+        for uid in map(str, user_ids):
+            member = guild.get_member(int(uid)) if guild else None
+            if member:
+                self.remember(uid, member.name)
+                names[uid] = member.name
+                continue
+            cached = self.cache.get(uid)
+            if cached is None:
+                missing.append(uid)
+                continue
+            self.cache.move_to_end(uid)
+            names[uid] = cached[0]
+            if now - cached[1] > self.ttl and uid not in self.refreshing:
+                # Nom périmé : on l'affiche quand même et on le rafraîchit en fond
+                self.refreshing.add(uid)
+                background_task(self._fetch(client, uid))
+        if missing:
+            await asyncio.gather(*(self._fetch(client, uid) for uid in missing))
+            for uid in missing:
+                names[uid] = self.cache.get(uid, (None, 0))[0]
+        return names
+
+NAMES = NameResolver()
+
+class LeaderboardCache:
+    """Embeds de classement déjà construits, valables tant qu'aucune partie du jeu n'est enregistrée.
+
+    Chaque jeu a un numéro de version incrémenté à chaque résultat ; une entrée
+    n'est servie que si elle a été construite avec la version courante.
+    """
+
+    def __init__(self, maxsize=2000):
+        self.maxsize = maxsize
+        self.versions = {filename: 0 for filename in SQL_TABLES}
+        self.entries = OrderedDict() # clé -> (version, contenu)
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, filename):
+        self.versions[filename] += 1
+
+    def get(self, filename, key):
+        entry = self.entries.get((filename, key))
+        if entry is not None and entry[0] == self.versions[filename]:
+            self.entries.move_to_end((filename, key))
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, filename, key, value):
+        self.entries[(filename, key)] = (self.versions[filename], value)
+        self.entries.move_to_end((filename, key))
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+LEADERBOARDS = LeaderboardCache()
+
+def update_score(user_id, result, filename):
+    STATS.record(filename, str(user_id), result)
+
+def apply_match(filename, a_id, a_name, b_id, b_name, result):
+    """Applique une partie aux stats des deux joueurs ('win' = a a gagné)."""
+    NAMES.remember(a_id, a_name)
+    NAMES.remember(b_id, b_name)
+    LEADERBOARDS.bump(filename)
+    if result == 'win':
+        update_score(a_id, 'win', filename)
+        update_score(b_id, 'loss', filename)
+    else:
+        update_score(a_id, 'draw', filename)
+        update_score(b_id, 'draw', filename)
+    # Le duel n'est écrit qu'une fois, pour la paire
+    STATS.record_duel(filename, str(a_id), a_name, str(b_id), b_name, result)
+
+def record_match(filename, player_a, player_b, result):
+    """Enregistre une partie terminée : une ligne au journal puis les stats en mémoire."""
+    with Span("stats"):
+        JOURNAL.append(filename, player_a.id, player_a.name, player_b.id, player_b.name, result)
+        apply_match(filename, player_a.id, player_a.name, player_b.id, player_b.name, result)
+        RATINGS.update(filename, player_a.id, player_b.id, result)
+
+def replay_journal():
+    """Rejoue les parties du journal que les fichiers de stats ne contiennent pas encore."""
+    offsets = {filename: STATS.journal_offset(filename) for filename in SQL_TABLES}
+    replayed = 0
+    for pos, rec in JOURNAL.read(min(offsets.values())):
+        filename = JOURNAL_GAMES[rec["g"]]
+        if pos < offsets[filename]:
+            continue
+        apply_match(filename, rec["a"], rec["an"], rec["b"], rec["bn"], 'win' if rec["r"] == "w" else 'draw')
+        replayed += 1
+    if replayed:
+        print(f"Journal des parties : {replayed} partie(s) rejouée(s)")
+        STATS.flush()
+
+def init():
+    """Rattrapage du journal au démarrage du bot (pas à l'import : bench.py importe ce module)."""
+    replay_journal()
+    RATINGS.load() # Pas de mise à jour pendant replay_journal : les cotes ont leur propre position dans le journal
+    for filename in SQL_TABLES:
+        NAMES.seed(STATS.known_names(filename, NAMES.maxsize))
+    # Filets de sécurité si le bot s'arrête sans close()
+    atexit.register(STATS.flush)
+    atexit.register(RATINGS.flush)
+
+###################################################################################################""
+# --- CLOSE TICKET VIEW ---
+class CloseTicketView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    @discord.ui.button(label="Fermer le ticket", style=discord.ButtonStyle.danger, custom_id="close_ticket")
+    async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if isinstance(interaction.channel, discord.Thread):
+            await interaction.response.send_message("Le ticket va être archivé...")
+            # Locking prevents further messages, archiving hides it.
+            await interaction.channel.edit(archived=True, locked=True)
+        else:
+            await interaction.response.send_message("Cette commande ne peut être utilisée que dans un fil.", ephemeral=True)
+
+# --- OPEN TICKET VIEW ---
+class TicketView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    @discord.ui.button(label="Ouvrir un Ticket", style=discord.ButtonStyle.success, custom_id="open_ticket_thread")
+    async def open_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not isinstance(interaction.channel, discord.TextChannel):
+            return await interaction.response.send_message("Impossible de créer un fil ici.", ephemeral=True)
+
+        try:
+            # NOTE: Private threads require Community enabled or certain Boost levels.
+            # Using public_thread is a safer fallback if private fails.
+            thread = await interaction.channel.create_thread(
+                name=f"ticket-{interaction.user.name}",
+                type=discord.ChannelType.private_thread, 
+                auto_archive_duration=1440,
+                reason=f"Ticket ouvert par {interaction.user.display_name}"
+            )
+
+            await thread.add_user(interaction.user)
+            await interaction.response.send_message(f"Ton ticket a été créé : {thread.mention}", ephemeral=True)
+            
+            embed = discord.Embed(
+                title="Support",
+                description=f"Bonjour {interaction.user.mention} !\nPosez votre question ici. Un membre du staff vous répondra dès que possible.",
+                color=discord.Color.green()
+            )
+            await thread.send(embed=embed, view=CloseTicketView())
+
+        except discord.Forbidden:
+            await interaction.response.send_message("Le bot n'a pas la permission 'Gérer les fils' ou 'Fils privés' !", ephemeral=True)
+        except discord.HTTPException as e:
+            await interaction.response.send_message(f"Erreur : Les fils privés nécessitent peut-être un niveau de boost plus élevé. {e}", ephemeral=True)
+
+# --- FILE D'ÉDITIONS DES MESSAGES ---
+# Discord limite les éditions par salon (environ 5 toutes les 5 s) : au-delà, les requêtes
+# attendent dans le limiteur de discord.py et une vieille édition peut arriver après une récente.
+EDIT_BURST = int(os.getenv("EDIT_BURST", "5"))
+EDIT_PERIOD = float(os.getenv("EDIT_PERIOD", "5"))
+
+class PendingEdit:
+    __slots__ = ("message", "kwargs", "background", "waiters")
+
+    def __init__(self, message, kwargs, background):
+        self.message = message
+        self.kwargs = kwargs
+        self.background = background
+        self.waiters = []
+
+class EditLane:
+    """Un seau de jetons par salon + les messages qui y attendent une édition (ordre d'arrivée)."""
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.order = OrderedDict() # message.id -> None
+        self.wake = asyncio.Event()
+        self.task = None
+
+class MessageEditQueue:
+    """Éditions sortantes des messages de jeu, au rythme des limites de Discord.
+
+    - Une seule édition en attente par message : la dernière écrase les précédentes
+      (les champs sont fusionnés, le plus récent gagne).
+    - Les éditions liées à un clic passent avant celles du chrono ; le chrono garde
+      toujours un jeton de réserve pour les clics et attend sinon, sans s'empiler.
+    - Les réponses aux interactions passent par `respond`, qui annule ce qu'elles rendent obsolète.
+    """
+
+    def __init__(self, burst=EDIT_BURST, period=EDIT_PERIOD):
+        self.burst = burst
+        self.rate = burst / period # jetons par seconde
+        self.lanes = {} # channel.id -> EditLane
+        self.pending = {} # message.id -> PendingEdit
+        self.sent = 0
+        self.coalesced = 0
+
+    async def edit(self, message, **kwargs):
+        """Édition prioritaire (suite à un clic). Rend la main une fois cette version (ou une plus récente) envoyée."""
+        waiter = asyncio.get_running_loop().create_future()
+        self._submit(message, kwargs, False, waiter)
+        with Span("discord"): # L'envoi se fait dans la tâche du salon, hors de la trace : on compte l'attente ici
+            return await waiter
+
+    def post(self, message, **kwargs):
+        """Édition de fond (chrono) : rien à attendre, elle sera fusionnée ou retardée si le salon sature."""
+        self._submit(message, kwargs, True, None)
+
+    async def respond(self, interaction, **kwargs):
+        """interaction.response.edit_message, qui passe devant tout : on retire de la file ce qu'elle remplace."""
+        entry = self.pending.get(interaction.message.id) if interaction.message else None
+        if entry:
+            for key in kwargs:
+                entry.kwargs.pop(key, None)
+            if not entry.kwargs:
+                del self.pending[entry.message.id]
+                self.lanes[entry.message.channel.id].order.pop(entry.message.id, None)
+                self._settle(entry, None)
+        await interaction.response.edit_message(**kwargs)
+
+    def _submit(self, message, kwargs, background, waiter):
+        entry = self.pending.get(message.id)
+        if entry:
+            self.coalesced += 1
+            entry.message = message
+            entry.kwargs.update(kwargs)
+            entry.background = entry.background and background
+        else:
+            entry = self.pending[message.id] = PendingEdit(message, dict(kwargs), background)
+            lane = self.lanes.get(message.channel.id)
+            if lane is None:
+                lane = self.lanes[message.channel.id] = EditLane(self.burst)
+            lane.order[message.id] = None
+        if waiter:
+            entry.waiters.append(waiter)
+        lane = self.lanes[message.channel.id]
+        if lane.task is None or lane.task.done():
+            lane.task = background_task(self._run(lane))
+        lane.wake.set()
+
+    @staticmethod
+    def _settle(entry, error):
+        for waiter in entry.waiters:
+            if waiter.done():
+                continue
+            if error:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(None)
+
+    def _next(self, lane):
+        """Premier message prioritaire, sinon le premier du chrono."""
+        first = None
+        for message_id in lane.order:
+            entry = self.pending[message_id]
+            if not entry.background:
+                return entry
+            if first is None:
+                first = entry
+        return first
+
+    async def _run(self, lane):
+        while lane.order:
+            now = time.monotonic()
+            lane.tokens = min(self.burst, lane.tokens + (now - lane.updated) * self.rate)
+            lane.updated = now
+
+            entry = self._next(lane)
+            needed = 2 if entry.background and self.burst > 1 else 1 # un jeton reste réservé aux clics
+            if lane.tokens < needed:
+                lane.wake.clear()
+                try:
+                    await asyncio.wait_for(lane.wake.wait(), (needed - lane.tokens) / self.rate)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            lane.tokens -= 1
+            # L'entrée sort de la file avant l'envoi : une édition qui arrive pendant la requête repart en attente
+            del self.pending[entry.message.id]
+            lane.order.pop(entry.message.id, None)
+            error = None
+            try:
+                await entry.message.edit(**entry.kwargs)
+                self.sent += 1
+            except Exception as e:
+                if isinstance(e, discord.HTTPException) and e.status == 429:
+                    lane.tokens = 0 # Discord nous a freinés : on repart d'un seau vide
+                error = e
+            self._settle(entry, error) # Les erreurs du chrono sont ignorées, comme avant
+
+EDITS = MessageEditQueue()
+
+# --- REGISTRE DES PARTIES EN COURS ---
+# Sans registre, une partie abandonnée garde sa vue (et son plateau, et sa pendule) jusqu'au redémarrage.
+MAX_PARTIES = int(os.getenv("MAX_PARTIES", "200")) # parties simultanées sur tout le bot
+MAX_PARTIES_JOUEUR = int(os.getenv("MAX_PARTIES_JOUEUR", "3"))
+PARTIE_TTL = float(os.getenv("PARTIE_TTL", "600")) # secondes sans action avant qu'une partie expire
+
+class GameSession:
+    __slots__ = ("view", "kind", "players", "channel_id", "created", "last_activity")
+
+    def __init__(self, view, kind, players, channel_id):
+        self.view = view
+        self.kind = kind
+        self.players = players # ids des joueurs humains
+        self.channel_id = channel_id
+        self.created = self.last_activity = time.monotonic()
+
+def taille_approx(obj):
+    """Taille mémoire approximative d'un objet et de ce qu'il possède (octets).
+
+    On ne descend pas dans les objets rattachés au client Discord (membres, messages :
+    ils ont un `_state` et sont partagés avec son cache), ni dans les fonctions et les futures.
+    """
+    vus = set()
+    pile = [obj]
+    total = 0
+    while pile:
+        obj = pile.pop()
+        if id(obj) in vus or callable(obj) or isinstance(obj, asyncio.Future) or hasattr(obj, "_state"):
+            continue
+        vus.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pile.extend(obj.keys())
+            pile.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pile.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float)):
+            pile.extend(getattr(obj, "__dict__", {}).values())
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, slot):
+                        pile.append(getattr(obj, slot))
+    return total
+
+class GameRegistry:
+    """Toutes les parties en cours : plafonds, dernière activité et expiration.
+
+    Les sessions sont rangées de la moins récemment active à la plus récente
+    (OrderedDict), si bien que le balayage s'arrête à la première partie encore vivante.
+    """
+
+    def __init__(self, max_total=MAX_PARTIES, max_per_user=MAX_PARTIES_JOUEUR, ttl=PARTIE_TTL):
+        self.max_total = max_total
+        self.max_per_user = max_per_user
+        self.ttl = ttl
+        self.sessions = OrderedDict() # vue -> GameSession
+        self.by_user = {} # id joueur -> set(vues)
+        self.evicted = 0
+        self.task = None
+
+    def refus(self, *players):
+        """Message d'erreur si une nouvelle partie dépasserait un plafond, sinon None."""
+        if len(self.sessions) >= self.max_total:
+            return "Trop de parties en cours sur le bot, réessaie dans quelques minutes."
+        for player in players:
+            if len(self.by_user.get(player.id, ())) >= self.max_per_user:
+                return f"{player.mention} a déjà {self.max_per_user} parties en cours. Finis-en une avant d'en lancer une autre !"
+        return None
+
+    def add(self, view, kind, players, channel_id):
+        session = self.sessions[view] = GameSession(view, kind, tuple(p.id for p in players), channel_id)
+        for uid in session.players:
+            self.by_user.setdefault(uid, set()).add(view)
+        if self.task is None or self.task.done():
+            self.task = background_task(self._run())
+        return session
+
+    def touch(self, view):
+        session = self.sessions.get(view)
+        if session:
+            session.last_activity = time.monotonic()
+            self.sessions.move_to_end(view)
+
+    def remove(self, view):
+        session = self.sessions.pop(view, None)
+        if session is None:
+            return
+        for uid in session.players:
+            views = self.by_user.get(uid)
+            if views:
+                views.discard(view)
+                if not views:
+                    del self.by_user[uid]
+
+    def counts(self):
+        counts = {}
+        for session in self.sessions.values():
+            counts[session.kind] = counts.get(session.kind, 0) + 1
+        return counts
+
+    def memory(self):
+        """Octets approximatifs par type de partie (parcourt les objets : à réserver aux commandes d'admin)."""
+        memory = {}
+        for session in self.sessions.values():
+            memory[session.kind] = memory.get(session.kind, 0) + taille_approx(session.view)
+        return memory
+
+    async def evict(self, session):
+        self.evicted += 1
+        session.view.stop() # Retire aussi la vue du registre et du ViewStore de discord.py
+        try:
+            await session.view.on_timeout()
+        except Exception as e:
+            print(f"Erreur à l'expiration d'une partie ({session.kind}) : {e}")
+
+    async def _run(self):
+        while self.sessions:
+            await asyncio.sleep(min(60, self.ttl / 4))
+            limite = time.monotonic() - self.ttl
+            while self.sessions:
+                session = next(iter(self.sessions.values()))
+                if session.last_activity > limite:
+                    break
+                if session.view.is_finished():
+                    self.remove(session.view)
+                elif getattr(session.view, "turn_started", None) is not None:
+                    self.touch(session.view) # Pendule en marche : c'est le drapeau qui finira la partie
+                else:
+                    await self.evict(session)
+        self.task = None
+
+SESSIONS = GameRegistry()
+
+# Joueurs d'une partie sauvegardée : [id, pseudo, nom affiché]
+def joueur_snapshot(player):
+    return [player.id, player.name, player.display_name]
+
+def joueur_restore(state, data):
+    """Utilisateur reconstruit sans appel à l'API : l'id suffit aux comparaisons (== compare les ids)."""
+    user_id, name, display_name = data
+    return discord.User(state=state, data={"id": user_id, "username": name, "discriminator": "0", "avatar": None, "global_name": display_name})
+
+class GameView(discord.ui.View):
+    """Vue de jeu suivie par SESSIONS : chaque clic compte comme une activité, stop() la désinscrit."""
+
+    def __init__(self):
+        super().__init__(timeout=None) # L'expiration est gérée par SESSIONS
+        self.message = None # Message qui porte la vue, renseigné après l'envoi
+
+    async def interaction_check(self, interaction):
+        SESSIONS.touch(self)
+        return True
+
+    def stop(self):
+        SESSIONS.remove(self)
+        super().stop()
+
+    def is_ai_turn(self):
+        return False
+
+    async def resume_ai_turn(self):
+        """Partie rechargée au démarrage alors que le bot devait jouer : il joue son coup."""
+
+    async def on_timeout(self):
+        """Partie expirée : le plateau reste affiché mais plus rien n'est cliquable."""
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            await EDITS.edit(self.message, view=self)
+
+# --- SYNCHRONISATION DES COMMANDES ---
+# tree.sync() est un appel REST lent et très limité : on ne le fait que si les définitions
+# des commandes ont changé depuis la dernière synchro (supprimer le fichier force une synchro).
+COMMANDS_SYNC_FILE = os.getenv("COMMANDS_SYNC_FILE", "commands_sync.json")
+# Serveurs de test (ids séparés par des virgules) : synchro instantanée sur ces serveurs au lieu de la synchro globale
+DEV_GUILDS = [discord.Object(int(g)) for g in os.getenv("DEV_GUILDS", "").split(",") if g.strip()]
+
+def commands_hash(tree, guild=None):
+    """Empreinte des définitions envoyées à Discord (noms, options, descriptions, permissions...)."""
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)), key=lambda c: (c["type"], c["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+async def sync_commands(tree):
+    try:
+        with open(COMMANDS_SYNC_FILE) as f:
+            hashes = json.load(f)
+    except (FileNotFoundError, ValueError):
+        hashes = {}
+
+    for guild in DEV_GUILDS or [None]:
+        if guild:
+            tree.copy_global_to(guild=guild)
+        # L'id de l'application fait partie de la clé : changer de token resynchronise
+        key = f"{tree.client.application_id}:{guild.id if guild else 'global'}"
+        digest = commands_hash(tree, guild)
+        if hashes.get(key) == digest:
+            print(f"Commandes déjà à jour ({key}) : pas de synchro")
+            continue
+        start = time.perf_counter()
+        try:
+            await tree.sync(guild=guild)
+        except (discord.HTTPException, app_commands.CommandSyncFailure) as e:
+            # Pas d'empreinte enregistrée : la synchro sera retentée au prochain démarrage
+            print(f"Erreur de synchro des commandes ({key}) : {e}")
+            continue
+        hashes[key] = digest
+        print(f"Commandes synchronisées ({key}) en {time.perf_counter() - start:.2f}s")
+    write_atomic(COMMANDS_SYNC_FILE, json.dumps(hashes, indent=2))
+
+# --- SANTÉ ET MÉTRIQUES (HTTP) ---
+# Servi sur la boucle du bot (aiohttp est déjà installé avec discord.py) : plus de thread Flask.
+# /healthz répond 503 si la passerelle est coupée ou si la boucle est en retard ; /metrics pour Prometheus.
+HTTP_PORT = int(os.getenv("PORT", "8080"))
+HEALTH_MAX_LAG = float(os.getenv("HEALTH_MAX_LAG", "1.0")) # secondes de retard de la boucle tolérées
+
+# --- SURVEILLANCE DE LA BOUCLE ---
+# Tout tourne sur une seule boucle asyncio : un appel bloquant fige toutes les parties.
+LAG_SEUIL = float(os.getenv("LAG_SEUIL", "0.25")) # secondes de blocage avant de capturer la pile
+RETARD_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Mode debug (opt-in, coûteux) : asyncio signale tout callback de plus de SLOW_CALLBACK_MS avec l'endroit où il a été créé
+ASYNCIO_DEBUG = os.getenv("ASYNCIO_DEBUG", "") == "1"
+SLOW_CALLBACK_MS = float(os.getenv("SLOW_CALLBACK_MS", "100"))
+
+class LoopLagMonitor:
+    """Retard de la boucle asyncio + chien de garde qui capture la pile quand elle est bloquée.
+
+    Une tâche dort `interval` secondes et mesure le dépassement (histogramme). Un thread
+    à part vérifie que ce battement continue : s'il manque depuis plus de `threshold`
+    secondes, la boucle est bloquée et on journalise la pile de son thread, prise sur le
+    fait (une seule fois par blocage).
+    """
+
+    def __init__(self, interval=0.25, threshold=LAG_SEUIL):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        self.heartbeat = time.perf_counter()
+        self.loop_thread = None
+        self.task = None
+        self.watchdog = None
+        self.stalls = 0
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.loop_thread = threading.get_ident()
+            self.heartbeat = time.perf_counter()
+            self.task = asyncio.create_task(self._run())
+        if self.watchdog is None:
+            self.watchdog = threading.Thread(target=self._watch, name="chien-de-garde-boucle", daemon=True)
+            self.watchdog.start()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.heartbeat = now = time.perf_counter()
+            self.lag = max(0.0, now - start - self.interval)
+            METRICS.observe("bot_boucle_retard_secondes", self.lag, buckets=RETARD_BUCKETS)
+            if self.lag >= self.threshold:
+                METRICS.inc("bot_boucle_blocages_total")
+
+    def _watch(self):
+        reported = None # battement du blocage déjà signalé
+        while True:
+            time.sleep(min(self.interval, self.threshold) / 2)
+            heartbeat = self.heartbeat
+            blocked = time.perf_counter() - heartbeat - self.interval
+            if blocked < self.threshold or heartbeat == reported:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self.loop_thread)
+            if frame is None:
+                continue
+            self.stalls += 1
+            stack = "".join(traceback.format_stack(frame))
+            print(f"Boucle bloquée depuis {blocked * 1000:.0f} ms, pile du thread de la boucle :\n{stack}")
+
+LOOP_LAG = LoopLagMonitor()
+
+def enable_asyncio_debug(loop):
+    """Mode debug d'asyncio : chaque callback trop long est journalisé (logger "asyncio") avec son origine."""
+    loop.set_debug(True)
+    loop.slow_callback_duration = SLOW_CALLBACK_MS / 1000
+    print(f"Debug asyncio actif : callbacks de plus de {SLOW_CALLBACK_MS:.0f} ms signalés")
+
+METRICS.describe("bot_interactions_total", "Interactions reçues (rate() pour les interactions/s)")
+METRICS.describe("bot_interaction_duree_secondes", "Durée totale des commandes et callbacks")
+METRICS.describe("bot_interaction_premiere_reponse_secondes", "Délai avant la 1re réponse ou le defer (limite Discord : 3 s)")
+METRICS.describe("bot_interaction_etape_secondes", "Temps passé par étape (stats, discord, rendu, ia)")
+METRICS.describe("bot_stats_flush_secondes", "Durée des écritures différées des stats")
+METRICS.describe("bot_parties_actives", "Parties en cours par jeu")
+METRICS.describe("bot_cache_requetes_total", "Lectures des caches (hit / miss)")
+METRICS.describe("bot_boucle_retard_secondes", "Retard de la boucle asyncio, mesuré en continu")
+METRICS.describe("bot_boucle_blocages_total", f"Mesures de retard au-dessus de LAG_SEUIL ({LAG_SEUIL} s)")
+
+@METRICS.collector
+def etat_du_bot():
+    for kind, count in SESSIONS.counts().items():
+        yield "gauge", "bot_parties_actives", {"jeu": kind}, count
+    for cache, source in (("classements", LEADERBOARDS), ("rendu_echecs", RENDERER)):
+        yield "counter", "bot_cache_requetes_total", {"cache": cache, "resultat": "hit"}, source.hits
+        yield "counter", "bot_cache_requetes_total", {"cache": cache, "resultat": "miss"}, source.misses
+    yield "counter", "bot_editions_envoyees_total", {}, EDITS.sent
+    yield "counter", "bot_editions_fusionnees_total", {}, EDITS.coalesced
+    yield "gauge", "bot_boucle_retard_actuel_secondes", {}, round(LOOP_LAG.lag, 6)
+    yield "counter", "bot_boucle_piles_capturees_total", {}, LOOP_LAG.stalls
+    if bot.latency == bot.latency: # NaN tant que la passerelle n'a pas répondu
+        yield "gauge", "bot_gateway_latence_secondes", {}, round(bot.latency, 6)
+
+def health():
+    """(ok, détails) : passerelle connectée et boucle réactive."""
+    connected = bot.is_ready() and not bot.is_closed() and bot.disconnected_at is None
+    ok = connected and LOOP_LAG.lag < HEALTH_MAX_LAG
+    return ok, {"gateway": connected, "boucle_retard_s": round(LOOP_LAG.lag, 4), "parties": len(SESSIONS.sessions)}
+
+async def healthz(request):
+    ok, details = health()
+    return web.json_response(dict(details, ok=ok), status=200 if ok else 503)
+
+async def metrics(request):
+    return web.Response(text=METRICS.render(), content_type="text/plain", charset="utf-8")
+
+async def start_http_server():
+    app = web.Application()
+    app.router.add_get("/", healthz)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", HTTP_PORT).start()
+    return runner
+
+class BotTree(app_commands.CommandTree):
+    """Arbre de commandes qui trace chaque commande slash (et son autocomplétion).
+
+    interaction_check est appelé au début de la tâche qui traite l'interaction :
+    la trace couvre cette tâche jusqu'à sa fin (commande, handlers d'erreur compris).
+    """
+
+    async def interaction_check(self, interaction):
+        handler = "/" + interaction.data.get("name", "?")
+        if interaction.type is discord.InteractionType.autocomplete:
+            handler += " (autocomplétion)"
+        trace = InteractionTrace(handler)
+        trace.attach(asyncio.current_task())
+        interaction.extras["trace"] = trace
+        return True
+
+    async def on_error(self, interaction, error):
+        trace = interaction.extras.get("trace")
+        if trace is not None:
+            trace.failed = True
+        await super().on_error(interaction, error)
+
+# --- BOT CONFIGURATION ---
+class MyBot(commands.Bot):
+    def __init__(self):
+        intents = discord.Intents.default()
+        intents.message_content = True
+        super().__init__(command_prefix="!", intents=intents, tree_cls=BotTree, http_trace=rest_trace())
+        self.ready_once = False
+        self.disconnected_at = None
+        self.http_runner = None
+
+    async def setup_hook(self):
+        start = time.perf_counter()
+        print(f"Chargement (modules, connexion) : {start - DEMARRAGE:.2f}s")
+        init()
+        print(f"Journal des parties rattrapé : {time.perf_counter() - start:.2f}s")
+        if ASYNCIO_DEBUG:
+            enable_asyncio_debug(asyncio.get_running_loop())
+        LOOP_LAG.start()
+        self.http_runner = await start_http_server()
+        # Persistence ensures buttons work after bot restart
+        self.add_view(TicketView())
+        self.add_view(CloseTicketView())
+        # Parties en cours avant l'arrêt : chaque vue est rattachée à son message
+        for view in load_games(self):
+            self.add_view(view, message_id=view.message.id)
+            if view.is_ai_turn():
+                # Sauvegardée pendant la réflexion du bot : personne d'autre ne peut débloquer la partie
+                asyncio.create_task(view.resume_ai_turn())
+        checkpoint_games.start()
+        refresh_bans.start()
+        # Une seule fois par processus (on_ready revient à chaque reconnexion)
+        await sync_commands(self.tree)
+        print(f"setup_hook : {time.perf_counter() - start:.2f}s")
+
+    async def close(self):
+        # On sauvegarde les parties en cours et les stats encore en mémoire avant de couper
+        if checkpoint_games.is_running(): # Sinon les parties n'ont pas été rechargées : on garde l'ancien fichier
+            checkpoint_games.cancel()
+            save_games()
+        await STATS.flush_async()
+        await RATINGS.flush_async()
+        if self.http_runner:
+            await self.http_runner.cleanup()
+        await super().close()
+
+bot = MyBot()
+
+@bot.event
+async def on_ready():
+    if not bot.ready_once:
+        bot.ready_once = True
+        print(f"Bot opérationnel : {bot.user} (prêt en {time.perf_counter() - DEMARRAGE:.2f}s)")
+    elif bot.disconnected_at is not None:
+        print(f"Reconnecté (nouvelle session) en {time.perf_counter() - bot.disconnected_at:.2f}s")
+    bot.disconnected_at = None
+
+@bot.event
+async def on_resumed():
+    if bot.disconnected_at is not None:
+        print(f"Session reprise en {time.perf_counter() - bot.disconnected_at:.2f}s")
+    bot.disconnected_at = None
+
+@bot.event
+async def on_disconnect():
+    if bot.disconnected_at is None:
+        bot.disconnected_at = time.perf_counter()
+
+@bot.event
+async def on_interaction(interaction):
+    NAMES.remember(interaction.user.id, interaction.user.name)
+    METRICS.inc("bot_interactions_total", type=interaction.type.name)
+
+# --- INDEX DES BANNISSEMENTS ---
+# La liste des bannis d'un serveur est chargée une fois (pagination REST), puis tenue à jour
+# par on_member_ban / on_member_unban. Un rechargement complet, lent, rattrape les événements
+# manqués (coupures, redémarrages).
+BANS_REFRESH_HEURES = float(os.getenv("BANS_REFRESH_HEURES", "6"))
+
+class GuildBans:
+    __slots__ = ("by_key", "names")
+
+    def __init__(self):
+        self.by_key = {} # pseudo en minuscules ou ancien format pseudo#1234 -> utilisateur
+        self.names = []  # pseudos en minuscules, triés (autocomplétion par préfixe)
+
+class BanIndex:
+    """Bannis de chaque serveur, indexés par pseudo : recherche en O(1), autocomplétion par préfixe."""
+
+    def __init__(self):
+        self.guilds = {} # guild.id -> GuildBans (seulement les serveurs déjà chargés)
+        self.loading = {} # guild.id -> tâche de chargement en cours
+        self.pending = {} # guild.id -> événements reçus pendant un rechargement, rejoués après
+
+    @staticmethod
+    def keys(user):
+        return {user.name.lower(), str(user).lower()} # str(user) = "pseudo#1234" pour les anciens comptes
+
+    async def ensure(self, guild):
+        """Charge l'index du serveur s'il ne l'est pas (un seul chargement à la fois par serveur)."""
+        bans = self.guilds.get(guild.id)
+        if bans is not None:
+            return bans
+        task = self.loading.get(guild.id)
+        if task is None:
+            task = self.loading[guild.id] = background_task(self.refresh(guild))
+            task.add_done_callback(lambda _: self.loading.pop(guild.id, None))
+        return await asyncio.shield(task)
+
+    async def refresh(self, guild):
+        """Rechargement complet depuis l'API (toutes les pages, sans la limite de 1000 par défaut)."""
+        self.pending[guild.id] = []
+        try:
+            fresh = GuildBans()
+            async for entry in guild.bans(limit=None):
+                for key in self.keys(entry.user):
+                    fresh.by_key[key] = entry.user
+            fresh.names = sorted({user.name.lower() for user in fresh.by_key.values()})
+            self.guilds[guild.id] = fresh
+            # Les pages déjà lues ne voient pas les bans / débans arrivés pendant le parcours
+            for apply, user in self.pending.pop(guild.id):
+                apply(guild.id, user)
+        finally:
+            self.pending.pop(guild.id, None)
+        return fresh
+
+    def add(self, guild_id, user):
+        if guild_id in self.pending:
+            self.pending[guild_id].append((self.add, user))
+        bans = self.guilds.get(guild_id)
+        if bans is None:
+            return # Pas encore chargé : le chargement complet l'inclura
+        for key in self.keys(user):
+            bans.by_key[key] = user
+        name = user.name.lower()
+        i = bisect.bisect_left(bans.names, name)
+        if i == len(bans.names) or bans.names[i] != name:
+            bans.names.insert(i, name)
+
+    def remove(self, guild_id, user):
+        if guild_id in self.pending:
+            self.pending[guild_id].append((self.remove, user))
+        bans = self.guilds.get(guild_id)
+        if bans is None:
+            return
+        for key in self.keys(user):
+            if key in bans.by_key and bans.by_key[key].id == user.id:
+                del bans.by_key[key]
+        name = user.name.lower()
+        if name not in bans.by_key:
+            i = bisect.bisect_left(bans.names, name)
+            if i < len(bans.names) and bans.names[i] == name:
+                del bans.names[i]
+
+    def find(self, guild_id, name):
+        bans = self.guilds.get(guild_id)
+        return bans.by_key.get(name.lower()) if bans else None
+
+    def complete(self, guild_id, prefix, limit=25):
+        """Pseudos bannis qui commencent par `prefix` (ordre alphabétique)."""
+        bans = self.guilds.get(guild_id)
+        if bans is None:
+            return []
+        prefix = prefix.lower()
+        i = bisect.bisect_left(bans.names, prefix)
+        found = []
+        while i < len(bans.names) and len(found) < limit and bans.names[i].startswith(prefix):
+            found.append(bans.names[i])
+            i += 1
+        return found
+
+BANS = BanIndex()
+
+@bot.event
+async def on_member_ban(guild, user):
+    BANS.add(guild.id, user)
+
+@bot.event
+async def on_member_unban(guild, user):
+    BANS.remove(guild.id, user)
+
+@tasks.loop(hours=BANS_REFRESH_HEURES)
+async def refresh_bans():
+    # Le premier tour tombe au démarrage, avant tout chargement : rien à rafraîchir
+    for guild_id in list(BANS.guilds):
+        guild = bot.get_guild(guild_id)
+        if guild is None:
+            del BANS.guilds[guild_id] # Le bot a quitté le serveur
+            continue
+        try:
+            await BANS.refresh(guild)
+        except discord.HTTPException as e:
+            print(f"Rechargement des bannis de {guild.name} impossible : {e}")
+
+# --- COMMANDS ---
+@bot.tree.command(name="setup_ticket", description="Installe le système de ticket")
+@app_commands.checks.has_permissions(manage_threads=True)
+async def setup_ticket(interaction: discord.Interaction):
+    await interaction.response.defer()
+    embed = discord.Embed(
+        title="Centre d'assistance",
+        description="Besoin d'aide ? Cliquez sur le bouton ci-dessous pour ouvrir un ticket privé.",
+        color=discord.Color.blue()
+    )
+    await interaction.followup.send(embed=embed, view=TicketView())
+
+@bot.tree.command(name="dice_roll", description="Lance un dé")
+async def dice_roll(interaction: discord.Interaction, nombre_de_faces: int = 6):
+    await interaction.response.defer()
+    result = random.randint(1, nombre_de_faces) # Corrected reference
+    embed = discord.Embed(
+        title="🎲 Lancer de dé",
+        description=f"Le résultat est : **{result}**",
+        color=discord.Color.purple()
+    )
+    await interaction.followup.send(embed=embed) # Removed TicketView here
+
+@bot.tree.command(name="ban_pseudo", description="Bannir quelqu'un du serveur avec son pseudo")
+@app_commands.checks.has_permissions(ban_members=True)
+async def banguy(interaction: discord.Interaction, member: discord.Member, reason: str):
+    await interaction.response.defer(ephemeral=True)
+    await member.ban()
+    await interaction.followup.send(f"Vous avez banni {member} avec succès")
+    await member.send(f"Vous avez été banni du serveur pour la raison : {reason}")
+
+@bot.tree.command(name="unban_pseudo", description="Débannir un utilisateur via son pseudo")
+@app_commands.checks.has_permissions(ban_members=True)
+async def unban_pseudo(interaction: discord.Interaction, name: str):
+    await interaction.response.defer(ephemeral=True)
+    # 1. Index des bannis du serveur (chargé une seule fois, puis tenu à jour par les événements)
+    await BANS.ensure(interaction.guild)
+    
+    # 2. Chercher l'utilisateur : pseudo actuel (ex: "loup") ou ancien format (ex: "Loup#1234")
+    user_to_unban = BANS.find(interaction.guild.id, name)
+
+    # 3. Agir en fonction du résultat
+    if user_to_unban:
+        try:
+            await interaction.guild.unban(user_to_unban)
+        except discord.NotFound:
+            # Plus banni : l'index était en retard (événement manqué ou rechargement en cours)
+            BANS.remove(interaction.guild.id, user_to_unban)
+            user_to_unban = None
+    if user_to_unban:
+        BANS.remove(interaction.guild.id, user_to_unban) # Sans attendre l'événement
+        channel = interaction.channel
+        reinvite = await channel.create_invite(
+            max_age=0, 
+            max_uses= 1,
+            unique=True
+        )
+        await user_to_unban.send(f"Vous avez été débanni, pour revenir sur le serveur utilisez ce lien : {reinvite.url}")
+        await interaction.followup.send(f"✅ **{user_to_unban.name}** a été débanni.", ephemeral=True)
+    else:
+        await interaction.followup.send(f"❌ Impossible de trouver **{name}** dans la liste des bannis.")
+
+@unban_pseudo.autocomplete("name")
+async def unban_pseudo_autocomplete(interaction: discord.Interaction, current: str):
+    if interaction.guild is None or not interaction.permissions.ban_members:
+        return [] # La liste des bannis reste réservée aux modérateurs
+    if BANS.guilds.get(interaction.guild.id) is None and interaction.guild.id not in BANS.loading:
+        # Premier appel : on lance le chargement sans attendre (l'autocomplétion doit répondre vite)
+        background_task(BANS.ensure(interaction.guild))
+        return []
+    return [app_commands.Choice(name=name, value=name) for name in BANS.complete(interaction.guild.id, current)]
+
+@bot.tree.command(name="ban_numéro_de_compte", description="Bannir quelqu'un du serveur via son ID")
+@app_commands.checks.has_permissions(ban_members=True)
+async def ban_id(interaction: discord.Interaction, user_id: str, reason: str):
+    await interaction.response.defer(ephemeral=True)
+    try:
+        # 1. On récupère l'utilisateur via son ID (même s'il n'est pas sur le serveur)
+        user = await bot.fetch_user(int(user_id))
+        
+        # 2. On tente d'envoyer un DM AVANT le ban
+        try:
+            await user.send(f"Vous avez été banni du serveur pour la raison : {reason}")
+        except:
+            # Si l'utilisateur a fermé ses MPs, on ignore l'erreur pour continuer le ban
+            pass
+
+        # 3. On bannit l'utilisateur du serveur (guild)
+        await interaction.guild.ban(user, reason=reason)
+        
+        # 4. Confirmation à l'admin
+        await interaction.followup.send(f"✅ {user.name} (ID: {user_id}) a été banni avec succès.")
+
+    except ValueError:
+        await interaction.followup.send("❌ L'ID fourni n'est pas valide (doit être des chiffres).")
+    except Exception as e:
+        await interaction.followup.send(f"❌ Une erreur est survenue : {e}")
+
+@bot.tree.command(name="unban_id", description="Débannir un utilisateur via son ID")
+@app_commands.checks.has_permissions(ban_members=True)
+async def unban_id(interaction: discord.Interaction, user_id: str):
+    await interaction.response.defer(ephemeral=True)
+    try:
+        # 1. Convertir l'ID et récupérer l'utilisateur
+        # Il faut bien mettre (await ...), et on ne met pas .lower ici
+        user = await bot.fetch_user(int(user_id))
+        
+        # 2. Débannir directement (Discord comprend l'objet User ou l'ID)
+        await interaction.guild.unban(user)
+
+        # 3. Créer l'invitation
+        reinvite = await interaction.channel.create_invite(
+            max_age=0, 
+            max_uses=1, 
+            unique=True
+        )
+
+        # 4. Tenter d'envoyer le MP
+        try:
+            await user.send(f"Vous avez été débanni ! Voici votre lien de retour : {reinvite.url}")
+        except:
+            pass # L'utilisateur a peut-être bloqué ses MPs
+
+        await interaction.followup.send(f"✅ **{user.name}** a été débanni.", ephemeral=True)
+
+    except ValueError:
+        await interaction.followup.send("❌ L'ID fourni n'est pas un nombre valide.", ephemeral=True)
+    except discord.NotFound:
+        await interaction.followup.send("❌ Cet utilisateur n'est pas dans la liste des bannis.", ephemeral=True)
+    except Exception as e:
+        await interaction.followup.send(f"❌ Erreur : {e}", ephemeral=True)
+
+# --- MODÉRATION EN MASSE (raids) ---
+# Les ids viennent d'un texte ou d'un fichier joint. Les bans passent par l'API de ban groupé
+# (200 comptes par requête) ; les débans, sans équivalent, par quelques workers en parallèle :
+# le client HTTP de discord.py attend de lui-même quand un bucket de rate limit est vide.
+BULK_MAX = int(os.getenv("BULK_MAX", "1000")) # comptes par commande
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "4"))
+BULK_LOT_BAN = 200 # maximum de l'API de ban groupé
+ID_DISCORD = re.compile(r"\b\d{15,20}\b")
+
+async def read_ids(ids, fichier):
+    """Ids uniques (ordre conservé) trouvés dans le texte et le fichier joint."""
+    text = ids or ""
+    if fichier is not None:
+        text += "\n" + (await fichier.read()).decode("utf-8", errors="ignore")
+    return list(dict.fromkeys(int(match) for match in ID_DISCORD.findall(text)))
+
+class BulkProgress:
+    """Un seul message de statut, réédité au fil de l'eau (les éditions rapprochées sont fusionnées par EDITS)."""
+
+    def __init__(self, message, action, total):
+        self.message = message
+        self.action = action
+        self.total = total
+        self.done = []
+        self.failed = [] # (id, raison)
+
+    def status(self):
+        fait = len(self.done) + len(self.failed)
+        return f"⏳ {self.action} en cours : **{fait}/{self.total}** (✅ {len(self.done)} | ❌ {len(self.failed)})"
+
+    def success(self, user_ids):
+        self.done.extend(user_ids)
+        EDITS.post(self.message, content=self.status())
+
+    def failure(self, user_id, reason):
+        self.failed.append((user_id, reason))
+        EDITS.post(self.message, content=self.status())
+
+    async def finish(self, interaction):
+        resume = f"🏁 {self.action} terminé : **{len(self.done)}** réussi(s), **{len(self.failed)}** échec(s) sur {self.total}."
+        details = "\n".join(f"`{user_id}` : {reason}" for user_id, reason in self.failed)
+        inline = len(resume) + len(details) < 1900 # Sinon les échecs partent dans un fichier joint
+        if self.failed and inline:
+            resume += "\n" + details
+        await EDITS.edit(self.message, content=resume)
+        if self.failed and not inline:
+            fichier = discord.File(BytesIO(details.encode("utf-8")), filename="echecs.txt")
+            await interaction.followup.send("Détail des échecs :", file=fichier, ephemeral=True)
+
+async def run_workers(user_ids, action, progress=None):
+    """`action(id)` pour chaque id, BULK_WORKERS à la fois ; une erreur n'arrête pas les autres."""
+    pending = iter(user_ids)
+    async def worker():
+        for user_id in pending: # Itérateur partagé : chaque id n'est pris qu'une fois
+            try:
+                await action(user_id)
+            except discord.NotFound:
+                if progress:
+                    progress.failure(user_id, "introuvable")
+            except discord.HTTPException as e:
+                if progress:
+                    progress.failure(user_id, e.text or str(e.status))
+            else:
+                if progress:
+                    progress.success([user_id])
+    await asyncio.gather(*(worker() for _ in range(min(BULK_WORKERS, len(user_ids)))))
+
+async def notify(user_id, text):
+    """MP best effort (seulement si demandé : coûte un fetch_user et un envoi par compte)."""
+    try:
+        user = await bot.fetch_user(user_id)
+        await user.send(text)
+    except discord.HTTPException:
+        pass
+
+async def start_bulk(interaction, ids, fichier, action):
+    await interaction.response.defer(ephemeral=True)
+    user_ids = await read_ids(ids, fichier)
+    if not user_ids:
+        await interaction.followup.send("❌ Aucun ID valide trouvé (texte ou fichier).", ephemeral=True)
+        return None, None
+    if len(user_ids) > BULK_MAX:
+        await interaction.followup.send(f"❌ {len(user_ids)} IDs : maximum {BULK_MAX} par commande.", ephemeral=True)
+        return None, None
+    message = await interaction.followup.send(f"⏳ {action} de {len(user_ids)} compte(s)...", ephemeral=True, wait=True)
+    return user_ids, BulkProgress(message, action, len(user_ids))
+
+@bot.tree.command(name="ban_masse", description="Bannir une liste d'IDs (texte ou fichier), pour les raids")
+@app_commands.checks.has_permissions(ban_members=True)
+async def ban_masse(interaction: discord.Interaction, ids: str = None, fichier: discord.Attachment = None,
+                    raison: str = "Raid", prevenir: bool = False):
+    user_ids, progress = await start_bulk(interaction, ids, fichier, "Bannissement")
+    if not user_ids:
+        return
+    guild = interaction.guild
+
+    if prevenir: # Les MP partent avant le ban, tant qu'un serveur est encore en commun
+        EDITS.post(progress.message, content=f"✉️ Envoi des messages privés à {len(user_ids)} compte(s) avant le bannissement...")
+        await run_workers(user_ids, lambda user_id: notify(user_id, f"Vous avez été banni du serveur pour la raison : {raison}"))
+
+    restants = []
+    for start in range(0, len(user_ids), BULK_LOT_BAN):
+        lot = user_ids[start:start + BULK_LOT_BAN]
+        try:
+            result = await guild.bulk_ban([discord.Object(user_id) for user_id in lot], reason=raison)
+        except discord.Forbidden:
+            restants.extend(lot) # Le ban groupé demande aussi "Gérer le serveur" : on repasse un par un
+            continue
+        except discord.HTTPException as e:
+            for user_id in lot:
+                progress.failure(user_id, e.text or str(e.status))
+            continue
+        progress.success([user.id for user in result.banned])
+        for user in result.failed:
+            progress.failure(user.id, "refusé (déjà banni, ou rôle trop haut)")
+    if restants:
+        await run_workers(restants, lambda user_id: guild.ban(discord.Object(user_id), reason=raison), progress)
+    await progress.finish(interaction)
+
+@bot.tree.command(name="unban_masse", description="Débannir une liste d'IDs (texte ou fichier)")
+@app_commands.checks.has_permissions(ban_members=True)
+async def unban_masse(interaction: discord.Interaction, ids: str = None, fichier: discord.Attachment = None, prevenir: bool = False):
+    user_ids, progress = await start_bulk(interaction, ids, fichier, "Débannissement")
+    if not user_ids:
+        return
+    guild, channel = interaction.guild, interaction.channel
+
+    async def unban(user_id):
+        await guild.unban(discord.Object(user_id))
+        if prevenir:
+            try:
+                reinvite = await channel.create_invite(max_age=0, max_uses=1, unique=True)
+            except discord.HTTPException:
+                return # Débanni quand même : seul le MP saute
+            await notify(user_id, f"Vous avez été débanni ! Voici votre lien de retour : {reinvite.url}")
+    await run_workers(user_ids, unban, progress)
+    await progress.finish(interaction)
+
+################################################################################################################
+
+class CoinFlipView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=60) # Le jeu s'arrête après 60s d'inactivité
+
+    @discord.ui.button(label="Pile", style=discord.ButtonStyle.primary)
+    async def pile(self, interaction: discord.Interaction, button: discord.ui.Button):
+        resultat = random.choice(["Pile", "Face"])
+        if resultat == "Pile":
+            await interaction.response.send_message("Gagné ! C'était Pile.")
+        else:
+            await interaction.response.send_message("Perdu ! C'était Face.")
+        self.stop() # Arrête d'écouter les boutons après le jeu
+
+    @discord.ui.button(label="Face", style=discord.ButtonStyle.secondary)
+    async def face(self, interaction: discord.Interaction, button: discord.ui.Button):
+        resultat = random.choice(["Pile", "Face"])
+        if resultat == "Face":
+            await interaction.response.send_message("Gagné ! C'était Face.")
+        else:
+            await interaction.response.send_message("Perdu ! C'était Pile.")
+        self.stop()
+
+@bot.tree.command(name="pile_ou_face", description="Lance une pièce !")
+async def flip(interaction: discord.Interaction):
+    view = CoinFlipView()
+    await interaction.response.send_message("Choisissez votre camp :", view=view)
+
+#############################################################################################################
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+# --- MOTEUR DU MORPION ---
+# Case (x, y) = bit y * 3 + x ; un masque de 9 bits par joueur
+LIGNES_MORPION = (
+    0b000000111, 0b000111000, 0b111000000, # Lignes
+    0b001001001, 0b010010010, 0b100100100, # Colonnes
+    0b100010001, 0b001010100,              # Diagonales
+)
+PLEIN_MORPION = 0b111111111
+
+def morpion_gagne(mask):
+    for line in LIGNES_MORPION:
+        if mask & line == line:
+            return True
+    return False
+
+def construire_table_morpion():
+    """Résout toutes les positions atteignables (5 478) une fois pour toutes.
+
+    Clé : (masque X, masque O). Valeur : (score pour le joueur au trait, meilleure case).
+    Score > 0 : victoire assurée (plus il est grand, plus elle est rapide), 0 : nul, < 0 : défaite.
+    """
+    table = {}
+
+    def solve(x_mask, o_mask):
+        key = (x_mask, o_mask)
+        if key in table:
+            return table[key][0]
+        x_turn = bin(x_mask).count("1") == bin(o_mask).count("1")
+        me, other = (x_mask, o_mask) if x_turn else (o_mask, x_mask)
+        if morpion_gagne(other):
+            result = (-(10 - bin(x_mask | o_mask).count("1")), None)
+        elif x_mask | o_mask == PLEIN_MORPION:
+            result = (0, None)
+        else:
+            result = None
+            for cell in (4, 0, 2, 6, 8, 1, 3, 5, 7): # Centre, coins, puis bords
+                bit = 1 << cell
+                if (x_mask | o_mask) & bit:
+                    continue
+                child = (x_mask | bit, o_mask) if x_turn else (x_mask, o_mask | bit)
+                score = -solve(*child)
+                if result is None or score > result[0]:
+                    result = (score, cell)
+        table[key] = result
+        return result[0]
+
+    solve(0, 0)
+    return table
+
+TABLE_MORPION = construire_table_morpion()
+
+# On crée une classe pour le Bouton (la case du morpion)
+class CaseButton(discord.ui.Button):
+    def __init__(self, x, y):
+        # On initialise le bouton (gris par défaut, vide)
+        super().__init__(style=discord.ButtonStyle.secondary, label="\u200b", row=y, custom_id=f"morpion:{x}{y}")
+        self.x = x
+        self.y = y
+
+    @traced("morpion.case")
+    async def callback(self, interaction: discord.Interaction):
+        # Cette fonction remplace ta fonction 'pion(y,x)'
+        view: MorpionGame = self.view
+        
+        # Vérification du joueur (C'est le tour de qui ?)
+        joueur_actuel = view.player1 if view.turn == 1 else view.player2
+        if interaction.user != joueur_actuel:
+            return await interaction.response.send_message("Ce n'est pas votre tour !", ephemeral=True)
+
+        # Logique de jeu (équivalent à ton code 'if not morpion[y][x]')
+        if view.is_free(self.x, self.y):
+            view.play(self.x, self.y)
+            content = view.after_move(joueur_actuel)
+
+            # Contre le bot : il répond immédiatement (coup lu dans la table)
+            if view.is_ai_turn():
+                content = view.play_ai_turn()
+
+            await EDITS.respond(interaction, content=content, view=view)
+
+class IndiceButton(discord.ui.Button):
+    def __init__(self):
+        super().__init__(style=discord.ButtonStyle.primary, label="Indice", emoji="💡", row=3, custom_id="morpion:indice")
+
+    @traced("morpion.indice")
+    async def callback(self, interaction: discord.Interaction):
+        view: MorpionGame = self.view
+        joueur_actuel = view.player1 if view.turn == 1 else view.player2
+        if interaction.user != joueur_actuel:
+            return await interaction.response.send_message("Ce n'est pas votre tour !", ephemeral=True)
+
+        score, cell = view.best_move()
+        if score > 0:
+            verdict = "la victoire est assurée 😎"
+        elif score == 0:
+            verdict = "au mieux, match nul"
+        else:
+            verdict = "ça sent mauvais... résiste le plus longtemps possible"
+        await interaction.response.send_message(
+            f"💡 Joue en **ligne {cell // 3 + 1}, colonne {cell % 3 + 1}** : {verdict}.", ephemeral=True
+        )
+
+# On crée la Vue (l'interface globale qui remplace ta fenêtre Tkinter)
+class MorpionGame(GameView):
+    def __init__(self, p1, p2, ai_player=None):
+        super().__init__()
+        # On mélange les joueurs dans une liste
+        joueurs = [p1, p2]
+        random.shuffle(joueurs) 
+        # Le premier de la liste sera le Joueur 1 (X) et commencera
+        self.player1 = joueurs[0] # Il aura les X
+        self.player2 = joueurs[1] # Il aura les O
+        # Partie contre le bot (ai_player est alors le membre du bot)
+        self.ai_player = ai_player
+        
+        self.current_player = self.player1
+        self.turn = 1 # 1 commence toujours (X)
+        # Ta grille morpion : un masque de 9 bits par joueur (X puis O)
+        self.masks = [0, 0]
+
+        # Création des 9 boutons (comme tes a, aa, aaa...)
+        self.cases = []
+        for y in range(3):
+            for x in range(3):
+                button = CaseButton(x, y)
+                self.cases.append(button)
+                self.add_item(button)
+        self.add_item(IndiceButton())
+
+    def is_free(self, x, y):
+        return not (self.masks[0] | self.masks[1]) & (1 << (y * 3 + x))
+
+    # --- SAUVEGARDE (redémarrage du bot) ---
+    def snapshot(self):
+        """Plateau en un entier : les X sur les 9 bits du bas, les O au-dessus."""
+        return {
+            "joueurs": [joueur_snapshot(self.player1), joueur_snapshot(self.player2)],
+            "ia": self.ai_player.id if self.ai_player else None,
+            "plateau": self.masks[0] | self.masks[1] << 9,
+            "tour": self.turn,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, joueurs, salon):
+        p1, p2 = joueurs
+        game = cls(p1, p2, ai_player=next((j for j in joueurs if j.id == data["ia"]), None))
+        # Pas de nouveau tirage au sort : on remet les joueurs dans l'ordre sauvegardé
+        game.player1, game.player2 = p1, p2
+        game.current_player = p1
+        for cell in range(9):
+            for turn in (1, 2):
+                if data["plateau"] >> (cell + 9 * (turn - 1)) & 1:
+                    game.turn = turn
+                    game.play(cell % 3, cell // 3)
+        game.turn = data["tour"]
+        game.message = salon.get_partial_message(data["message"])
+        return game
+
+    def play(self, x, y):
+        """Pose le pion du joueur au trait et met à jour le bouton."""
+        self.masks[self.turn - 1] |= 1 << (y * 3 + x)
+        button = self.cases[y * 3 + x]
+        if self.turn == 1:
+            button.label = "X"
+            button.style = discord.ButtonStyle.danger # Rouge
+        else:
+            button.label = "O"
+            button.style = discord.ButtonStyle.success # Vert
+        button.disabled = True # On désactive le bouton cliqué
+
+    def best_move(self):
+        """(score, case) de la table de jeu parfait pour le joueur au trait."""
+        return TABLE_MORPION[(self.masks[0], self.masks[1])]
+
+    def after_move(self, joueur_actuel):
+        """Vérifie Victoire / Nul après un coup, sinon passe au tour suivant. Retourne le texte du message."""
+        # Vérification Victoire
+        if self.check_victory():
+            # On désactive le plateau
+            for child in self.children: 
+                child.disabled = True
+            self.stop()
+            
+            # Le gagnant est 'joueur_actuel', le perdant est l'autre
+            winner = joueur_actuel
+            loser = self.player2 if winner == self.player1 else self.player1
+
+            # ON SAUVEGARDE LES SCORES (pas de stats contre le bot)
+            if self.ai_player is None:
+                record_match(FILE_MORPION, winner, loser, 'win')
+            return f"🏆 **Victoire de {winner.mention} !**"
+
+        # Vérification Match Nul
+        if self.check_draw():
+            for child in self.children:
+                child.disabled = True
+            self.stop()
+            # ON SAUVEGARDE LES NULS POUR LES DEUX
+            if self.ai_player is None:
+                record_match(FILE_MORPION, self.player1, self.player2, 'draw')
+            return "🤝 **Match Nul !** Personne n'a gagné."
+
+        # Sinon, on continue
+        self.turn = 2 if self.turn == 1 else 1
+        next_player = self.player2 if self.turn == 2 else self.player1
+        return f"C'est au tour de {next_player.mention} ({'O' if self.turn == 2 else 'X'})"
+
+    def is_ai_turn(self):
+        if self.ai_player is None or self.is_finished():
+            return False
+        return (self.player1 if self.turn == 1 else self.player2) == self.ai_player
+
+    def play_ai_turn(self):
+        _, cell = self.best_move()
+        self.play(cell % 3, cell // 3)
+        return self.after_move(self.ai_player)
+
+    async def resume_ai_turn(self):
+        await EDITS.edit(self.message, content=self.play_ai_turn(), view=self)
+
+    # Victoire : un des 8 alignements est complet pour X ou pour O
+    def check_victory(self):
+        return morpion_gagne(self.masks[0]) or morpion_gagne(self.masks[1])
+
+    # Nul : les 9 cases sont prises
+    def check_draw(self):
+        return (self.masks[0] | self.masks[1]) == PLEIN_MORPION
+
+# La commande pour lancer le jeu
+@bot.tree.command(name="morpion_start", description="Lancer un morpion avec l'adversaire de ton choix (ou le bot) !")
+async def morpion_start(interaction: discord.Interaction, adversaire: discord.Member):
+    await interaction.response.defer()
+    contre_le_bot = adversaire.id == bot.user.id
+    if (adversaire.bot and not contre_le_bot) or adversaire == interaction.user:
+        return await interaction.followup.send("Adversaire invalide.")
+    humains = [interaction.user] if contre_le_bot else [interaction.user, adversaire]
+    refus = SESSIONS.refus(*humains)
+    if refus:
+        return await interaction.followup.send(refus)
+    
+    # On crée la vue
+    game_view = MorpionGame(interaction.user, adversaire, ai_player=adversaire if contre_le_bot else None)
+    SESSIONS.add(game_view, "morpion", humains, interaction.channel_id)
+    if game_view.is_ai_turn():
+        game_view.play_ai_turn() # Le bot a les X : il joue son premier coup tout de suite
+    
+    # On annonce qui commence grâce à la variable définie dans le __init__
+    game_view.message = await interaction.followup.send(
+        f"**Morpion** : {interaction.user.mention} vs {adversaire.mention}\n"
+        f"**{game_view.current_player.mention}** commence !", 
+        view=game_view,
+        wait=True
+    )
+
+######################################################################################################
+# Fichier de stats et titre d'affichage pour chaque choix de jeu
+JEUX = {
+    1: (FILE_MORPION, "Morpion"),
+    2: (FILE_P4, "Puissance 4"),
+    3: (FILE_CHESS, "Echecs"),
+}
+
+@bot.tree.command(name="classement_score", description="Affiche le tableau des scores d'un jeu")
+@app_commands.describe(tri="Ordre du classement (points par défaut)")
+@app_commands.choices(jeu=[
+    app_commands.Choice(name="Echecs", value=3),
+    app_commands.Choice(name="Puissance 4", value=2),
+    app_commands.Choice(name="Morpion", value=1),
+], tri=[
+    app_commands.Choice(name="Points", value="points"),
+    app_commands.Choice(name=f"Elo (min. {MIN_PARTIES_ELO} parties)", value="elo"),
+])
+async def classement(interaction: discord.Interaction,jeu: app_commands.Choice[int], tri: app_commands.Choice[str] = None):
+    await interaction.response.defer()
+    if jeu.value not in JEUX:
+        return await interaction.followup.send("Ce jeu n'existe pas")
+    filename, titre_de_embed = JEUX[jeu.value]
+    if tri and tri.value == "elo":
+        return await classement_elo(interaction, filename, titre_de_embed)
+    # Aucune partie depuis le dernier affichage : on renvoie le même embed
+    cached = LEADERBOARDS.get(filename, "score")
+    if cached:
+        return await interaction.followup.send(embed=discord.Embed.from_dict(cached))
+    if STATS.is_empty(filename):
+        return await interaction.followup.send("Aucune partie n'a encore été jouée !")
+
+    # Création de l'Embed (Jolie boîte d'affichage)
+    embed = discord.Embed(title=f"🏆 Tableau des Scores - {titre_de_embed}", color=discord.Color.gold())
+    
+    # On récupère le top 10 trié par points (décroissant)
+    with Span("stats"):
+        sorted_players = STATS.top_score(filename, 10)
+    # Tous les pseudos d'un coup (cache, puis API en parallèle pour les inconnus)
+    noms = await NAMES.resolve_many(bot, interaction.guild, [user_id for user_id, _ in sorted_players])
+    classement_text = ""
+    for index, (user_id, data) in enumerate(sorted_players): # Top 10 seulement
+        wins = data['wins']
+        losses = data['losses']
+        draws = data['draws']
+        total_games = wins + losses + draws
+
+        # Calcul du pourcentage (éviter la division par zéro)
+        # --- CALCUL AJUSTÉ ---
+        # On calcule les "points" : 1 par victoire, 0.5 par nul
+        points = wins + (draws * 0.5)
+        
+        if total_games > 0:
+            # Le winrate prend maintenant en compte les nuls à 50%
+            win_rate = (points / total_games) * 100
+        else:
+            win_rate = 0
+        # ---------------------
+        
+        # On récupère le nom, sinon on met l'ID
+        nom = noms[user_id] or f"Utilisateur inconnu ({user_id})"
+        # Médailles pour le top 3
+        medaille = "🥇" if index == 0 else "🥈" if index == 1 else "🥉" if index == 2 else f"#{index+1}"
+
+        classement_text += (
+            f"**{medaille} {nom}**\n"
+            f"└─ Victoires: {wins} | Défaites: {losses} | Nuls: {draws}\n"
+            f"└─ Winrate: **{win_rate:.1f}%**\n"
+            f"└─ Score: **{points} points**\n\n"
+        )
+
+    embed.description = classement_text
+    LEADERBOARDS.put(filename, "score", embed.to_dict())
+    await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name="classement_winrate", description="Classement par pourcentage de victoire d'un jeu (min. 10 parties)")
+@app_commands.describe(tri="Ordre du classement (winrate par défaut)")
+@app_commands.choices(jeu=[
+    app_commands.Choice(name="Echecs", value=3),
+    app_commands.Choice(name="Puissance 4", value=2),
+    app_commands.Choice(name="Morpion", value=1),
+], tri=[
+    app_commands.Choice(name="Winrate", value="winrate"),
+    app_commands.Choice(name=f"Elo (min. {MIN_PARTIES_ELO} parties)", value="elo"),
+])
+async def classement_pro(interaction: discord.Interaction, jeu: app_commands.Choice[int], tri: app_commands.Choice[str] = None):
+    await interaction.response.defer()
+    # 1. Sélection du fichier
+    if jeu.value not in JEUX:
+        return await interaction.followup.send("Ce jeu n'existe pas")
+    filename, titre_de_embed = JEUX[jeu.value]
+    if tri and tri.value == "elo":
+        return await classement_elo(interaction, filename, titre_de_embed)
+
+    cached = LEADERBOARDS.get(filename, "winrate")
+    if cached:
+        return await interaction.followup.send(embed=discord.Embed.from_dict(cached))
+    if STATS.is_empty(filename):
+        return await interaction.followup.send("Aucune donnée enregistrée.")
+
+    # 2. FILTRAGE + TRI : On ne garde que ceux qui ont AU MOINS 10 parties
+    # Cela évite qu'un joueur avec 1 victoire et 0 défaite (100%) ne vole la 1ère place
+    with Span("stats"):
+        sorted_players = STATS.top_winrate(filename, 10, MIN_PARTIES_WINRATE)
+
+    if not sorted_players:
+        return await interaction.followup.send("Aucun joueur n'a encore atteint les 10 parties requises pour figurer ici.")
+
+    embed = discord.Embed(
+        title=f"🏆 Top Winrate - {titre_de_embed}", 
+        description="*Seuls les joueurs avec au moins 10 parties sont affichés.*\n\n",
+        color=discord.Color.purple()
+    )
+    
+    noms = await NAMES.resolve_many(bot, interaction.guild, [user_id for user_id, _ in sorted_players])
+    description_text = ""
+    for index, (user_id, data) in enumerate(sorted_players):
+        wins = data['wins']
+        draws = data['draws']
+        total = wins + data['losses'] + draws
+        winrate = ((wins + (draws * 0.5)) / total * 100)
+        
+        nom = noms[user_id] or f"Joueur {user_id}"
+
+        medaille = "🥇" if index == 0 else "🥈" if index == 1 else "🥉" if index == 2 else f"#{index+1}"
+        
+        description_text += (
+            f"**{medaille} {nom}**\n"
+            f"└─ **{winrate:.1f}%** de réussite ({wins} victoires et {draws} nulles sur {total} matchs)\n\n"
+        )
+
+    embed.description += description_text
+    LEADERBOARDS.put(filename, "winrate", embed.to_dict())
+    await interaction.followup.send(embed=embed)
+
+async def classement_elo(interaction, filename, titre_de_embed):
+    """Classement trié par cote Elo (option `tri` des commandes de classement)."""
+    cached = LEADERBOARDS.get(filename, "elo")
+    if cached:
+        return await interaction.followup.send(embed=discord.Embed.from_dict(cached))
+
+    # La cote tient compte de la force de l'adversaire : battre un fort rapporte plus
+    sorted_players = RATINGS.top(filename, 10)
+    if not sorted_players:
+        return await interaction.followup.send(f"Aucun joueur n'a encore atteint les {MIN_PARTIES_ELO} parties requises pour figurer ici.")
+
+    embed = discord.Embed(
+        title=f"🏆 Classement Elo - {titre_de_embed}",
+        description=f"*Seuls les joueurs avec au moins {MIN_PARTIES_ELO} parties sont affichés.*\n\n",
+        color=discord.Color.blue()
+    )
+
+    noms = await NAMES.resolve_many(bot, interaction.guild, [user_id for user_id, _, _ in sorted_players])
+    description_text = ""
+    for index, (user_id, cote, parties) in enumerate(sorted_players):
+        nom = noms[user_id] or f"Joueur {user_id}"
+        medaille = "🥇" if index == 0 else "🥈" if index == 1 else "🥉" if index == 2 else f"#{index+1}"
+        description_text += (
+            f"**{medaille} {nom}**\n"
+            f"└─ Cote : **{round(cote)}** ({parties} matchs)\n\n"
+        )
+
+    embed.description += description_text
+    LEADERBOARDS.put(filename, "elo", embed.to_dict())
+    await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name="stats_cache", description="Efficacité du cache des classements")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def stats_cache(interaction: discord.Interaction):
+    total = LEADERBOARDS.hits + LEADERBOARDS.misses
+    taux = (LEADERBOARDS.hits / total * 100) if total > 0 else 0
+    await interaction.response.send_message(
+        f"📦 **Cache des classements**\n"
+        f"└─ Succès : **{LEADERBOARDS.hits}** | Échecs : **{LEADERBOARDS.misses}** ({taux:.1f}% de succès)\n"
+        f"└─ Entrées : **{len(LEADERBOARDS.entries)}**",
+        ephemeral=True
+    )
+
+NOMS_PARTIES = {"morpion": "Morpion", "puissance4": "Puissance 4", "echecs": "Echecs"}
+
+@bot.tree.command(name="parties_en_cours", description="Parties actives et mémoire qu'elles occupent")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def parties_en_cours(interaction: discord.Interaction):
+    counts = SESSIONS.counts()
+    memory = SESSIONS.memory()
+    lignes = [
+        f"└─ {nom} : **{counts.get(kind, 0)}** partie(s), ~{memory.get(kind, 0) / 1024:.0f} Ko"
+        for kind, nom in NOMS_PARTIES.items()
+    ]
+    await interaction.response.send_message(
+        f"🎮 **Parties en cours : {len(SESSIONS.sessions)}** / {SESSIONS.max_total}\n" + "\n".join(lignes) +
+        f"\n└─ Joueurs en partie : **{len(SESSIONS.by_user)}** | Parties expirées : **{SESSIONS.evicted}**",
+        ephemeral=True
+    )
+
+def get_title(wins, total):
+    if total == 0: return "Nouveau venu"
+    if wins >= 100: return "👑 Légende du Morpion"
+    if wins >= 50: return "🔥 Grand Maître"
+    if wins >= 20 : return "⚔️ Guerrier"
+    if total >= 10: return "🛡️ Apprenti"
+    return "🌱 Novice"
+
+@bot.tree.command(name="profil", description="Profil d'une personne pour un jeu")
+@app_commands.choices(jeu=[
+    app_commands.Choice(name="Echecs", value=3),
+    app_commands.Choice(name="Puissance 4", value=2),
+    app_commands.Choice(name="Morpion", value=1),
+])
+async def profil(interaction: discord.Interaction, jeu: app_commands.Choice[int], membre: discord.Member = None):
+    await interaction.response.defer()
+    user = membre or interaction.user
+    if jeu.value not in JEUX:
+        return await interaction.followup.send("Ce jeu n'existe pas")
+    filename, titre_de_embed = JEUX[jeu.value]
+    uid = str(user.id)
+
+    with Span("stats"):
+        data = STATS.player(filename, uid)
+    if data is None:
+        return await interaction.followup.send("Ce joueur n'a pas encore de statistiques.")
+
+    wins, losses, draws = data['wins'], data['losses'], data['draws']
+    total = wins + losses + draws
+    
+    # --- CALCUL DES CLASSEMENTS ---
+    
+    ranks = LEADERBOARDS.get(filename, ("rangs", uid))
+    if ranks is None:
+        with Span("stats"):
+            # 1. Classement par SCORE (Points : Win=1, Draw=0.5)
+            rank_score = STATS.rank_score(filename, uid)
+
+            # 2. Classement par WINRATE (Qualité de jeu)
+            # On ne compte que ceux qui ont joué au moins 10 parties pour éviter les 100% chanceux
+            if total >= MIN_PARTIES_WINRATE:
+                rank_rate = STATS.rank_winrate(filename, uid)
+            else:
+                rank_rate = "Non classé"
+
+        # 3. Classement ELO (force des adversaires prise en compte)
+        cote = RATINGS.get(filename, uid)
+        if cote and cote[1] >= MIN_PARTIES_ELO:
+            rank_elo = RATINGS.rank(filename, uid)
+        else:
+            rank_elo = "Non classé"
+        ranks = (rank_score, rank_rate, rank_elo)
+        LEADERBOARDS.put(filename, ("rangs", uid), ranks)
+    rank_score, rank_rate, rank_elo = ranks
+    cote = RATINGS.get(filename, uid)
+    elo = round(cote[0]) if cote else round(ELO_BASE)
+
+    # --- PRÉPARATION DE L'EMBED ---
+    winrate_val = ((wins + (draws * 0.5)) / total * 100) if total > 0 else 0
+    titre = get_title(wins, total)
+
+    embed = discord.Embed(
+        title=f"Profil de {user.name}", 
+        description=f"**Titre :** `{titre}`", 
+        color=discord.Color.gold()
+    )
+    embed.set_thumbnail(url=user.display_avatar.url)
+
+    # Section Stats
+    embed.add_field(
+        name="📊 Statistiques", 
+        value=f"Victoires : **{wins}**\n Défaites : **{losses}**\n Nuls : **{draws}**", 
+        inline=True
+    )
+    # Section Rangs
+    embed.add_field(
+        name="🏆 Classements", 
+        value=f"Rang Score : **#{rank_score}**\n Rang Winrate : **#{rank_rate}**\n Cote Elo : **{elo}** (#{rank_elo})", 
+        inline=True
+    )
+
+    # Barre de progression visuelle (Optionnel mais stylé)
+    progress = int((winrate_val / 100) * 10)
+    barre = "🟦" * progress + "⬜" * (10 - progress)
+    embed.add_field(name=f"📈 Taux de réussite : {winrate_val:.1f}%", value=barre, inline=False)
+
+    #SYSTEME RAJOUTE (BUg FIX)
+
+    rival_text = "Aucun rival pour le moment."
+    with Span("stats"):
+        rivaux = STATS.rivals(filename, uid, 1) # L'index est déjà trié par nombre de matchs
+    if rivaux:
+        nemesis_id, n_name, n_wins, n_losses, n_draws = rivaux[0]
+        n_total = n_wins + n_losses + n_draws
+        rival_text = f"**{n_name or nemesis_id}** ({n_total} matchs)\n└─ Victoires: {n_wins} | Défaites: {n_losses} | Nulles: {n_draws}"
+
+    # --- Création de l'Embed ---
+
+    embed.add_field(name="🔥 Séries (Streak)", 
+                    value=f"Actuelle : **{data.get('current_streak', 0)}**\nRecord : **{data.get('max_streak', 0)}**", inline=True)
+    
+    embed.add_field(name="⚔️ Plus grand Rival", value=rival_text, inline=False)
+    await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name="face_a_face", description="Compare deux joueurs sur tous les jeux")
+@app_commands.describe(membre="Le joueur à comparer", autre_membre="Le second joueur (toi par défaut)")
+async def face_a_face(interaction: discord.Interaction, membre: discord.Member, autre_membre: discord.Member = None):
+    joueur_a = autre_membre or interaction.user
+    joueur_b = membre
+    if joueur_a == joueur_b:
+        return await interaction.response.send_message("Il faut deux joueurs différents !", ephemeral=True)
+
+    embed = discord.Embed(
+        title=f"⚔️ {joueur_a.display_name} vs {joueur_b.display_name}",
+        color=discord.Color.purple()
+    )
+    total_a = total_b = total_nuls = 0
+    for filename, nom_jeu in JEUX.values():
+        duel = STATS.duel(filename, str(joueur_a.id), str(joueur_b.id))
+        if duel is None:
+            embed.add_field(name=nom_jeu, value="Jamais affrontés", inline=False)
+            continue
+        wins_a, wins_b, nuls = duel
+        total_a += wins_a
+        total_b += wins_b
+        total_nuls += nuls
+        embed.add_field(
+            name=f"{nom_jeu} ({wins_a + wins_b + nuls} matchs)",
+            value=f"└─ {joueur_a.display_name} : **{wins_a}** | {joueur_b.display_name} : **{wins_b}** | Nuls : **{nuls}**",
+            inline=False
+        )
+
+    if total_a + total_b + total_nuls == 0:
+        embed.description = "Ces deux joueurs ne se sont encore jamais affrontés."
+    else:
+        meneur = joueur_a if total_a > total_b else joueur_b if total_b > total_a else None
+        embed.description = (
+            f"Bilan global : **{total_a}** - **{total_b}** ({total_nuls} nuls)\n"
+            + (f"👑 Avantage à {meneur.mention}" if meneur else "🤝 Égalité parfaite")
+        )
+    await interaction.response.send_message(embed=embed)
+######################################################################################################
+
+import discord
+from discord import app_commands
+import random
+
+# --- Constantes Visuelles ---
+VIDE = "⚫"
+ROUGE = "🔴" # Joueur 1
+JAUNE = "🟡" # Joueur 2
+COLONNES = 7
+LIGNES = 6
+
+# Chaque colonne occupe LIGNES + 1 bits (du bas vers le haut), le bit en trop
+# reste toujours à 0 et empêche une ligne de "déborder" sur la colonne voisine.
+HAUTEUR_BITS = LIGNES + 1
+
+class Connect4Board:
+    """Position de Puissance 4 en bitboards : un entier par joueur + la hauteur de chaque colonne.
+
+    Poser un jeton est O(1) et la victoire se teste en quelques décalages sur
+    le bitboard du joueur qui vient de jouer (4 directions : 1, 7, 6 et 8 bits).
+    """
+
+    __slots__ = ("boards", "heights", "moves")
+
+    def __init__(self):
+        self.boards = [0, 0]  # bitboard du joueur 1 (ROUGE) et du joueur 2 (JAUNE)
+        self.heights = [c * HAUTEUR_BITS for c in range(COLONNES)] # prochain bit libre par colonne
+        self.moves = 0
+
+    def can_play(self, col):
+        return self.heights[col] < col * HAUTEUR_BITS + LIGNES
+
+    def play(self, col, player):
+        """Pose un jeton (player = 1 ou 2). Retourne la ligne (0 = haut) ou -1 si la colonne est pleine."""
+        if not self.can_play(col):
+            return -1
+        height = self.heights[col]
+        self.boards[player - 1] |= 1 << height
+        self.heights[col] = height + 1
+        self.moves += 1
+        return LIGNES - 1 - (height - col * HAUTEUR_BITS)
+
+    def undo(self, col, player):
+        self.heights[col] -= 1
+        self.boards[player - 1] ^= 1 << self.heights[col]
+        self.moves -= 1
+
+    @staticmethod
+    def is_win(bitboard):
+        for shift in (1, HAUTEUR_BITS, HAUTEUR_BITS - 1, HAUTEUR_BITS + 1):
+            pairs = bitboard & (bitboard >> shift)
+            if pairs & (pairs >> (2 * shift)):
+                return True
+        return False
+
+    def is_full(self):
+        return self.moves == LIGNES * COLONNES
+
+    def pack(self):
+        """Les deux bitboards dans un seul entier (le joueur 2 au-dessus des bits du joueur 1)."""
+        return self.boards[0] | self.boards[1] << (COLONNES * HAUTEUR_BITS)
+
+    @classmethod
+    def unpack(cls, packed):
+        engine = cls()
+        size = COLONNES * HAUTEUR_BITS
+        engine.boards = [packed & ((1 << size) - 1), packed >> size]
+        mask = engine.boards[0] | engine.boards[1]
+        # Les jetons d'une colonne sont empilés depuis le bas : la hauteur est leur nombre
+        for col in range(COLONNES):
+            engine.heights[col] += (mask >> (col * HAUTEUR_BITS) & ((1 << LIGNES) - 1)).bit_count()
+        engine.moves = mask.bit_count()
+        return engine
+
+    def cell(self, row, col):
+        """0 (vide), 1 ou 2 pour la case (row = 0 en haut, comme l'affichage)."""
+        bit = 1 << (col * HAUTEUR_BITS + LIGNES - 1 - row)
+        if self.boards[0] & bit:
+            return 1
+        if self.boards[1] & bit:
+            return 2
+        return 0
+
+# --- IA DU PUISSANCE 4 ---
+MASQUE_BAS = sum(1 << (c * HAUTEUR_BITS) for c in range(COLONNES))
+MASQUE_PLATEAU = MASQUE_BAS * ((1 << LIGNES) - 1)
+MASQUES_COLONNES = [((1 << LIGNES) - 1) << (c * HAUTEUR_BITS) for c in range(COLONNES)]
+ORDRE_COLONNES = [3, 2, 4, 1, 5, 0, 6] # Le centre d'abord : meilleures coupures alpha-beta
+SCORE_VICTOIRE = 1000
+
+# Niveaux : (profondeur max, temps par coup en secondes, probabilité de coup au hasard)
+NIVEAUX_IA = {
+    "facile": (2, 0.2, 0.3),
+    "moyen": (6, 1.0, 0.0),
+    "difficile": (LIGNES * COLONNES, 2.5, 0.0),
+}
+# Recherches en parallèle au plus : elles tiennent le GIL, chacune de plus ralentit la boucle du bot
+IA_CONCURRENCE = int(os.getenv("IA_CONCURRENCE", "2"))
+IA_SEMAPHORE = asyncio.Semaphore(IA_CONCURRENCE)
+
+def cases_gagnantes(pos, mask):
+    """Cases vides qui compléteraient un alignement de 4 pour les jetons `pos`."""
+    # Vertical
+    r = (pos << 1) & (pos << 2) & (pos << 3)
+    # Horizontal puis les deux diagonales
+    for shift in (HAUTEUR_BITS, HAUTEUR_BITS - 1, HAUTEUR_BITS + 1):
+        p = (pos << shift) & (pos << 2 * shift)
+        r |= p & (pos << 3 * shift)
+        r |= p & (pos >> shift)
+        p = (pos >> shift) & (pos >> 2 * shift)
+        r |= p & (pos << shift)
+        r |= p & (pos >> 3 * shift)
+    return r & (MASQUE_PLATEAU ^ mask)
+
+class SearchTimeout(Exception):
+    pass
+
+class Connect4Solver:
+    """Negamax alpha-beta avec table de transposition bornée et approfondissement itératif.
+
+    Une position est décrite comme dans les solveurs classiques : `pos` les jetons
+    du joueur qui doit jouer, `mask` tous les jetons. La clé pos + mask est unique.
+    """
+
+    def __init__(self, max_entries=200_000):
+        self.max_entries = max_entries
+        self.table = {} # clé -> (profondeur, borne, score, meilleure colonne)
+        self.nodes = 0
+        self.deadline = None
+
+    def _score_victoire(self, moves):
+        # Gagner vite vaut plus que gagner tard
+        return SCORE_VICTOIRE * (LIGNES * COLONNES + 1 - moves)
+
+    def _heuristique(self, pos, mask):
+        # Différence du nombre de menaces (cases gagnantes encore vides)
+        return bin(cases_gagnantes(pos, mask)).count("1") - bin(cases_gagnantes(pos ^ mask, mask)).count("1")
+
+    def negamax(self, pos, mask, moves, depth, alpha, beta):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 4095 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+        if moves == LIGNES * COLONNES:
+            return 0
+        possible = (mask + MASQUE_BAS) & MASQUE_PLATEAU
+        if cases_gagnantes(pos, mask) & possible:
+            return self._score_victoire(moves + 1)
+        opp = pos ^ mask
+        menaces = cases_gagnantes(opp, mask)
+        forced = possible & menaces
+        if forced:
+            if forced & (forced - 1):
+                return -self._score_victoire(moves + 2) # Deux menaces : perdu
+            possible = forced
+        # On ne joue jamais juste sous une case gagnante adverse
+        possible &= ~(menaces >> 1)
+        if not possible:
+            return -self._score_victoire(moves + 2)
+        if depth == 0:
+            return self._heuristique(pos, mask)
+
+        key = pos + mask
+        entry = self.table.get(key)
+        best_col = None
+        if entry is not None:
+            e_depth, bound, e_score, best_col = entry
+            if e_depth >= depth:
+                if bound == 0:
+                    return e_score
+                if bound < 0 and e_score <= alpha:
+                    return e_score
+                if bound > 0 and e_score >= beta:
+                    return e_score
+
+        alpha_origin = alpha
+        best_score = -SCORE_VICTOIRE * LIGNES * COLONNES
+        order = ORDRE_COLONNES if best_col is None else [best_col] + [c for c in ORDRE_COLONNES if c != best_col]
+        for col in order:
+            move = possible & MASQUES_COLONNES[col]
+            if not move:
+                continue
+            score = -self.negamax(opp, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if score > best_score:
+                best_score, best_col = score, col
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if len(self.table) >= self.max_entries:
+            self.table.clear()
+        # borne : -1 = majorant, 0 = exact, 1 = minorant
+        bound = -1 if best_score <= alpha_origin else (1 if best_score >= beta else 0)
+        self.table[key] = (depth, bound, best_score, best_col)
+        return best_score
+
+    def _root(self, pos, mask, moves, depth, order):
+        possible = (mask + MASQUE_BAS) & MASQUE_PLATEAU
+        gagnantes = cases_gagnantes(pos, mask) & possible
+        for col in order:
+            if gagnantes & MASQUES_COLONNES[col]:
+                return col, self._score_victoire(moves + 1)
+        alpha, beta = -SCORE_VICTOIRE * 100, SCORE_VICTOIRE * 100
+        best_col, best_score = order[0], None
+        for col in order:
+            move = possible & MASQUES_COLONNES[col]
+            score = -self.negamax(pos ^ mask, mask | move, moves + 1, depth - 1, -beta, -alpha)
+            if best_score is None or score > best_score:
+                best_col, best_score = col, score
+                alpha = max(alpha, score)
+        return best_col, best_score
+
+    def best_move(self, pos, mask, moves, max_depth, time_budget=None):
+        """Meilleure colonne par approfondissement itératif. Retourne (colonne, score, profondeur atteinte)."""
+        self.nodes = 0
+        self.deadline = time.perf_counter() + time_budget if time_budget else None
+        possible = (mask + MASQUE_BAS) & MASQUE_PLATEAU
+        order = [c for c in ORDRE_COLONNES if possible & MASQUES_COLONNES[c]]
+        best = (order[0], 0, 0)
+        remaining = LIGNES * COLONNES - moves
+        for depth in range(1, min(max_depth, remaining) + 1):
+            try:
+                col, score = self._root(pos, mask, moves, depth, order)
+            except SearchTimeout:
+                break
+            best = (col, score, depth)
+            # Le meilleur coup de cette profondeur est essayé en premier à la suivante
+            order = [col] + [c for c in order if c != col]
+            if abs(score) >= SCORE_VICTOIRE:
+                break # Issue forcée trouvée : inutile de chercher plus loin
+        self.deadline = None
+        return best
+
+class Connect4AI:
+    """Adversaire artificiel d'une partie : un solveur (et sa table) par partie."""
+
+    def __init__(self, niveau="moyen"):
+        self.niveau = niveau
+        self.max_depth, self.time_budget, self.hasard = NIVEAUX_IA[niveau]
+        self.solver = Connect4Solver()
+
+    def choose(self, pos, mask, moves):
+        if self.hasard and random.random() < self.hasard:
+            possible = (mask + MASQUE_BAS) & MASQUE_PLATEAU
+            return random.choice([c for c in range(COLONNES) if possible & MASQUES_COLONNES[c]])
+        col, _, _ = self.solver.best_move(pos, mask, moves, self.max_depth, self.time_budget)
+        return col
+
+    async def choose_async(self, engine, player):
+        # Recherche dans un thread : le temps par coup borne l'occupation du GIL, et le sémaphore
+        # le nombre de recherches qui se le disputent avec la boucle (le chrono démarre une fois admis)
+        pos = engine.boards[player - 1]
+        mask = engine.boards[0] | engine.boards[1]
+        with Span("ia"):
+            async with IA_SEMAPHORE:
+                return await asyncio.to_thread(self.choose, pos, mask, engine.moves)
+
+class Connect4Button(discord.ui.Button):
+    def __init__(self, col_index):
+        # On crée un bouton pour chaque colonne (1 à 7)
+        super().__init__(style=discord.ButtonStyle.secondary, label=str(col_index + 1), row=0 if col_index < 4 else 1, custom_id=f"p4:{col_index}")
+        self.col = col_index
+
+    @traced("puissance4.colonne")
+    async def callback(self, interaction: discord.Interaction):
+        view: Connect4Game = self.view
+        
+        # 1. Vérification du tour
+        joueur_actuel = view.player1 if view.turn == 1 else view.player2
+        if interaction.user != joueur_actuel:
+            return await interaction.response.send_message("Pas touche ! Ce n'est pas ton tour.", ephemeral=True)
+
+        # 2. Placer le jeton (Gravité)
+        ligne_jouee = view.drop_piece(self.col, view.turn)
+        
+        if ligne_jouee == -1:
+            return await interaction.response.send_message("Cette colonne est pleine !", ephemeral=True)
+
+        # 3. Vérifier Victoire / Nul (ou passer au tour suivant)
+        content = view.after_move(joueur_actuel)
+        await EDITS.respond(interaction, content=content, view=view)
+
+        # 4. Contre le bot : il répond dans la foulée
+        if view.is_ai_turn():
+            await view.play_ai_turn(interaction.message)
+
+class Connect4Game(GameView):
+    def __init__(self, p1, p2, ai_player=None, niveau="moyen"):
+        super().__init__()
+
+        # 1. Tirage au sort immédiat
+        joueurs = [p1, p2]
+        random.shuffle(joueurs)
+        
+        # 2. Attribution des rôles
+        # player1 sera toujours ROUGE et commencera
+        self.player1 = joueurs[0] 
+        self.player2 = joueurs[1]
+        
+        # 3. Initialisation (Le tour 1 correspond à self.player1)
+        self.turn = 1
+
+        # Grille 6 lignes x 7 colonnes (bitboards)
+        self.engine = Connect4Board()
+
+        # Partie contre le bot (ai_player est alors le membre du bot)
+        self.ai_player = ai_player
+        self.ai = Connect4AI(niveau) if ai_player is not None else None
+
+        # Ajouter les boutons (1 à 7)
+        for i in range(COLONNES):
+            self.add_item(Connect4Button(i))
+
+    def drop_piece(self, col, player):
+        """Fait tomber une pièce dans la colonne. Retourne la ligne ou -1 si plein."""
+        return self.engine.play(col, player)
+
+    # --- SAUVEGARDE (redémarrage du bot) ---
+    def snapshot(self):
+        return {
+            "joueurs": [joueur_snapshot(self.player1), joueur_snapshot(self.player2)],
+            "ia": self.ai_player.id if self.ai_player else None,
+            "niveau": self.ai.niveau if self.ai else None,
+            "plateau": self.engine.pack(),
+            "tour": self.turn,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, joueurs, salon):
+        p1, p2 = joueurs
+        ai_player = next((j for j in joueurs if j.id == data["ia"]), None)
+        game = cls(p1, p2, ai_player=ai_player, niveau=data["niveau"] or "moyen")
+        game.player1, game.player2 = p1, p2
+        game.engine = Connect4Board.unpack(data["plateau"])
+        game.turn = data["tour"]
+        game.message = salon.get_partial_message(data["message"])
+        return game
+
+    def after_move(self, joueur_actuel):
+        """Vérifie Victoire / Nul après un coup, sinon passe au tour suivant. Retourne le texte du message."""
+        if self.check_winner(self.turn):
+            winner = joueur_actuel
+            loser = self.player2 if winner == self.player1 else self.player1
+            
+            # --- SAUVEGARDE DES SCORES (pas de stats contre le bot) ---
+            if self.ai is None:
+                try:
+                    # Victoire : le gagnant bat le perdant
+                    record_match(FILE_P4, winner, loser, 'win')
+                except Exception as e:
+                    print(f"Erreur de sauvegarde: {e}")
+
+            self.disable_all()
+            self.stop()
+            return f"🏆 **Victoire de {winner.mention} !**\n\n{self.get_board_str()}"
+
+        if self.is_full():
+            # Match Nul
+            if self.ai is None:
+                record_match(FILE_P4, self.player1, self.player2, 'draw')
+            
+            self.disable_all()
+            self.stop()
+            return f"🤝 **Match Nul !** La grille est pleine.\n\n{self.get_board_str()}"
+
+        # Tour suivant
+        self.turn = 2 if self.turn == 1 else 1
+        next_player = self.player2 if self.turn == 2 else self.player1
+        pion = JAUNE if self.turn == 2 else ROUGE
+        return f"Au tour de {next_player.mention} ({pion})\n\n{self.get_board_str()}"
+
+    def is_ai_turn(self):
+        if self.ai is None or self.is_finished():
+            return False
+        return (self.player1 if self.turn == 1 else self.player2) == self.ai_player
+
+    async def play_ai_turn(self, message):
+        col = await self.ai.choose_async(self.engine, self.turn)
+        self.drop_piece(col, self.turn)
+        content = self.after_move(self.ai_player)
+        await EDITS.edit(message, content=content, view=self)
+
+    async def resume_ai_turn(self):
+        await self.play_ai_turn(self.message)
+
+    def get_board_str(self):
+        """Convertit les bitboards en string d'emojis"""
+        pions = (VIDE, ROUGE, JAUNE)
+        lines = [
+            "".join(pions[self.engine.cell(row, col)] for col in range(COLONNES))
+            for row in range(LIGNES)
+        ]
+        # Ajout des numéros en bas
+        return "\n".join(lines) + "\n1️⃣2️⃣3️⃣4️⃣5️⃣6️⃣7️⃣"
+
+    def disable_all(self):
+        for item in self.children:
+            item.disabled = True
+
+    def is_full(self):
+        return self.engine.is_full()
+
+    def check_winner(self, player):
+        # Horizontal, vertical et diagonales d'un coup sur le bitboard du joueur
+        return Connect4Board.is_win(self.engine.boards[player - 1])
+
+@bot.tree.command(name="puissance4", description="Défier quelqu'un (ou le bot lui-même) au Puissance 4")
+@app_commands.choices(difficulte=[
+    app_commands.Choice(name="Facile", value="facile"),
+    app_commands.Choice(name="Moyen", value="moyen"),
+    app_commands.Choice(name="Difficile", value="difficile"),
+])
+async def puissance4(interaction: discord.Interaction, adversaire: discord.Member, difficulte: app_commands.Choice[str] = None):
+    await interaction.response.defer()
+    contre_le_bot = adversaire.id == bot.user.id
+    if adversaire.bot and not contre_le_bot:
+        return await interaction.followup.send("Les robots sont trop forts au Puissance 4...")
+    if adversaire == interaction.user:
+        return await interaction.followup.send("Tu ne peux pas jouer contre toi-même.")
+    humains = [interaction.user] if contre_le_bot else [interaction.user, adversaire]
+    refus = SESSIONS.refus(*humains)
+    if refus:
+        return await interaction.followup.send(refus)
+
+    if contre_le_bot:
+        niveau = difficulte.value if difficulte else "moyen"
+        view = Connect4Game(interaction.user, adversaire, ai_player=adversaire, niveau=niveau)
+    else:
+        view = Connect4Game(interaction.user, adversaire)
+    SESSIONS.add(view, "puissance4", humains, interaction.channel_id)
+    
+    # On récupère qui commence
+    first_player = view.player1
+    pion = ROUGE # Le joueur 1 a toujours les rouges
+    
+    message = await interaction.followup.send(
+        f"🔵 **Puissance 4** : {interaction.user.mention} VS {adversaire.mention}\n"
+        f"C'est parti ! **{first_player.mention}** commence ({pion})\n\n"
+        f"{view.get_board_str()}",
+        view=view,
+        wait=True
+    )
+    view.message = message
+    if view.is_ai_turn():
+        await view.play_ai_turn(message)
+import chess
+import chess.svg
+from io import BytesIO
+
+# -------------------------------------------------------------------------
+#   _____ _    _ ______  _____  _____ 
+#  / ____| |  | |  ____|/ ____|/ ____|
+# | |    | |__| | |__  | (___ | (___  
+# | |    |  __  |  __|  \___ \ \___ \ 
+# | |____| |  | | |____ ____) |____) |
+#  \_____|_|  |_|______|_____/|_____/ 
+#
+# >>> SYSTÈME D'ÉCHECS INTERACTIF <<<
+# -------------------------------------------------------------------------
+os.environ['PATH'] = os.environ.get('PATH', '') + os.pathsep + r'C:\Users\LOUP.RAINGEARD\AppData\Local\Programs\Python\Python314\Lib\site-packages\cairo'
+# -------------------------------------------------------------------------
+#   _____ _    _ ______  _____  _____ 
+#  / ____| |  | |  ____|/ ____|/ ____|
+# | |    | |__| | |__  | (___ | (___  
+# | |    |  __  |  __|  \___ \ \___ \ 
+# | |____| |  | | |____ ____) |____) |
+#  \_____|_|  |_|______|_____/|_____/ 
+#
+# >>> SYSTÈME D'ÉCHECS INTERACTIF (MENUS) <<<
+# -------------------------------------------------------------------------
+import time
+
+# --- HORLOGES DES PARTIES (une seule tâche pour toutes les parties) ---
+CHRONO_REFRESH = 5 # Secondes entre deux mises à jour du message du chrono
+
+def format_time(seconds):
+    mins, secs = divmod(int(max(0, seconds)), 60)
+    return f"{mins:02d}:{secs:02d}"
+
+class ChessClockService:
+    """Toutes les pendules d'échecs dans un seul tas d'échéances (horloge monotone).
+
+    Deux échéances par partie : la chute du drapeau du joueur au trait et le
+    prochain rafraîchissement du message. La tâche unique dort jusqu'à la plus
+    proche ; jouer un coup incrémente la génération de la partie, ce qui
+    invalide ses anciennes échéances sans avoir à les retirer du tas.
+    """
+
+    def __init__(self, refresh=CHRONO_REFRESH):
+        self.refresh = refresh
+        self.heap = [] # (échéance, n°, génération, partie, type)
+        self.counter = 0
+        self.task = None
+        self.wake = None
+
+    # --- Calculs de temps ---
+    def remaining(self, game, color):
+        left = game.time_left[color]
+        if game.turn_started is not None and color == game.board.turn:
+            left -= time.monotonic() - game.turn_started
+        return max(0, left)
+
+    def start(self, game):
+        """Lance la pendule du joueur au trait."""
+        game.turn_started = time.monotonic()
+        self._schedule(game)
+
+    def switch(self, game, mover):
+        """Décompte le temps du coup qui vient d'être joué. Retourne False si le drapeau est tombé."""
+        now = time.monotonic()
+        game.time_left[mover] -= now - game.turn_started
+        if game.time_left[mover] <= 0:
+            game.time_left[mover] = 0
+            game.turn_started = None
+            self.stop(game)
+            return False
+        game.turn_started = now
+        self._schedule(game)
+        return True
+
+    def stop(self, game):
+        """Arrête la pendule d'une partie (le temps du coup en cours est décompté)."""
+        if game.turn_started is not None:
+            game.time_left[game.board.turn] = self.remaining(game, game.board.turn)
+            game.turn_started = None
+        game.clock_gen += 1
+
+    # --- Échéancier ---
+    def _push(self, deadline, game, kind):
+        self.counter += 1
+        heapq.heappush(self.heap, (deadline, self.counter, game.clock_gen, game, kind))
+
+    def _schedule(self, game):
+        game.clock_gen += 1
+        now = time.monotonic()
+        self._push(now + game.time_left[game.board.turn], game, "drapeau")
+        self._push(now + self.refresh, game, "affichage")
+        if self.task is None or self.task.done():
+            self.wake = asyncio.Event()
+            self.task = background_task(self._run())
+        self.wake.set()
+
+    async def _run(self):
+        while True:
+            # On jette les échéances des coups déjà joués / parties finies
+            while self.heap and self.heap[0][2] != self.heap[0][3].clock_gen:
+                heapq.heappop(self.heap)
+            if not self.heap:
+                self.task = None
+                return
+            delay = self.heap[0][0] - time.monotonic()
+            if delay > 0:
+                self.wake.clear()
+                try:
+                    await asyncio.wait_for(self.wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, _, game, kind = heapq.heappop(self.heap)
+            if kind == "drapeau":
+                color = game.board.turn
+                self.stop(game)
+                game.time_left[color] = 0
+                background_task(game.on_flag(color))
+            else:
+                self._push(time.monotonic() + self.refresh, game, "affichage")
+                background_task(game.refresh_clock_display())
+
+CLOCKS = ChessClockService()
+
+class ChessGame(GameView):
+    def __init__(self, white_player, black_player, timer_minutes):
+        super().__init__()
+        self.board = chess.Board()
+        self.white = white_player
+        self.black = black_player
+        self.board_theme = "green"
+        
+        # On stockera les deux messages ici
+        self.board_message = None 
+        self.timer_message = None
+        
+        # Gestion du Timer (les calculs sont faits par CLOCKS)
+        self.timer_minutes = timer_minutes
+        self.timer_started = False
+        self.turn_started = None # Début du coup en cours (time.monotonic)
+        self.clock_gen = 0
+        
+        self.selected_type = None    
+        self.selected_square = None  
+        
+        # Init du Timer
+        if self.timer_minutes > 0:
+            self.time_left = {
+                chess.WHITE: timer_minutes * 60,
+                chess.BLACK: timer_minutes * 60
+            }
+        else:
+            self.time_left = None
+
+        self.refresh_moves()
+        self.create_menus()
+
+    # --- COUPS LÉGAUX (calculés une seule fois par demi-coup) ---
+    def refresh_moves(self):
+        """Range les coups légaux par type de pièce -> case de départ -> coups, et met en cache l'issue de la partie."""
+        index = {}
+        for move in self.board.legal_moves:
+            piece_type = self.board.piece_type_at(move.from_square)
+            index.setdefault(piece_type, {}).setdefault(move.from_square, []).append(move)
+        self.moves_index = index
+
+        # Même règles que board.is_game_over(), sans regénérer les coups
+        if not index:
+            self.outcome = "mat" if self.board.is_check() else "nul" # Mat ou pat
+        elif self.board.is_insufficient_material() or self.board.is_seventyfive_moves() or self.board.is_fivefold_repetition():
+            self.outcome = "nul"
+        else:
+            self.outcome = None
+
+    def push_move(self, move):
+        self.board.push(move)
+        self.refresh_moves()
+
+    def is_legal(self, move):
+        return move in self.moves_index.get(self.board.piece_type_at(move.from_square), {}).get(move.from_square, ())
+
+    # --- SAUVEGARDE (redémarrage du bot) ---
+    def snapshot(self):
+        """FEN + coups joués (pour les répétitions) + temps restant de chaque camp."""
+        return {
+            "joueurs": [joueur_snapshot(self.white), joueur_snapshot(self.black)],
+            "fen": self.board.fen(),
+            "coups": [move.uci() for move in self.board.move_stack],
+            "theme": self.board_theme,
+            "chrono": self.timer_minutes,
+            "temps": [CLOCKS.remaining(self, chess.WHITE), CLOCKS.remaining(self, chess.BLACK)] if self.time_left else None,
+            "demarre": self.timer_started,
+            "en_cours": self.turn_started is not None,
+            "message_chrono": self.timer_message.id if self.timer_message else None,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data, joueurs, salon):
+        white, black = joueurs
+        game = cls(white, black, data["chrono"])
+        game.board_theme = data["theme"]
+        for uci in data["coups"]:
+            game.board.push_uci(uci)
+        if game.board.fen() != data["fen"]:
+            game.board.set_fen(data["fen"]) # Historique incohérent : on garde au moins la position
+        game.refresh_moves()
+        game.create_menus()
+        if data["temps"]:
+            game.time_left = {chess.WHITE: data["temps"][0], chess.BLACK: data["temps"][1]}
+        game.timer_started = data["demarre"]
+        game.board_message = game.message = salon.get_partial_message(data["message"])
+        if data["message_chrono"]:
+            game.timer_message = salon.get_partial_message(data["message_chrono"])
+        if data["en_cours"]:
+            CLOCKS.start(game) # Le temps passé hors ligne n'est décompté à personne
+        return game
+
+    def board_embed(self):
+        """Embed du plateau. Un message réhydraté est partiel (sans embeds) : on le reconstruit."""
+        if getattr(self.board_message, "embeds", None):
+            return self.board_message.embeds[0]
+        embed = discord.Embed(title="♟️ Match d'Échecs", color=0x2b2d31)
+        embed.set_image(url="attachment://plateau.png" if cairosvg else get_chess_board_image(self.board, self.board_theme))
+        return embed
+
+    # --- CHRONO (appelé par CLOCKS, ne touche qu'au message du haut) ---
+    async def on_flag(self, color):
+        if not self.finish():
+            return # Mat ou abandon arrivé juste avant
+        winner = self.black if color == chess.WHITE else self.white
+        loser = self.white if color == chess.WHITE else self.black
+        
+        # Mise à jour du message du haut (Timer) pour annoncer la fin
+        await EDITS.edit(self.timer_message, content=f"⏰ **FIN DU TEMPS !** Victoire de {winner.mention}")
+        
+        # Désactivation du plateau
+        await self.end_game_visuals(winner, loser, "temps")
+
+    async def refresh_clock_display(self):
+        if not self.timer_message:
+            return
+
+        # MISE À JOUR DU TEXTE (Pas d'image ici !)
+        t_blanc = format_time(CLOCKS.remaining(self, chess.WHITE))
+        t_noir = format_time(CLOCKS.remaining(self, chess.BLACK))
+        
+        # Indicateur visuel de qui joue (🔴 pour le tour en cours)
+        icon_w = "🔴" if self.board.turn == chess.WHITE else "⚪"
+        icon_b = "🔴" if self.board.turn == chess.BLACK else "⚫"
+        
+        msg_content = (
+            f"⏱️ **CHRONO**\n"
+            f"{icon_w} **Blancs** ({self.white.display_name}) : `{t_blanc}`\n"
+            f"{icon_b} **Noirs** ({self.black.display_name}) : `{t_noir}`"
+        )
+        
+        # Édition de fond : fusionnée avec la précédente si le salon est saturé
+        EDITS.post(self.timer_message, content=msg_content)
+
+    # --- MISE À JOUR DU JEU (Appelée quand on joue un coup) ---
+    async def update_message(self, interaction):
+        if self.timer_minutes > 0:
+            if not self.timer_started:
+                if len(self.board.move_stack) >= 2:
+                    self.timer_started = True
+                    CLOCKS.start(self)
+                    # On force une mise à jour immédiate du texte du timer
+                    EDITS.post(self.timer_message, content="🏁 **Le timer vient de démarrer !**") # sans attendre : le clic doit être répondu vite
+            elif self.turn_started is not None:
+                previous_turn = not self.board.turn
+                if not CLOCKS.switch(self, previous_turn):
+                    if not self.finish():
+                        return
+                    winner = self.black if previous_turn == chess.WHITE else self.white
+                    await EDITS.edit(self.timer_message, content=f"⏰ **FIN DU TEMPS !** Victoire de {winner.mention}")
+                    return await self.end_game_visuals(winner, interaction.user, "temps")
+
+        # Fin de partie réservée avant le premier await : un abandon ou le drapeau ne peut plus s'y ajouter
+        if self.outcome in ("mat", "nul") and not self.finish():
+            return
+
+        # Mise à jour du PLATEAU (Embed)
+        image_url, fichier = await board_image(self.board, self.board_theme)
+        embed = interaction.message.embeds[0] # On récupère l'embed du message cliqué
+        embed.set_image(url=image_url)
+        
+        tour_nom = self.white.display_name if self.board.turn == chess.WHITE else self.black.display_name
+        couleur = "Blancs" if self.board.turn == chess.WHITE else "Noirs"
+        embed.description = f"Trait aux **{couleur}** ({tour_nom})"
+
+        # Vérification Mat / Nul (issue calculée avec les coups légaux)
+        if self.outcome == "mat":
+            gagnant = self.black if self.board.turn == chess.WHITE else self.white
+            perdant = self.white if gagnant == self.black else self.black
+            await EDITS.edit(self.timer_message, content=f"🏆 **VICTOIRE** de {gagnant.mention} par échec et mat !")
+            await self.end_game_visuals(gagnant, perdant, "mat")
+            
+        elif self.outcome == "nul":
+            await EDITS.edit(self.timer_message, content="🤝 **MATCH NUL**")
+            await self.end_game_visuals(None, None, "nul")
+            
+        else:
+            if fichier:
+                await EDITS.respond(interaction, embed=embed, view=self, attachments=[fichier])
+            else:
+                await EDITS.respond(interaction, embed=embed, view=self)
+
+    # --- GESTION DE FIN VISUELLE ---
+    def finish(self):
+        """Arrête la partie et sa pendule, sans await. False si elle était déjà finie.
+
+        Chaque fin (mat, nul, temps, abandon) l'appelle avant son premier appel REST :
+        une autre fin arrivée pendant cet appel s'arrête là, un seul résultat est enregistré.
+        """
+        if self.is_finished():
+            return False
+        self.stop_all()
+        self.stop()
+        return True
+
+    async def end_game_visuals(self, winner, loser, reason):
+        """Dernier affichage et résultat, après finish()."""
+        # On met à jour l'embed du plateau une dernière fois
+        embed = self.board_embed()
+        if reason == "mat":
+            embed.color = discord.Color.gold()
+            embed.description = "🏁 **ÉCHEC ET MAT**"
+        elif reason == "temps":
+            embed.color = discord.Color.orange()
+            embed.description = "⏰ **TEMPS ÉCOULÉ**"
+        elif reason == "abandon":
+            embed.color = discord.Color.red()
+            embed.description = "🏳️ **ABANDON**"
+        
+        # Update Stats
+        if winner and loser:
+            record_match(FILE_CHESS, winner, loser, 'win')
+        else:
+            record_match(FILE_CHESS, self.white, self.black, 'draw')
+
+        try:
+            await EDITS.edit(self.board_message, embed=embed, view=None)
+        except:
+            pass
+
+    @traced("echecs.abandon")
+    async def resign_callback(self, interaction: discord.Interaction):
+        if interaction.user not in [self.white, self.black]:
+            return await interaction.response.send_message("Tu ne joues pas !", ephemeral=True)
+        
+        if not self.finish():
+            return await interaction.response.send_message("La partie est déjà terminée.", ephemeral=True)
+        winner = self.black if interaction.user == self.white else self.white
+        await EDITS.edit(self.timer_message, content=f"🏳️ **ABANDON** de {interaction.user.mention}. Victoire de {winner.mention}")
+        await self.end_game_visuals(winner, interaction.user, "abandon")
+
+    def stop_all(self):
+        if self.time_left is not None:
+            CLOCKS.stop(self)
+
+    async def on_timeout(self):
+        """Partie expirée (SESSIONS) : pas de résultat enregistré, on retire juste les menus."""
+        self.stop_all()
+        if not self.board_message:
+            return
+        embed = self.board_embed()
+        embed.color = discord.Color.dark_grey()
+        embed.description = "⌛ **PARTIE EXPIRÉE** (inactivité)"
+        await EDITS.edit(self.board_message, embed=embed, view=None)
+        
+    def create_menus(self):
+        self.clear_items()
+        
+        # 1. MENU TYPE DE PIÈCE (Toujours plein au début)
+        type_select = discord.ui.Select(placeholder="1. Quel type de pièce ?", custom_id="echecs:type")
+        for p_type in sorted(self.moves_index):
+            type_select.add_option(
+                label=self.get_piece_name(p_type), 
+                value=str(p_type), 
+                default=(self.selected_type == p_type)
+            )
+        type_select.callback = self.type_callback
+        self.add_item(type_select)
+
+        # 2. MENU PIÈCE PRÉCISE
+        piece_select = discord.ui.Select(placeholder="2. Laquelle précisément ?", disabled=(self.selected_type is None), custom_id="echecs:piece")
+        if self.selected_type:
+            # Seules les pièces de ce type qui ont au moins un coup légal
+            for s in sorted(self.moves_index.get(self.selected_type, {})):
+                piece_select.add_option(label=f"Position {chess.square_name(s)}", value=str(s), default=(self.selected_square == s))
+        else:
+            # L'astuce est ici : on ajoute une option invisible pour éviter l'erreur 400
+            piece_select.add_option(label="En attente de l'étape 1...", value="none")
+        
+        piece_select.callback = self.piece_callback
+        self.add_item(piece_select)
+
+        # 3. MENU DESTINATION
+        dest_select = discord.ui.Select(placeholder="3. Où aller ?", disabled=(self.selected_square is None), custom_id="echecs:destination")
+        if self.selected_square is not None:
+            for move in self.moves_index.get(self.selected_type, {}).get(self.selected_square, []):
+                dest_select.add_option(label=f"Vers {chess.square_name(move.to_square)}", value=move.uci())
+        else:
+            # Même astuce ici
+            dest_select.add_option(label="En attente de l'étape 2...", value="none")
+        
+        dest_select.callback = self.dest_callback
+        self.add_item(dest_select)
+        cancel_btn = discord.ui.Button(label="Réinitialiser", style=discord.ButtonStyle.secondary, disabled=(self.selected_type is None), custom_id="echecs:reinitialiser")
+        cancel_btn.callback = self.cancel_callback
+        self.add_item(cancel_btn)
+
+        # 5. NOUVEAU : BOUTON ABANDONNER
+        resign_btn = discord.ui.Button(label="Abandonner", style=discord.ButtonStyle.danger, emoji="🏳️", custom_id="echecs:abandon")
+        resign_btn.callback = self.resign_callback
+        self.add_item(resign_btn)
+        # (Le reste du code pour les boutons reste identique)
+
+    # --- CALLBACKS ---
+    def check_turn(self, interaction):
+        return interaction.user == (self.white if self.board.turn == chess.WHITE else self.black)
+
+    @traced("echecs.type")
+    async def type_callback(self, interaction: discord.Interaction):
+        if not self.check_turn(interaction): return await interaction.response.send_message("Pas votre tour !", ephemeral=True)
+        self.selected_type = int(interaction.data['values'][0])
+        self.selected_square = None 
+        self.create_menus()
+        await EDITS.respond(interaction, view=self)
+
+    @traced("echecs.piece")
+    async def piece_callback(self, interaction: discord.Interaction):
+        if not self.check_turn(interaction): return
+        self.selected_square = int(interaction.data['values'][0])
+        self.create_menus()
+        await EDITS.respond(interaction, view=self)
+
+    @traced("echecs.reinitialiser")
+    async def cancel_callback(self, interaction: discord.Interaction):
+        if not self.check_turn(interaction): return
+        self.selected_type = None
+        self.selected_square = None
+        self.create_menus()
+        await EDITS.respond(interaction, view=self)
+
+    @traced("echecs.destination")
+    async def dest_callback(self, interaction: discord.Interaction):
+        if not self.check_turn(interaction): return
+        move = chess.Move.from_uci(interaction.data['values'][0])
+        
+        # Promotion auto Reine
+        if self.board.piece_at(move.from_square).piece_type == chess.PAWN:
+            if chess.square_rank(move.to_square) in [0, 7]:
+                move.promotion = chess.QUEEN
+
+        self.push_move(move)
+        self.selected_type = None
+        self.selected_square = None
+        self.create_menus()
+        await self.update_message(interaction)
+
+
+
+    async def end_game_logic(self, interaction, winner, loser, reason):
+        embed = interaction.message.embeds[0]
+        if reason == "temps":
+            embed.description = f"⏰ **TEMPS ÉCOULÉ !**\n{loser.mention} a manqué de temps. Victoire de {winner.mention} !"
+            embed.color = discord.Color.orange()
+            record_match(FILE_CHESS, winner, loser, 'win')
+            self.stop_all()
+        if reason == "mat":
+            embed.description = f"🏁 **ÉCHEC ET MAT !**\nVictoire de {winner.mention} !"
+            embed.color = discord.Color.gold()
+            record_match(FILE_CHESS, winner, loser, 'win')
+        elif reason == "abandon":
+            embed.description = f"🏳️ **ABANDON**\n{loser.mention} a quitté. Victoire de {winner.mention} !"
+            record_match(FILE_CHESS, winner, loser, 'win')
+        else:
+            embed.description = "🤝 **MATCH NUL !**"
+            record_match(FILE_CHESS, self.white, self.black, 'draw')
+
+        self.stop()
+        await EDITS.respond(interaction, embed=embed, view=None)
+
+    def get_piece_name(self, p_type):
+        return {chess.PAWN: "Pion", chess.KNIGHT: "Cavalier", chess.BISHOP: "Fou", 
+                chess.ROOK: "Tour", chess.QUEEN: "Dame", chess.KING: "Roi"}[p_type]
+
+class MoveModal(discord.ui.Modal, title="Votre coup (ex: e2e4)"):
+    move_input = discord.ui.TextInput(label="Coup en notation LAN", placeholder="e2e4, g1f3...")
+
+    def __init__(self, game_view):
+        super().__init__()
+        self.game_view = game_view
+
+    async def on_submit(self, interaction: discord.Interaction):
+        move_str = self.move_input.value.lower()
+        try:
+            move = chess.Move.from_uci(move_str)
+            if self.game_view.is_legal(move):
+                self.game_view.push_move(move)
+                
+                # On change de tour
+                self.game_view.turn = self.game_view.black if self.game_view.turn == self.game_view.white else self.game_view.white
+                
+                await interaction.response.defer()
+                await self.game_view.update_message(interaction)
+                
+                # Vérification fin de partie
+                if self.game_view.outcome:
+                    await interaction.followup.send(f"Partie terminée ! Résultat : {self.game_view.board.result()}")
+            else:
+                await interaction.response.send_message("Coup illégal !", ephemeral=True)
+        except:
+            await interaction.response.send_message("Format invalide (utilisez e2e4).", ephemeral=True)
+
+import chess
+import urllib.parse
+
+
+def get_chess_board_image(board, chess_board_color="green"):
+    fen = board.fen()
+    fen_position = fen.split(" ")[0]
+    # On ajoute &coordinates=true pour afficher les lettres et les chiffres
+    # On peut aussi changer le style (board=blue, brown, green...)
+    image_url = f"https://www.chess.com/dynboard?fen={fen_position}&size=2&board={chess_board_color}&piece=neo&coordinates=true"
+    
+    return image_url
+
+# --- RENDU LOCAL DU PLATEAU ---
+# cairosvg (et la bibliothèque cairo) est optionnel : sans lui on garde l'image chess.com
+try:
+    import cairosvg
+except (ImportError, OSError):
+    cairosvg = None
+
+THEMES_ECHIQUIER = {
+    "green": {"square light": "#eeeed2", "square dark": "#769656"},
+    "brown": {"square light": "#f0d9b5", "square dark": "#b58863"},
+    "blue": {"square light": "#dee3e6", "square dark": "#8ca2ad"},
+}
+
+class BoardRenderer:
+    """Rendu PNG du plateau dans un pool de threads, avec un cache LRU.
+
+    La clé ne garde que ce qui change l'image : placement des pièces (début du FEN),
+    thème, dernier coup surligné et roi en échec. Les ouvertures et positions
+    fréquentes sont donc servies directement depuis le cache.
+    """
+
+    def __init__(self, maxsize=512, workers=2):
+        self.maxsize = maxsize
+        self.cache = OrderedDict() # clé -> PNG
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rendu-echecs")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(board, theme):
+        lastmove = board.peek().uci() if board.move_stack else None
+        check = board.king(board.turn) if board.is_check() else None
+        return (board.board_fen(), theme, lastmove, check)
+
+    @staticmethod
+    def _render(key):
+        placement, theme, lastmove, check = key
+        svg = chess.svg.board(
+            chess.BaseBoard(placement),
+            lastmove=chess.Move.from_uci(lastmove) if lastmove else None,
+            check=check,
+            colors=THEMES_ECHIQUIER.get(theme, THEMES_ECHIQUIER["green"]),
+            coordinates=True,
+            size=480,
+        )
+        return cairosvg.svg2png(bytestring=svg.encode("utf-8"))
+
+    async def render(self, board, theme):
+        key = self.key(board, theme)
+        png = self.cache.get(key)
+        if png is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return png
+        self.misses += 1
+        png = await asyncio.get_running_loop().run_in_executor(self.executor, self._render, key)
+        self.cache[key] = png
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return png
+
+RENDERER = BoardRenderer()
+
+async def board_image(board, theme):
+    """Retourne (url pour l'embed, fichier à joindre ou None)."""
+    if cairosvg is None:
+        return get_chess_board_image(board, theme) + f"&t={int(time.time())}", None
+    with Span("rendu"):
+        png = await RENDERER.render(board, theme)
+    return "attachment://plateau.png", discord.File(BytesIO(png), filename="plateau.png")
+
+# --- LA COMMANDE DE LANCEMENT ---
+@bot.tree.command(name="echecs", description="Lancer une partie d'échecs avec stats")
+@app_commands.choices(couleur_du_plateau=[
+    app_commands.Choice(name="Vert", value="green"),
+    app_commands.Choice(name="Marron", value="brown"),
+    app_commands.Choice(name="Bleu", value="blue"),
+])
+async def echecs(interaction: discord.Interaction, adversaire: discord.Member, couleur_du_plateau: app_commands.Choice[str]= None, timer: int = 0):
+    if adversaire.bot or adversaire == interaction.user:
+        return await interaction.response.send_message("Adversaire invalide !", ephemeral=True)
+    refus = SESSIONS.refus(interaction.user, adversaire)
+    if refus:
+        return await interaction.response.send_message(refus, ephemeral=True)
+    
+    await interaction.response.defer()
+    
+    couleur_plateau = couleur_du_plateau.value if couleur_du_plateau else "green"
+    joueurs = [interaction.user, adversaire]
+    random.shuffle(joueurs)
+    blanc, noir = joueurs[0], joueurs[1]
+
+    # 1. Création de la View
+    view = ChessGame(white_player=blanc, black_player=noir, timer_minutes=timer)
+    view.board_theme = couleur_plateau 
+    SESSIONS.add(view, "echecs", joueurs, interaction.channel_id)
+    
+    # 2. MESSAGE 1 : LE TIMER (Envoyé en réponse à la commande)
+    # On prépare le texte initial
+    if timer > 0:
+        txt_timer = f"⏱️ **CHRONO**\n⚪ Blancs: `{timer}:00`\n⚫ Noirs: `{timer}:00`\n*En attente du démarrage...*"
+    else:
+        txt_timer = f"♾️ **PARTIE AMICALE** (Pas de temps)\n⚪ {blanc.mention} vs ⚫ {noir.mention}"
+
+    # On envoie le message du Timer
+    msg_timer = await interaction.followup.send(content=txt_timer, wait=True)
+    
+    # 3. MESSAGE 2 : LE PLATEAU (Envoyé juste après dans le canal)
+    image_url, fichier = await board_image(view.board, couleur_plateau)
+    embed = discord.Embed(title="♟️ Match d'Échecs", color=0x2b2d31)
+    embed.description = f"Trait aux **Blancs** ({blanc.display_name})"
+    embed.set_image(url=image_url)
+    # Plus besoin de Fields pour le temps dans l'embed !
+    
+    # On envoie le message du Plateau avec les boutons
+    if fichier:
+        msg_board = await interaction.channel.send(embed=embed, view=view, file=fichier)
+    else:
+        msg_board = await interaction.channel.send(embed=embed, view=view)
+    
+    # 4. On lie les messages à la View
+    view.timer_message = msg_timer
+    view.board_message = view.message = msg_board
+
+# --- SAUVEGARDE DES PARTIES EN COURS ---
+# Un déploiement ou un crash ne coupe plus les parties : elles sont écrites à l'arrêt et à
+# intervalles réguliers, puis recréées dans setup_hook comme vues persistantes.
+# Le fichier ne contient que les parties en cours, sa taille ne dépend pas de l'historique.
+PARTIES_SNAPSHOT = os.getenv("PARTIES_SNAPSHOT", "parties.json")
+SNAPSHOT_PERIOD = float(os.getenv("SNAPSHOT_PERIOD", "60")) # secondes entre deux sauvegardes
+
+CLASSES_PARTIES = {"morpion": MorpionGame, "puissance4": Connect4Game, "echecs": ChessGame}
+
+def snapshot_games():
+    """Les parties en cours (déjà affichées), de la moins récemment active à la plus récente."""
+    decalage = time.time() - time.monotonic() # "actif" est une date réelle : elle a un sens après redémarrage
+    parties = []
+    for session in SESSIONS.sessions.values():
+        view = session.view
+        if view.message is None or view.is_finished():
+            continue
+        parties.append(dict(
+            view.snapshot(),
+            jeu=session.kind,
+            salon=session.channel_id,
+            message=view.message.id,
+            humains=list(session.players),
+            actif=round(session.last_activity + decalage, 1),
+        ))
+    return json.dumps({"parties": parties}, separators=(",", ":"))
+
+def save_games():
+    write_atomic(PARTIES_SNAPSHOT, snapshot_games())
+
+@tasks.loop(seconds=SNAPSHOT_PERIOD)
+async def checkpoint_games():
+    payload = snapshot_games()
+    if payload != checkpoint_games.last_payload: # Rien n'a bougé : pas d'écriture
+        await asyncio.to_thread(write_atomic, PARTIES_SNAPSHOT, payload)
+        checkpoint_games.last_payload = payload
+
+checkpoint_games.last_payload = None
+
+def load_games(client):
+    """Recrée les parties du dernier snapshot et les inscrit dans SESSIONS. Retourne les vues à réenregistrer."""
+    try:
+        with open(PARTIES_SNAPSHOT) as f:
+            parties = json.load(f)["parties"]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Sauvegarde des parties illisible ({e}) : aucune partie reprise")
+        return []
+
+    decalage = time.time() - time.monotonic()
+    views = []
+    for data in parties:
+        try:
+            joueurs = [joueur_restore(client._connection, joueur) for joueur in data["joueurs"]]
+            salon = client.get_partial_messageable(data["salon"])
+            view = CLASSES_PARTIES[data["jeu"]].from_snapshot(data, joueurs, salon)
+        except Exception as e:
+            print(f"Partie non reprise ({data.get('jeu')}) : {e}")
+            continue
+        humains = [joueur for joueur in joueurs if joueur.id in data["humains"]]
+        session = SESSIONS.add(view, data["jeu"], humains, data["salon"])
+        session.last_activity = min(session.last_activity, data["actif"] - decalage)
+        views.append(view)
+    print(f"Parties reprises : {len(views)}")
+    return views
+# -------------------------------------------------------------------------
+#  _____ _    _ _____ _______ ______ 
+# / ____| |  | |_   _|__   __|  ____|
+# \__  \| |  | | | |    | |  | |__   
+#  ___  \ |  | | | |    | |  |  __|  
+#  ____) | |__| |_| |_   | |  | |____ 
+# |_____/ \____/|_____|  |_|  |______|
+#
+# -------------------------------------------------------------------------
+if __name__ == "__main__":
+    if "--rebuild-elo" in sys.argv:
+        # Recalcul complet des cotes depuis tout le journal, bot arrêté
+        RATINGS.rebuild()
+        RATINGS.flush()
+        print(f"Cotes Elo recalculées : {sum(len(book) for book in RATINGS.ratings.values())} joueurs")
+    else:
+        prive = str(os.getenv('PRIVATE_KEY'))
+        bot.run(prive)
+
+